@@ -0,0 +1,115 @@
+"""Checks the IVAR pandify helpers against the original row-by-row
+implementation and times both.
+
+The outputs must be identical on the recorded fixture, on randomized
+synthetic feeds, on an empty feed and on a feed of one event with one
+comment command, otherwise the script fails before timing anything:
+
+    python -m benchmarks.bench_ivar_pandify --events 100000
+"""
+
+import argparse
+import gc
+import re
+import time
+
+import pandas as pd
+
+from benchmarks.feeds import ivar_eventgroup, load_fixture
+from crawlers.ivar import IvarCrawler, parse_eventgroup
+
+
+class LoopIvarCrawler(IvarCrawler):
+    """The original per-row implementation, kept as the reference."""
+
+    def _extract_lat_and_lon(self, data):
+        lats, lons, depths = [], [], []
+        for l in data["location"]:
+            lat, lon, depth = l.split(", ")
+            lats.append(float(lat))
+            lons.append(float(lon))
+            depths.append(float(depth))
+
+        data["lat"] = lats
+        data["lon"] = lons
+        data["depth"] = depths
+        return data
+
+    def _unpack_comment_commands(self, data):
+        sentidos = [[] for i in range(len(data))]
+        regioes = [[] for i in range(len(data))]
+
+        for idx, row_commands in enumerate(data["comment_commands"]):
+            for command in row_commands:
+                if command["parameter"] == "SENTIDO:":
+                    sentidos[idx].append(command["value"])
+                elif command["parameter"] == "REGIAO:":
+                    regioes[idx].append(command["value"])
+
+        data["sentidos"] = sentidos
+        data["regioes"] = regioes
+        return data
+
+
+def _pandify(crawler_class, parsed):
+    crawler = crawler_class(streaming=False)
+    crawler.data = parsed
+    return crawler.pandify_data()
+
+
+def check_equal(document):
+    parsed = parse_eventgroup(document.decode("utf-8"))
+    pd.testing.assert_frame_equal(_pandify(IvarCrawler, parsed),
+                                  _pandify(LoopIvarCrawler, parsed))
+
+
+def single_command_event():
+    """A feed of one event with only its REGIAO: comment command."""
+    return re.sub(rb'<CommentCommand Parameter="SENTIDO:">.*?'
+                  rb'</CommentCommand>\n', b"", ivar_eventgroup(1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--seeds", type=int, default=5)
+    args = parser.parse_args()
+
+    check_equal(load_fixture("ivar_eventgroup.xml"))
+    for seed in range(args.seeds):
+        check_equal(ivar_eventgroup(1000 + seed * 997, seed=seed))
+    check_equal(ivar_eventgroup(0))
+    check_equal(single_command_event())
+    print(f"identical output on the fixture, {args.seeds} random feeds, "
+          f"an empty feed and a single event")
+
+    parsed = parse_eventgroup(ivar_eventgroup(args.events).decode("utf-8"))
+    crawler = IvarCrawler(streaming=False)
+    crawler.data = parsed
+    formatted = pd.DataFrame(crawler.format_data())
+
+    # The parsed feed is a large object graph, keep the garbage collector
+    # from adding noise to the timings
+    gc.collect()
+    gc.disable()
+    print(f"{args.events} events")
+    for crawler_class in (LoopIvarCrawler, IvarCrawler):
+        crawler = crawler_class(streaming=False)
+        timings = {}
+        for step in ("_extract_lat_and_lon", "_unpack_comment_commands"):
+            data = formatted.copy()
+            start = time.perf_counter()
+            getattr(crawler, step)(data)
+            timings[step] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _pandify(crawler_class, parsed)
+        timings["pandify_data"] = time.perf_counter() - start
+
+        print(f"{crawler_class.__name__:<16} " + " ".join(
+            f"{step}={seconds:.3f}s" for step, seconds in timings.items()))
+    gc.enable()
+
+
+if __name__ == "__main__":
+    main()
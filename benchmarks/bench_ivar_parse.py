@@ -0,0 +1,119 @@
+"""Compares the xmltodict and the streaming IVAR parse paths.
+
+Both must return the same DataFrame on randomized synthetic feeds, on one
+whose comment commands miss their value or leave it empty and on an empty
+feed, otherwise the script fails before timing anything. Each mode runs in its
+own interpreter so that peak RSS is not shared:
+
+    python -m benchmarks.bench_ivar_parse --events 200000
+"""
+
+import argparse
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ("xmltodict", "streaming")
+
+
+def _max_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_mode(mode, path):
+    from crawlers.ivar import (IvarCrawler, parse_eventgroup,
+                               stream_eventgroup)
+
+    with open(path, "rb") as fp:
+        document = fp.read()
+    rss_before = _max_rss_mb()
+
+    start = time.perf_counter()
+    crawler = IvarCrawler(streaming=mode == "streaming")
+    if crawler.streaming:
+        crawler.data = stream_eventgroup(document)
+    else:
+        crawler.data = parse_eventgroup(document.decode("utf-8"))
+    df = crawler.pandify_data()
+    elapsed = time.perf_counter() - start
+
+    return {"mode": mode,
+            "events": len(df),
+            "document_mb": len(document) / 2**20,
+            "seconds": elapsed,
+            "events_per_second": len(df) / elapsed,
+            "mb_per_second": len(document) / 2**20 / elapsed,
+            "peak_rss_delta_mb": _max_rss_mb() - rss_before}
+
+
+def check_equal(document):
+    import pandas as pd
+
+    from crawlers.ivar import (IvarCrawler, parse_eventgroup,
+                               stream_eventgroup)
+
+    parsed = IvarCrawler(streaming=False)
+    parsed.data = parse_eventgroup(document.decode("utf-8"))
+    streamed = IvarCrawler(streaming=True)
+    streamed.data = stream_eventgroup(document)
+    pd.testing.assert_frame_equal(parsed.pandify_data(),
+                                  streamed.pandify_data())
+
+
+def without_command_values(document):
+    """document with the value of its first comment command removed and
+    the value of the second one emptied."""
+    value = rb"<value>[^<]*</value></CommentCommand>"
+    document = re.sub(value, b"</CommentCommand>", document, count=1)
+    return re.sub(value, b"<value/></CommentCommand>", document, count=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--mode", choices=MODES)
+    parser.add_argument("--feed", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.feed)))
+        return
+
+    from benchmarks.feeds import ivar_eventgroup
+
+    for seed in range(3):
+        check_equal(ivar_eventgroup(1000 + seed * 997, seed=seed))
+    check_equal(without_command_values(ivar_eventgroup(100)))
+    check_equal(ivar_eventgroup(0))
+    print("identical output on 3 random feeds, missing values and an empty "
+          "feed")
+
+    # The feed is generated once, outside of the measured processes
+    with tempfile.NamedTemporaryFile(suffix=".xml", delete=False) as fp:
+        fp.write(ivar_eventgroup(args.events))
+
+    print(f"{'mode':<10} {'events':>8} {'doc MB':>8} {'s':>7} "
+          f"{'events/s':>10} {'MB/s':>7} {'peak RSS +MB':>13}")
+    try:
+        for mode in MODES:
+            output = subprocess.check_output(
+                [sys.executable, "-m", "benchmarks.bench_ivar_parse",
+                 "--mode", mode, "--feed", fp.name])
+            r = json.loads(output)
+            print(f"{r['mode']:<10} {r['events']:>8} "
+                  f"{r['document_mb']:>8.1f} {r['seconds']:>7.2f} "
+                  f"{r['events_per_second']:>10.0f} "
+                  f"{r['mb_per_second']:>7.1f} "
+                  f"{r['peak_rss_delta_mb']:>13.1f}")
+    finally:
+        os.remove(fp.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Compares the payloads of a Scatterplot map sent to deck.gl.
+
+- records: the DataFrame embedded as JSON records, every column included
+- compact: what the app sends, the referenced columns with rounded floats
+  and precomputed colors and sizes, serialized without indentation
+- binary: typed arrays of positions (float32), colors (uint8) and radii
+  (float32), the layout of pydeck's binary transport
+
+st.pydeck_chart only accepts the JSON spec of the Deck, so the binary
+column is the lower bound a typed array transport would reach:
+
+    python -m benchmarks.bench_pdk_transport --sizes 10000 100000 1000000
+"""
+
+import argparse
+import datetime as dt
+import json
+import time
+
+import numpy as np
+import pydeck as pdk
+
+from benchmarks.feeds import synthetic_catalog
+from streamlit_app.component.channels import variable_channels
+from streamlit_app.component.pdk_layer import pdk_layer
+from streamlit_app.component.transport import deck_to_json
+
+VARIABLE = "Magnitude"
+
+
+def encode_columns(arrays):
+    """Packs named columns as contiguous typed arrays.
+
+    float64 is narrowed to float32 and int64 to int32, as deck.gl
+    attributes support neither. Returns (header, buffer), the header
+    holding the dtype, components per row and offset of each column.
+    """
+    header, chunks, offset = {}, [], 0
+    for name, array in arrays.items():
+        array = np.asarray(array)
+        if array.dtype == np.float64:
+            array = array.astype(np.float32)
+        elif array.dtype == np.int64:
+            array = array.astype(np.int32)
+        array = np.ascontiguousarray(array)
+        header[name] = {"dtype": str(array.dtype),
+                        "size": 1 if array.ndim == 1 else array.shape[1],
+                        "offset": offset}
+        chunks.append(array.tobytes())
+        offset += array.nbytes
+    return header, b"".join(chunks)
+
+
+def records_payload(data):
+    layer = pdk_layer("Scatter", VARIABLE, data.iloc[:0])
+    channels = variable_channels(data, VARIABLE)
+    layer.data = data.assign(color=channels["color"].tolist(),
+                             size=channels["size"])
+    return pdk.Deck(layers=[layer]).to_json().encode("utf-8")
+
+
+def compact_payload(data):
+    layer = pdk_layer("Scatter", VARIABLE, data)
+    return deck_to_json(pdk.Deck(layers=[layer])).encode("utf-8")
+
+
+def binary_payload(data):
+    position = np.column_stack([data["lon"].to_numpy(dtype=np.float32),
+                                data["lat"].to_numpy(dtype=np.float32)])
+    channels = variable_channels(data, VARIABLE)
+
+    header, buffer = encode_columns({
+        "getPosition": position,
+        "getFillColor": channels["color"],
+        "getRadius": channels["size"]})
+    return json.dumps(header).encode("utf-8") + buffer
+
+
+PATHS = {
+    "records": records_payload,
+    "compact": compact_payload,
+    "binary": binary_payload,
+}
+
+
+def prepare(num_events):
+    data = synthetic_catalog(num_events)
+    now = dt.datetime(2022, 6, 20)
+    data["date_string"] = data["date"].dt.strftime('%Y-%m-%d %H:%M')
+    data["hours_since"] = (now - data.date) / np.timedelta64(1, 'h')
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10000, 100000, 1000000])
+    parser.add_argument("--paths", nargs="+", choices=PATHS,
+                        default=list(PATHS))
+    args = parser.parse_args()
+
+    print(f"{'events':>8} {'path':<8} {'MB':>8} {'bytes/event':>12} "
+          f"{'s':>7}")
+    for num_events in args.sizes:
+        data = prepare(num_events)
+        for name in args.paths:
+            start = time.perf_counter()
+            payload = PATHS[name](data)
+            elapsed = time.perf_counter() - start
+            print(f"{num_events:>8} {name:<8} {len(payload) / 2**20:>8.1f} "
+                  f"{len(payload) / num_events:>12.1f} {elapsed:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
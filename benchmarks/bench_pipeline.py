@@ -0,0 +1,264 @@
+"""Times the whole path of an event, from the feeds to the map spec.
+
+The IPMA and IVAR crawlers download synthetic feeds of --sizes events
+each from a local stand-in server, then the merged catalog is filtered,
+turned into a Scatter layer and serialized as the page does:
+
+    fetch -> parse -> pandify -> filter -> layer -> serialize
+
+fetch, parse and pandify are recorded per source, the other stages on
+the merged catalog. Wall times are the best of --repeat runs, peak memory
+is the highest traced allocation of a separate run under tracemalloc.
+Results are written as JSON and can be compared with a baseline.
+Timings depend on the machine, so each machine records its own baseline,
+at 1k, 100k and 1M events, in SEISMIC_BENCHMARK_DIR (data/benchmarks by
+default) under its host name and CPU count. Recording it takes tens of
+minutes, it is done again after hardware or dependency upgrades:
+
+    python -m benchmarks.bench_pipeline --save-baseline
+    python -m benchmarks.bench_pipeline --baseline
+    python -m benchmarks.bench_pipeline --baseline other.json
+
+Comparing exits with status 1 when a stage is slower than the baseline by
+more than --tolerance.
+"""
+
+import argparse
+import contextlib
+import datetime as dt
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pydeck as pdk
+
+from benchmarks.feeds import ipma_observations, ivar_eventgroup
+from benchmarks.server import (IPMA_FEED_PATH, IVAR_FEED_PATH, FeedServer,
+                               stand_in_sources)
+from catalog.query import CatalogIndex, EventQuery
+from crawlers.ipma import IpmaCrawler
+from crawlers.ivar import IvarCrawler
+from crawlers.orchestrator import merge_catalogs
+from streamlit_app.component.pdk_layer import pdk_layer
+from streamlit_app.component.transport import deck_to_json
+
+SOURCES = {
+    "IPMA": (lambda: IpmaCrawler("azores"), IPMA_FEED_PATH,
+             ipma_observations),
+    "IVAR": (IvarCrawler, IVAR_FEED_PATH, ivar_eventgroup),
+}
+# Source name of the stages run on the merged catalog
+CATALOG = "catalog"
+
+# Stages faster than this are too noisy to be compared
+MIN_COMPARED_SECONDS = 0.005
+DEFAULT_TOLERANCE = 1.5
+
+DEFAULT_SIZES = [1000, 100000]
+BASELINE_SIZES = [1000, 100000, 1000000]
+BASELINE_DIR = os.environ.get("SEISMIC_BENCHMARK_DIR",
+                              os.path.join("data", "benchmarks"))
+
+NOW = dt.datetime(2022, 6, 20)
+
+
+class StageTimer:
+    """Wall time and, when tracing, peak traced memory of each stage."""
+
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.seconds = {}
+        self.peak_mb = {}
+
+    @contextlib.contextmanager
+    def stage(self, source, name):
+        if self.trace:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        yield
+        self.seconds[source, name] = time.perf_counter() - start
+        if self.trace:
+            peak = tracemalloc.get_traced_memory()[1]
+            self.peak_mb[source, name] = (peak - before) / 2**20
+
+
+def crawl(source, timer):
+    """Runs the crawler's own crawl(), timing its fetch apart. parse is
+    what crawl() spends besides fetching."""
+    crawler = SOURCES[source][0]()
+    fetch = crawler.fetch
+
+    def timed_fetch(url):
+        with timer.stage(source, "fetch"):
+            return fetch(url)
+
+    crawler.fetch = timed_fetch
+    with timer.stage(source, "parse"):
+        crawler.crawl()
+    if crawler.error:
+        raise Exception(f"{source} crawl failed: {crawler.error}")
+    timer.seconds[source, "parse"] -= timer.seconds[source, "fetch"]
+
+    with timer.stage(source, "pandify"):
+        df = crawler.pandify_data()
+    return df.assign(source=source)
+
+
+def run_pipeline(timer):
+    frames = [crawl(source, timer) for source in SOURCES]
+
+    with timer.stage(CATALOG, "filter"):
+        catalog = merge_catalogs(frames)
+        query = EventQuery(time=(catalog["date"].min(), NOW),
+                           magnitude=(2, 10))
+        data = query.apply(catalog, CatalogIndex(catalog))
+        data = data.assign(
+            date_string=data["date"].dt.strftime('%Y-%m-%d %H:%M'))
+
+    with timer.stage(CATALOG, "layer"):
+        data["hours_since"] = (NOW - data.date) / np.timedelta64(1, 'h')
+        layer = pdk_layer("Scatter", "Magnitude", data)
+
+    with timer.stage(CATALOG, "serialize"):
+        deck_to_json(pdk.Deck(layers=[layer]))
+
+
+def bench_size(server, num_events, repeat):
+    for source, (_, path, generate) in SOURCES.items():
+        server.feeds[path] = generate(num_events)
+
+    runs = []
+    for _ in range(repeat):
+        gc.collect()
+        runs.append(StageTimer())
+        run_pipeline(runs[-1])
+
+    gc.collect()
+    traced = StageTimer(trace=True)
+    tracemalloc.start()
+    try:
+        run_pipeline(traced)
+    finally:
+        tracemalloc.stop()
+
+    return [{"events": num_events,
+             "source": source,
+             "stage": stage,
+             "seconds": min(run.seconds[source, stage] for run in runs),
+             "peak_mb": traced.peak_mb[source, stage]}
+            for source, stage in runs[0].seconds]
+
+
+def machine_baseline_path():
+    """The baseline of this machine, named after its host and CPUs."""
+    return os.path.join(
+        BASELINE_DIR, f"pipeline-{platform.node()}-{os.cpu_count()}cpu.json")
+
+
+def machine_info():
+    return {"python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()}
+
+
+def write_results(path, results, repeat):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as fp:
+        json.dump({**machine_info(),
+                   "created_at": dt.datetime.now().isoformat(
+                       timespec="seconds"),
+                   "repeat": repeat,
+                   "results": results}, fp, indent=1)
+
+
+def compare(results, baseline, tolerance):
+    """Adds the baseline seconds and the time ratio to each result found
+    in the baseline. Returns the results slower than tolerance allows."""
+    reference = {(r["events"], r["source"], r["stage"]): r
+                 for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        base = reference.get(
+            (result["events"], result["source"], result["stage"]))
+        if base is None:
+            continue
+        result["baseline_seconds"] = base["seconds"]
+        result["ratio"] = result["seconds"] / base["seconds"] \
+            if base["seconds"] else None
+        if result["ratio"] and result["ratio"] > tolerance and \
+                result["seconds"] >= MIN_COMPARED_SECONDS:
+            regressions.append(result)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        help=f"events in each source's feed, by default "
+                             f"{DEFAULT_SIZES}, or {BASELINE_SIZES} with "
+                             f"--save-baseline. 1000000 takes tens of "
+                             f"minutes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results to this file")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="write the results as this machine's baseline")
+    parser.add_argument("--baseline", nargs="?", const=machine_baseline_path(),
+                        help="results file to compare with, this machine's "
+                             "baseline when no file is given")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="highest accepted ratio to the baseline time")
+    args = parser.parse_args()
+    sizes = args.sizes or \
+        (BASELINE_SIZES if args.save_baseline else DEFAULT_SIZES)
+
+    baseline = None
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            sys.exit(f"No baseline at {args.baseline}, record one with "
+                     f"--save-baseline")
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)
+        recorded_on = {k: baseline.get(k) for k in machine_info()}
+        if recorded_on != machine_info():
+            print(f"Warning: the baseline was recorded on {recorded_on}, "
+                  f"this machine is {machine_info()}")
+
+    results = []
+    with FeedServer() as server, stand_in_sources(server.url):
+        for num_events in sizes:
+            results += bench_size(server, num_events, args.repeat)
+
+    regressions = []
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+
+    print(f"{'events':>8} {'source':<8} {'stage':<10} {'s':>8} "
+          f"{'peak MB':>8} {'baseline s':>11} {'ratio':>6}")
+    for r in results:
+        line = (f"{r['events']:>8} {r['source']:<8} {r['stage']:<10} "
+                f"{r['seconds']:>8.3f} {r['peak_mb']:>8.1f}")
+        if r.get("ratio"):
+            line += f" {r['baseline_seconds']:>11.3f} {r['ratio']:>6.2f}"
+        print(line)
+
+    if args.output:
+        write_results(args.output, results, args.repeat)
+    if args.save_baseline:
+        write_results(machine_baseline_path(), results, args.repeat)
+        print(f"Baseline written to {machine_baseline_path()}")
+
+    if regressions:
+        print(f"{len(regressions)} stages slower than {args.tolerance}x "
+              f"the baseline")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Bytes per event of the IPMA, IVAR and merged catalogs, with the dtypes
+the crawlers used to return and with the shared event schema:
+
+    python -m benchmarks.bench_schema --events 100000
+
+The legacy frames are the schema frames cast back to what each crawler
+returned before: float64 coordinates, int64 IPMA depths, string[pyarrow]
+IPMA text, object IVAR text and Python lists for the IVAR felt reports.
+Sizes are pandas' deep memory usage, which counts the Python lists but
+not the strings in them, so the legacy IVAR sizes are underestimated.
+--columns prints them per column.
+"""
+
+import argparse
+import json
+
+import pandas as pd
+
+from benchmarks.feeds import ipma_observations, ivar_eventgroup
+from catalog.schema import TEXT_LIST, memory_report
+from crawlers.ipma import IpmaCrawler
+from crawlers.ivar import IvarCrawler, stream_eventgroup
+from crawlers.orchestrator import merge_catalogs
+
+
+def legacy_frame(df, text, depth=float):
+    """df with the dtypes of the crawlers before the schema, text and depth
+    being the dtypes of its text and depth columns."""
+    columns = {}
+    for name in df.columns:
+        dtype = df[name].dtype
+        if dtype == TEXT_LIST:
+            columns[name] = pd.Series(
+                [None if v is None else list(v)
+                 for v in df[name].to_list()],
+                index=df.index, dtype=object)
+        elif name == "depth":
+            columns[name] = df[name].astype(depth)
+        elif dtype == "float32":
+            columns[name] = df[name].astype(float)
+        elif isinstance(dtype, pd.CategoricalDtype) or \
+                isinstance(dtype, pd.StringDtype):
+            columns[name] = df[name].astype(text)
+    return df.assign(**columns)
+
+
+def catalogs(num_events, seed):
+    ipma = IpmaCrawler("azores")
+    ipma.data = json.loads(ipma_observations(num_events, seed=seed))
+    ipma = ipma.pandify_data()
+
+    ivar = IvarCrawler()
+    ivar.data = stream_eventgroup(ivar_eventgroup(num_events, seed=seed))
+    ivar = ivar.pandify_data()
+
+    # IPMA depths were whole kilometers
+    legacy_ipma = legacy_frame(ipma, "string[pyarrow]", depth="int64")
+    legacy_ivar = legacy_frame(ivar, object)
+    # The merged catalog concatenated the frames as they were
+    legacy_merged = pd.concat(
+        [legacy_ipma, legacy_ivar.assign(source="IVAR")], ignore_index=True)
+    merged = merge_catalogs([ipma, ivar.assign(source="IVAR")])
+    return {"IPMA": (legacy_ipma, ipma),
+            "IVAR": (legacy_ivar, ivar),
+            "merged": (legacy_merged, merged)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--columns", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{args.events} events per source")
+    print(f"{'catalog':<8} {'legacy B/event':>15} {'schema B/event':>15} "
+          f"{'ratio':>6}")
+    for name, (legacy, compact) in catalogs(args.events, args.seed).items():
+        before, after = memory_report(legacy), memory_report(compact)
+        print(f"{name:<8} {before.loc['total', 'bytes_per_event']:>15.1f} "
+              f"{after.loc['total', 'bytes_per_event']:>15.1f} "
+              f"{before.loc['total', 'bytes'] / after.loc['total', 'bytes']:>5.1f}x")
+        if args.columns:
+            report = before[["dtype", "bytes_per_event"]].join(
+                after[["dtype", "bytes_per_event"]],
+                lsuffix=" legacy", rsuffix=" schema")
+            print(report.to_string(float_format="{:.1f}".format), "\n")
+
+
+if __name__ == "__main__":
+    main()
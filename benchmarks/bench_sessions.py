@@ -0,0 +1,161 @@
+"""Memory held by concurrent sessions of the Data page, against their
+number:
+
+    python -m benchmarks.bench_sessions --events 200000 --sessions 1 4 16
+
+Each simulated session loads the catalog, runs the page's default query,
+which selects every event, and adds hours_since. The frames of all
+sessions are kept until the last one has run, as they are while their
+reruns overlap.
+
+- memo: what st.experimental_memo did, a deserialized copy of the
+  pickled catalog and of the query result per session, with
+  date_string and hours_since added to it
+- shared: one SharedDataset from the DatasetRegistry, referenced by
+  every session, which only derives its hours_since frame
+
+Memory is what tracemalloc traces plus what the Arrow memory pool
+allocated, which tracemalloc does not see. Sessions only share the frame
+because it can not be changed: the script first checks that every way of
+writing to it raises and leaves it as it was.
+"""
+
+import argparse
+import datetime as dt
+import gc
+import pickle
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from benchmarks.feeds import synthetic_catalog
+from catalog.dataset import DatasetRegistry, SharedDataset
+from catalog.query import CatalogIndex, EventQuery
+from catalog.schema import apply_schema
+
+NOW = dt.datetime(2022, 6, 20)
+
+
+def allocated():
+    return tracemalloc.get_traced_memory()[0] + pa.total_allocated_bytes()
+
+
+def default_query(catalog):
+    return EventQuery(time=(catalog["date"].min(), catalog["date"].max()),
+                      lat=(catalog["lat"].min(), catalog["lat"].max()),
+                      lon=(catalog["lon"].min(), catalog["lon"].max()),
+                      magnitude=(catalog["magnitude"].min(),
+                                 catalog["magnitude"].max()))
+
+
+# Each one writes to the shared frame f
+WRITES = {
+    "setitem": lambda f: f.__setitem__("lat", 0.0),
+    "new column": lambda f: f.__setitem__("new", 0.0),
+    "attribute": lambda f: setattr(f, "lat", 0.0),
+    "delitem": lambda f: f.__delitem__("lat"),
+    "insert": lambda f: f.insert(0, "new", 0.0),
+    "pop": lambda f: f.pop("lat"),
+    "update": lambda f: f.update(f.assign(lat=0.0)),
+    "loc": lambda f: f.loc.__setitem__((f.index[0], "lat"), 5.0),
+    "iloc": lambda f: f.iloc.__setitem__((0, 0), "x"),
+    "at": lambda f: f.at.__setitem__((f.index[0], "lat"), 5.0),
+    "iat": lambda f: f.iat.__setitem__((0, 0), "x"),
+    "columns": lambda f: setattr(f, "columns", list(f.columns)[::-1]),
+    "index": lambda f: setattr(f, "index", f.index[::-1]),
+    "+=": lambda f: f.__iadd__(1),
+    "sort_values": lambda f: f.sort_values("magnitude", inplace=True),
+    "rename": lambda f: f.rename(columns={"lat": "y"}, inplace=True),
+    "fillna": lambda f: f.fillna(0, inplace=True),
+    "drop": lambda f: f.drop(columns="lat", inplace=True),
+    "reset_index": lambda f: f.reset_index(drop=True, inplace=True),
+}
+
+
+def check_read_only(frame):
+    """Fails unless every write to the shared frame raises and leaves it
+    as it was."""
+    before = pd.DataFrame(frame).copy()
+    for name, write in WRITES.items():
+        try:
+            write(frame)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{name} wrote to the shared frame")
+    # Copy-on-write: a write through a column copies the column
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        frame["lat"].iloc[0] = 0.0
+    pd.testing.assert_frame_equal(pd.DataFrame(frame), before)
+
+
+def memo_sessions(catalog, num_sessions):
+    # The memo caches hold one pickle of each result, every call
+    # deserializes it again
+    pickled_catalog = pickle.dumps(catalog)
+    query = default_query(catalog)
+    index = CatalogIndex(catalog)
+    result = query.apply(catalog, index)
+    pickled_result = pickle.dumps(result.assign(
+        date_string=result["date"].dt.strftime('%Y-%m-%d %H:%M')))
+    del result
+
+    start = allocated()
+    sessions = []
+    for _ in range(num_sessions):
+        data = pickle.loads(pickled_catalog)
+        selected = pickle.loads(pickled_result)
+        selected["hours_since"] = \
+            (NOW - selected.date) / np.timedelta64(1, 'h')
+        sessions.append((data, selected))
+    return allocated() - start
+
+
+def shared_sessions(catalog, num_sessions):
+    registry = DatasetRegistry()
+    dataset = registry.get("catalog", "v1",
+                           lambda previous: SharedDataset(catalog, "v1"))
+    query = default_query(dataset.frame)
+    dataset.select(query)
+
+    start = allocated()
+    sessions = []
+    for _ in range(num_sessions):
+        dataset = registry.get("catalog", "v1",
+                               lambda previous: SharedDataset(catalog, "v1"))
+        selected = dataset.select(query)
+        selected = selected.assign(
+            hours_since=(NOW - selected.date) / np.timedelta64(1, 'h'))
+        sessions.append((dataset.frame, selected))
+    return allocated() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--sessions", type=int, nargs="+",
+                        default=[1, 4, 16])
+    args = parser.parse_args()
+
+    catalog = apply_schema(synthetic_catalog(args.events))
+    check_read_only(SharedDataset(catalog, "v1").frame)
+    print("the shared frame is read-only\n")
+
+    print(f"{args.events} events, MB held by all the sessions")
+    print(f"{'sessions':>8} {'memo':>9} {'shared':>9}")
+    tracemalloc.start()
+    for num_sessions in args.sessions:
+        results = []
+        for sessions in (memo_sessions, shared_sessions):
+            gc.collect()
+            results.append(sessions(catalog, num_sessions) / 2**20)
+        print(f"{num_sessions:>8} {results[0]:>9.1f} {results[1]:>9.1f}")
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Measures the app's import time and the fixed cost of every rerun.
+
+Import time: each page is first selected in a fresh interpreter, after
+streamlit itself is imported, reporting the seconds spent importing the
+app modules and the page, and which heavy dependencies got loaded.
+
+Rerun latency: the config, style and page lookups app.py makes on every
+rerun, against the original implementation that walked the working
+directory for app.json and read style.css each time:
+
+    python -m benchmarks.bench_startup --reruns 200
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ("pydeck", "st_aggrid", "xmltodict", "pyarrow",
+                 "crawlers.ivar", "crawlers.ipma")
+
+
+def import_page(title):
+    import streamlit  # noqa: F401, imported by any streamlit script
+
+    loaded = set(sys.modules)
+    start = time.perf_counter()
+    from streamlit_app.page.app_pages import AppPages
+    from streamlit_app.utils import load_app_json, load_custom_components
+    load_app_json()
+    load_custom_components(streamlit)
+    app_seconds = time.perf_counter() - start
+
+    AppPages.get_content(title)
+    total_seconds = time.perf_counter() - start
+    return {"page": title,
+            "app_seconds": app_seconds,
+            "page_seconds": total_seconds - app_seconds,
+            "modules": len(set(sys.modules) - loaded),
+            "heavy": [m for m in HEAVY_MODULES
+                      if m in sys.modules and m not in loaded]}
+
+
+def walk_app_json():
+    """The original lookup, kept as the reference."""
+    file_path = None
+    for root, _, files in os.walk(os.getcwd()):
+        if "app.json" in files:
+            if file_path:
+                raise Exception("Multiple 'app.json' files.")
+            file_path = os.path.join(root, "app.json")
+    with open(file_path, 'r') as fp:
+        return json.load(fp)
+
+
+def uncached_rerun(title):
+    walk_app_json()
+    with open('streamlit_app/style.css') as f:
+        f.read()
+
+
+def cached_rerun(title):
+    from streamlit_app.page.app_pages import AppPages
+    from streamlit_app.utils import STYLE_PATH, _read_style, load_app_json
+
+    load_app_json()
+    _read_style(STYLE_PATH)
+    AppPages.get_content(title)
+
+
+def time_reruns(rerun, title, reruns):
+    rerun(title)
+    start = time.perf_counter()
+    for _ in range(reruns):
+        rerun(title)
+    return (time.perf_counter() - start) / reruns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reruns", type=int, default=100)
+    parser.add_argument("--import-page", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.import_page:
+        print(json.dumps(import_page(args.import_page)))
+        return
+
+    from streamlit_app.page.app_pages import AppPages
+
+    print(f"{'page':<6} {'app s':>7} {'page s':>7} {'modules':>8}  "
+          f"heavy dependencies")
+    for title in AppPages.get_titles():
+        process = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_startup",
+             "--import-page", title], capture_output=True, text=True)
+        if process.returncode:
+            error = process.stderr.strip().splitlines()[-1]
+            print(f"{title:<6} import failed: {error}")
+            continue
+        r = json.loads(process.stdout)
+        print(f"{r['page']:<6} {r['app_seconds']:>7.3f} "
+              f"{r['page_seconds']:>7.3f} {r['modules']:>8}  "
+              f"{', '.join(r['heavy']) or '-'}")
+
+    print(f"\n{'rerun':<9} {'ms':>8}")
+    for name, rerun in (("uncached", uncached_rerun),
+                        ("cached", cached_rerun)):
+        seconds = time_reruns(rerun, "News", args.reruns)
+        print(f"{name:<9} {seconds * 1000:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""The tile pyramid against drawing every event, on a synthetic catalog
+over the Azores:
+
+    python -m benchmarks.bench_tiles --events 1000000
+
+Reports the seconds to build the pyramid, to add the last day of events
+to a pyramid of the others, and for each map zoom the events and cells
+the map loads from the visible tiles, the largest magnitude kept and the
+size of the serialized Scatter and Column layers. The all events row is
+the Scatter layer of every event, as drawn without tiles.
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import pydeck as pdk
+
+from benchmarks.feeds import synthetic_catalog
+from catalog.schema import apply_schema
+from catalog.tiles import TilePyramid, viewport_bbox
+from streamlit_app.component.pdk_layer import pdk_layer
+from streamlit_app.component.transport import deck_to_json
+
+CENTER = (38.6, -28.3)
+NOW = pd.Timestamp(2022, 6, 20)
+
+
+def layer_bytes(layer_name, data, aggregated=False, cell_size=None):
+    data = data.assign(hours_since=(NOW - data[
+        "last_date" if aggregated else "date"]) / np.timedelta64(1, 'h'))
+    layer = pdk_layer(layer_name, "Magnitude", data, aggregated=aggregated,
+                      cell_size=cell_size)
+    return len(deck_to_json(pdk.Deck(layers=[layer])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--zooms", type=int, nargs="+",
+                        default=[4, 6, 8, 10])
+    args = parser.parse_args()
+
+    catalog = apply_schema(synthetic_catalog(args.events))
+    start = time.perf_counter()
+    pyramid = TilePyramid()
+    pyramid.update(catalog)
+    print(f"{args.events} events, build {time.perf_counter() - start:.2f} s")
+
+    last_day = catalog["date"].max() - pd.Timedelta(days=1)
+    incremental = TilePyramid()
+    incremental.update(catalog[catalog["date"] <= last_day])
+    start = time.perf_counter()
+    changed = incremental.update(catalog)
+    print(f"{changed} changed events, update "
+          f"{time.perf_counter() - start:.3f} s")
+
+    print(f"\n{'zoom':>10} {'events':>8} {'cells':>7} {'max mag':>8} "
+          f"{'scatter KB':>11} {'column KB':>10}")
+    for zoom in args.zooms:
+        bbox = viewport_bbox(*CENTER, zoom)
+        events = pyramid.tile_events(bbox, zoom)
+        cells = pyramid.tile_cells(bbox, zoom)
+        scatter = layer_bytes("Scatter", events)
+        column = layer_bytes("Column", cells, aggregated=True,
+                             cell_size=pyramid.cell_size(zoom))
+        print(f"{zoom:>10} {len(events):>8} {len(cells):>7} "
+              f"{events['magnitude'].max():>8.1f} "
+              f"{scatter / 1024:>11.0f} {column / 1024:>10.0f}")
+    print(f"{'all events':>10} {len(catalog):>8} {'-':>7} "
+          f"{catalog['magnitude'].max():>8.1f} "
+          f"{layer_bytes('Scatter', catalog) / 1024:>11.0f} {'-':>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Synthetic data source feeds for the benchmarks."""
+
+import datetime as dt
+import json
+import os
+import random
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+IVAR_REGIONS = ["S. Jorge", "W Faial", "Terceira", "S. Miguel", "Pico"]
+
+
+def load_fixture(filename):
+    """Returns the bytes of a recorded feed in benchmarks/fixtures."""
+    with open(os.path.join(FIXTURES_DIR, filename), "rb") as fp:
+        return fp.read()
+
+
+def ivar_eventgroup(num_events, seed=0, start=dt.datetime(2022, 3, 19)):
+    """Returns an IVAR eventgroup.xml document with num_events events.
+
+    Mirrors the live feed: some events carry several Origin elements and
+    the number of CommentCommand elements varies from two to three.
+    """
+    rnd = random.Random(seed)
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<EventGroup>\n']
+
+    for i in range(num_events):
+        time = start + dt.timedelta(seconds=rnd.randint(0, 90 * 24 * 3600),
+                                    milliseconds=rnd.randint(0, 9) * 100)
+        event_id = time.strftime("%Y%m%d%H%M%S")
+        lat = 38.6 + rnd.uniform(-0.6, 0.6)
+        lon = -28.3 + rnd.uniform(-1.3, 1.3)
+        depth = rnd.uniform(0, 25)
+
+        parts.append(f'<Event EventID=" {event_id} ">\n')
+        for o in range(1 if rnd.random() < 0.9 else 2):
+            parts.append(
+                f'<Origin Agency="AZO" OriginID="{event_id}{i}{o}">'
+                f'<originTime>{time.isoformat(timespec="milliseconds")}Z'
+                f'</originTime>'
+                f'<location length="3">{lat:.3f}, {lon:.3f}, {depth:.1f}'
+                f'</location></Origin>\n')
+        parts.append(
+            f'<Magnitude Agency="AZO" MagnitudeID="{event_id}{i}">'
+            f'<value>{rnd.uniform(1, 5):.1f}</value><type>ML</type>'
+            f'</Magnitude>\n'
+            f'<primeOrigin ResourceID="{event_id}{i}0"/>\n'
+            f'<primeMagnitude ResourceID="{event_id}{i}"/>\n')
+
+        commands = [("REGIAO:", rnd.choice(IVAR_REGIONS))]
+        for _ in range(rnd.randint(1, 2)):
+            commands.append(("SENTIDO:", f"{rnd.choice(IVAR_REGIONS)} (III)"))
+        for parameter, value in commands:
+            parts.append(f'<CommentCommand Parameter="{parameter}">'
+                         f'<value>{escape(value)}</value></CommentCommand>\n')
+        parts.append('</Event>\n')
+
+    parts.append('</EventGroup>\n')
+    return "".join(parts).encode("utf-8")
+
+
+def ipma_observations(num_events, seed=0, start=dt.datetime(2022, 3, 19)):
+    """Returns an IPMA observation/seismic JSON document with num_events
+    events.
+
+    Mirrors the live feed: coordinates and magnitudes are strings, depths
+    integers, and only felt events carry a degree and a locality.
+    """
+    rnd = random.Random(seed)
+    data = []
+    for _ in range(num_events):
+        time = start + dt.timedelta(seconds=rnd.randint(0, 90 * 24 * 3600))
+        felt = rnd.random() < 0.2
+        data.append({
+            "googlemapref": "",
+            "degree": rnd.choice(["II", "III", "IV"]) if felt else None,
+            "sismoId": time.strftime("%Y%m%d%H%M%S"),
+            "dataUpdate": (time + dt.timedelta(hours=1)).isoformat(),
+            "magType": "L",
+            "obsRegion": rnd.choice(IVAR_REGIONS),
+            "lon": f"{-28.3 + rnd.uniform(-1.3, 1.3):.4f}",
+            "source": "AZO",
+            "depth": rnd.randint(0, 25),
+            "tensorRef": "",
+            "sensed": True if felt else None,
+            "shakemapid": "0",
+            "time": time.isoformat(),
+            "lat": f"{38.6 + rnd.uniform(-0.6, 0.6):.4f}",
+            "shakemapref": "",
+            "local": rnd.choice(["Velas", "Horta", "Rosais"]) if felt
+            else None,
+            "magnitud": f"{rnd.uniform(1, 5):.1f}",
+        })
+
+    data.sort(key=lambda e: e["time"], reverse=True)
+    return json.dumps({
+        "idArea": 3, "country": "PT",
+        "lastSismicActivityDate": data[0]["time"] if data else None,
+        "updateDate": start.isoformat(), "owner": "IPMA", "data": data,
+    }).encode("utf-8")
+
+
+def synthetic_catalog(num_events, seed=0, start=dt.datetime(2022, 3, 19)):
+    """Returns a merged catalog DataFrame, as built by the orchestrator,
+    with num_events events spread over the Azores and 90 days."""
+    rng = np.random.default_rng(seed)
+    seconds = rng.integers(0, 90 * 24 * 3600, num_events)
+    date = pd.Timestamp(start) + pd.to_timedelta(np.sort(seconds), unit="s")
+    source = np.where(rng.random(num_events) < 0.5, "IVAR", "IPMA")
+
+    return pd.DataFrame({
+        "event_id": [f"{source[i]}{i:09d}" for i in range(num_events)],
+        "source": source,
+        "date": date,
+        "lat": 38.6 + rng.uniform(-0.6, 0.6, num_events),
+        "lon": -28.3 + rng.uniform(-1.3, 1.3, num_events),
+        "depth": rng.uniform(0, 25, num_events),
+        # Gutenberg-Richter like, many small events and few large ones
+        "magnitude": np.round(1 + rng.exponential(0.5, num_events), 1),
+        "magnitude_type": "ML",
+        "obs_region": rng.choice(IVAR_REGIONS, num_events),
+    })
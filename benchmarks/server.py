@@ -0,0 +1,94 @@
+"""Local stand-in for the IPMA and IVAR servers.
+
+Serves feed documents from memory on the paths of the live services, so
+that the crawlers' real crawl() methods can be benchmarked offline:
+
+    with FeedServer() as server:
+        server.feeds[IPMA_FEED_PATH] = load_fixture("ipma_azores.json")
+        with stand_in_sources(server.url):
+            IpmaCrawler("azores").crawl()
+"""
+
+import contextlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from crawlers.ipma import IpmaCrawler
+from crawlers.ivar import IvarCrawler
+
+IPMA_FEED_PATH = "/open-data/observation/seismic/3.json"
+IVAR_FEED_PATH = IvarCrawler.IVAR_SEISMIC_ENDPOINT
+
+CONTENT_TYPES = {".json": "application/json", ".xml": "application/xml"}
+
+
+class _FeedHandler(BaseHTTPRequestHandler):
+    # Keep-alive, as the crawlers share a pooled session
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        content = self.server.feeds.get(self.path.split("?")[0])
+        if content is None:
+            self.send_error(404)
+            return
+
+        # No ETag or Last-Modified, so every crawl downloads and parses the
+        # feed instead of hitting the response cache
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPES.get(
+            self.path[self.path.rfind("."):], "application/octet-stream"))
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FeedServer:
+    """HTTP server on a free local port, serving self.feeds (path: bytes)
+    from a daemon thread."""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self._server = ThreadingHTTPServer((host, port), _FeedHandler)
+        self._server.daemon_threads = True
+        self._server.feeds = {}
+        self._thread = None
+
+    @property
+    def feeds(self):
+        return self._server.feeds
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True, name="feed-server")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+@contextlib.contextmanager
+def stand_in_sources(url):
+    """Points the IPMA and IVAR crawlers at a FeedServer's url."""
+    base_urls = (IpmaCrawler.IPMA_BASE_URL, IvarCrawler.IVAR_BASE_URL)
+    IpmaCrawler.IPMA_BASE_URL = f"{url}/open-data"
+    IvarCrawler.IVAR_BASE_URL = url
+    try:
+        yield
+    finally:
+        IpmaCrawler.IPMA_BASE_URL, IvarCrawler.IVAR_BASE_URL = base_urls
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+TILE_SIZE_PIXELS = 256
+CELL_SIZE_PIXELS = 8
+
+
+def cell_size_for_zoom(zoom, cell_pixels=CELL_SIZE_PIXELS):
+    """Cell size in degrees spanning about cell_pixels on a web mercator map
+    at the given zoom level."""
+    return 360 / (2 ** zoom) / TILE_SIZE_PIXELS * cell_pixels
+
+
+def seismic_energy(magnitude):
+    """Radiated energy in joules, log10(E) = 1.5 M + 4.8."""
+    return 10 ** (1.5 * np.asarray(magnitude, dtype=float) + 4.8)
+
+
+def aggregate_cells(data, cell_size):
+    """Bins events on a regular lat/lon grid.
+
+    Returns one row per non-empty cell with its center ("lat", "lon") and:
+    "count", "magnitude" (max), "mean_magnitude", "energy" (sum, in J),
+    "depth" (min) and, when the events have it, "hours_since" (min). The
+    reductions run on the events sorted by cell, one reduceat per column.
+    """
+    lat = data["lat"].to_numpy(dtype=float, na_value=np.nan)
+    lon = data["lon"].to_numpy(dtype=float, na_value=np.nan)
+    valid = ~(np.isnan(lat) | np.isnan(lon))
+
+    rows = np.floor(lat[valid] / cell_size).astype(np.int64)
+    cols = np.floor(lon[valid] / cell_size).astype(np.int64)
+    if not len(rows):
+        return pd.DataFrame(columns=["lat", "lon", "count", "magnitude",
+                                     "mean_magnitude", "energy", "depth"])
+
+    min_col = cols.min()
+    keys = rows * (cols.max() - min_col + 1) + (cols - min_col)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    counts = np.diff(np.r_[starts, len(keys)])
+
+    def sorted_column(name):
+        values = data[name].to_numpy(dtype=float, na_value=np.nan)
+        return values[valid][order]
+
+    cells = pd.DataFrame({
+        "lat": (rows[order][starts] + 0.5) * cell_size,
+        "lon": (cols[order][starts] + 0.5) * cell_size,
+        "count": counts})
+
+    if "magnitude" in data.columns:
+        magnitude = sorted_column("magnitude")
+        cells["magnitude"] = np.fmax.reduceat(magnitude, starts)
+        cells["mean_magnitude"] = np.add.reduceat(
+            np.nan_to_num(magnitude), starts) / np.add.reduceat(
+            ~np.isnan(magnitude), starts).clip(min=1)
+        cells["energy"] = np.add.reduceat(
+            np.nan_to_num(seismic_energy(magnitude)), starts)
+    for name in ("depth", "hours_since"):
+        if name in data.columns:
+            cells[name] = np.fmin.reduceat(sorted_column(name), starts)
+
+    return cells
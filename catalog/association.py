@@ -0,0 +1,201 @@
+import numpy as np
+import pandas as pd
+
+from catalog.schema import apply_schema
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+
+DEFAULT_TIME_TOLERANCE = pd.Timedelta(seconds=15)
+DEFAULT_DISTANCE_KM = 30.0
+DEFAULT_MAGNITUDE_TOLERANCE = 1.0
+
+# Source whose record is kept when the same event is reported by several
+# sources. IVAR is the regional network of the Azores.
+DEFAULT_PRIORITY = ("IVAR", "IPMA")
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + \
+        np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _expand_ranges(lo, hi):
+    """Returns (owner, position) for every position in each [lo, hi)."""
+    counts = hi - lo
+    owner = np.repeat(np.arange(len(lo)), counts)
+    starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+    return owner, np.arange(counts.sum()) + starts
+
+
+def associate(a, b,
+              time_tolerance=DEFAULT_TIME_TOLERANCE,
+              distance_km=DEFAULT_DISTANCE_KM,
+              magnitude_tolerance=DEFAULT_MAGNITUDE_TOLERANCE):
+    """Matches the events of a to the events of b one to one.
+
+    Two events can match when they are within all three tolerances. Each
+    event keeps its best match, scored by the sum of the differences
+    relative to their tolerances, and is used at most once.
+
+    b is indexed once on a spatial grid with cells as wide as distance_km,
+    sorted by (cell, time) so that the candidates of an event of a are
+    nine contiguous runs found by binary search. This is O((n + m) log m)
+    plus the number of candidates, instead of comparing every pair.
+
+    Returns a DataFrame with the positional indices of the matched events
+    ("a", "b") and their time, distance and magnitude differences.
+    """
+    columns = ["a", "b", "time_diff", "distance_km", "magnitude_diff"]
+    if a.empty or b.empty:
+        return pd.DataFrame(columns=columns)
+
+    tolerance_ms = int(pd.Timedelta(time_tolerance) / pd.Timedelta(1, "ms"))
+    # Events without coordinates cannot be placed on the grid nor matched
+    located_a = np.flatnonzero(a["lat"].notna().to_numpy()
+                               & a["lon"].notna().to_numpy())
+    located_b = np.flatnonzero(b["lat"].notna().to_numpy()
+                               & b["lon"].notna().to_numpy())
+    if not len(located_a) or not len(located_b):
+        return pd.DataFrame(columns=columns)
+
+    time_a = a["date"].to_numpy("datetime64[ms]").astype(np.int64)[located_a]
+    time_b = b["date"].to_numpy("datetime64[ms]").astype(np.int64)[located_b]
+    lat_a = a["lat"].to_numpy(float)[located_a]
+    lon_a = a["lon"].to_numpy(float)[located_a]
+    lat_b = b["lat"].to_numpy(float)[located_b]
+    lon_b = b["lon"].to_numpy(float)[located_b]
+    mag_a = a["magnitude"].to_numpy(float)[located_a]
+    mag_b = b["magnitude"].to_numpy(float)[located_b]
+
+    # Grid cells at least distance_km wide, longitude cells are widened
+    # for the narrowest parallel in the data
+    cell_lat = distance_km / KM_PER_DEGREE
+    max_abs_lat = min(np.max(np.abs(np.concatenate([lat_a, lat_b]))), 89)
+    cell_lon = cell_lat / np.cos(np.radians(max_abs_lat))
+
+    row_a, col_a = np.floor(lat_a / cell_lat), np.floor(lon_a / cell_lon)
+    row_b, col_b = np.floor(lat_b / cell_lat), np.floor(lon_b / cell_lon)
+    min_row = min(row_a.min(), row_b.min()) - 1
+    min_col = min(col_a.min(), col_b.min()) - 1
+    num_cols = int(max(col_a.max(), col_b.max()) - min_col) + 2
+
+    def cell_id(rows, cols):
+        return (rows - min_row).astype(np.int64) * num_cols + \
+            (cols - min_col).astype(np.int64)
+
+    # Cells are numbered by their rank among the cells of b, so that the
+    # (cell, time) keys stay within int64 however fine the grid
+    cells_b, cell_rank_b = np.unique(cell_id(row_b, col_b),
+                                     return_inverse=True)
+    min_time = min(time_a.min(), time_b.min()) - tolerance_ms
+    time_span = max(time_a.max(), time_b.max()) + tolerance_ms - min_time + 1
+    if len(cells_b) * int(time_span) >= np.iinfo(np.int64).max:
+        raise ValueError(
+            f"{len(cells_b)} grid cells over {time_span} ms are too many "
+            f"to associate at once, split the events by time")
+
+    # Composite (cell, time) keys of b, sorted
+    keys_b = cell_rank_b.astype(np.int64) * time_span + (time_b - min_time)
+    order_b = np.argsort(keys_b, kind="stable")
+    keys_b = keys_b[order_b]
+
+    owners, positions = [], []
+    for d_row in (-1, 0, 1):
+        for d_col in (-1, 0, 1):
+            cells = cell_id(row_a + d_row, col_a + d_col)
+            rank = np.minimum(np.searchsorted(cells_b, cells),
+                              len(cells_b) - 1)
+            in_b = cells_b[rank] == cells
+            base = rank * time_span
+            lo = np.searchsorted(
+                keys_b, base + (time_a - tolerance_ms - min_time), "left")
+            hi = np.searchsorted(
+                keys_b, base + (time_a + tolerance_ms - min_time), "right")
+            # Cells without events of b have no candidates
+            owner, position = _expand_ranges(lo, np.where(in_b, hi, lo))
+            owners.append(owner)
+            positions.append(position)
+
+    idx_a = np.concatenate(owners)
+    idx_b = order_b[np.concatenate(positions)]
+
+    distance = haversine_km(lat_a[idx_a], lon_a[idx_a],
+                            lat_b[idx_b], lon_b[idx_b])
+    magnitude_diff = np.abs(mag_a[idx_a] - mag_b[idx_b])
+    time_diff = np.abs(time_a[idx_a] - time_b[idx_b])
+
+    within = (distance <= distance_km) & \
+        (magnitude_diff <= magnitude_tolerance)
+    idx_a, idx_b = idx_a[within], idx_b[within]
+    time_diff, distance = time_diff[within], distance[within]
+    magnitude_diff = magnitude_diff[within]
+
+    # Greedy one to one assignment: candidates are taken best score first,
+    # when neither of their events is matched yet
+    score = (time_diff / max(tolerance_ms, 1) + distance / distance_km
+             + magnitude_diff / max(magnitude_tolerance, 1e-9))
+    used_a = np.zeros(len(lat_a), dtype=bool)
+    used_b = np.zeros(len(lat_b), dtype=bool)
+    accepted = []
+    for candidate in np.argsort(score, kind="stable"):
+        i, j = idx_a[candidate], idx_b[candidate]
+        if not (used_a[i] or used_b[j]):
+            used_a[i] = used_b[j] = True
+            accepted.append(candidate)
+    accepted = np.array(accepted, dtype=np.int64)
+
+    candidates = pd.DataFrame({
+        "a": located_a[idx_a[accepted]],
+        "b": located_b[idx_b[accepted]],
+        "time_diff": pd.to_timedelta(time_diff[accepted], unit="ms"),
+        "distance_km": distance[accepted],
+        "magnitude_diff": magnitude_diff[accepted]})
+
+    return candidates[columns].sort_values(by="a", ignore_index=True)
+
+
+def preferred_events(catalog, priority=DEFAULT_PRIORITY, **tolerances):
+    """Collapses events reported by several sources into one record.
+
+    Sources are merged in priority order: the events of each source are
+    associated with the catalog built so far, matched events only add
+    their id to the "associated_ids" of the record already kept, and the
+    unmatched ones are appended.
+    """
+    present = list(catalog["source"].dropna().unique())
+    sources = [s for s in priority if s in present] + \
+        [s for s in present if s not in priority]
+    if not sources:
+        return catalog.assign(associated_ids=pd.Series(dtype=object))
+
+    def tagged_ids(df):
+        return (df["source"].astype(str) + ":" +
+                df["event_id"].astype(str)).to_numpy(dtype=object)
+
+    preferred = catalog[catalog["source"] == sources[0]]
+    preferred = preferred.assign(associated_ids=tagged_ids(preferred))
+    for source in sources[1:]:
+        events = catalog[catalog["source"] == source]
+        pairs = associate(preferred, events, **tolerances)
+
+        matched_a = pairs["a"].to_numpy(dtype=np.int64)
+        matched_b = pairs["b"].to_numpy(dtype=np.int64)
+
+        associated_ids = preferred["associated_ids"].to_numpy(copy=True)
+        associated_ids[matched_a] = associated_ids[matched_a] + ";" + \
+            tagged_ids(events.iloc[matched_b])
+        preferred = preferred.assign(associated_ids=associated_ids)
+
+        unmatched = np.ones(len(events), dtype=bool)
+        unmatched[matched_b] = False
+        events = events[unmatched]
+        preferred = pd.concat(
+            [preferred, events.assign(associated_ids=tagged_ids(events))],
+            ignore_index=True)
+
+    # Concatenating sources turned their categoricals into objects
+    return apply_schema(preferred).sort_values(
+        by="date", ascending=False, ignore_index=True)
@@ -0,0 +1,272 @@
+"""Read-only event datasets shared by every session of the process.
+
+st.experimental_memo hands each caller its own deserialized copy of a
+cached DataFrame, so concurrent sessions hold as many copies of the
+catalog. A SharedDataset is built once per dataset version and every
+session references the same object. Only query parameters and selections
+are held per session.
+
+The frame of a SharedDataset is converted from an Arrow table. Its
+numeric and date columns are read-only numpy views of the Arrow buffers,
+and its text and list columns are Arrow arrays. Anything that would
+change the frame for every session raises instead: setting values through
+the loc, iloc, at and iat indexers, adding, replacing or removing a
+column, in-place operators and methods called with inplace=True.
+Sessions derive new frames with assign.
+"""
+
+import functools
+import inspect
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+
+from catalog.query import CatalogIndex
+from catalog.schema import TEXT, apply_schema, event_keys
+
+
+def _arrow_types(arrow_type):
+    if pa.types.is_list(arrow_type):
+        return pd.ArrowDtype(arrow_type)
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return TEXT
+    return None
+
+
+def _read_only(*args, **kwargs):
+    raise ValueError("Shared frames are read-only, derive a new frame "
+                     "with assign instead")
+
+
+class _ReadOnlyIndexer:
+    """The loc, iloc, at or iat indexer of a ReadOnlyFrame, which gets
+    values but does not set them."""
+
+    def __init__(self, indexer):
+        self._indexer = indexer
+
+    def __call__(self, axis=None):
+        return _ReadOnlyIndexer(self._indexer(axis))
+
+    def __getitem__(self, key):
+        return self._indexer[key]
+
+    __setitem__ = _read_only
+
+    def __getattr__(self, name):
+        return getattr(self._indexer, name)
+
+
+def _not_in_place(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, inplace=False, **kwargs):
+        if inplace:
+            _read_only()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+class ReadOnlyFrame(pd.DataFrame):
+    """A DataFrame that can not be changed in place.
+
+    The frames derived from it, by assign, take, a selection or a method
+    called without inplace=True, are plain DataFrames.
+    """
+
+    @property
+    def _constructor(self):
+        return pd.DataFrame
+
+    @property
+    def loc(self):
+        return _ReadOnlyIndexer(super().loc)
+
+    @property
+    def iloc(self):
+        return _ReadOnlyIndexer(super().iloc)
+
+    @property
+    def at(self):
+        return _ReadOnlyIndexer(super().at)
+
+    @property
+    def iat(self):
+        return _ReadOnlyIndexer(super().iat)
+
+    def __setattr__(self, name, value):
+        # Columns are set through __setitem__, the axes through their
+        # properties
+        if name in ("columns", "index"):
+            _read_only()
+        super().__setattr__(name, value)
+
+    __setitem__ = __delitem__ = insert = pop = update = _read_only
+    __iadd__ = __isub__ = __imul__ = __itruediv__ = __ifloordiv__ = \
+        __imod__ = __ipow__ = __iand__ = __ior__ = __ixor__ = _read_only
+
+
+# Methods such as sort_values, rename or fillna raise when called with
+# inplace=True
+for _name, _method in inspect.getmembers(pd.DataFrame, inspect.isfunction):
+    if not _name.startswith("_") and \
+            "inplace" in inspect.signature(_method).parameters:
+        setattr(ReadOnlyFrame, _name, _not_in_place(_method))
+
+
+def arrow_frame(data):
+    """data with its columns backed by one Arrow table and read-only."""
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    # One block per column, so numeric columns are views of the table
+    # instead of being consolidated into new arrays
+    frame = apply_schema(table.to_pandas(split_blocks=True,
+                                         types_mapper=_arrow_types))
+    for name in frame.columns:
+        values = frame[name].array
+        if hasattr(values, "_ndarray"):
+            # Columns Arrow had to copy, such as dates with missing values
+            values._ndarray.flags.writeable = False
+    frame = ReadOnlyFrame(frame)
+    frame.attrs = dict(data.attrs)
+    return frame
+
+
+class SharedDataset:
+    """One version of the events, with its query index, the positions of
+    its recent queries and the objects derived from it, shared by every
+    session.
+
+    previous is the dataset of the same events at an older version, whose
+    derived objects this one takes over.
+    """
+    MAX_QUERIES = 64
+
+    def __init__(self, data, version, previous=None):
+        self.version = version
+        self.frame = arrow_frame(data)
+        self.frame.attrs["version"] = version
+        self._index = None
+        self._keys = None
+        self._queries = OrderedDict()
+        self._derived = {}
+        self._inherited = {} if previous is None else \
+            {**previous._inherited, **previous._derived}
+        self._lock = threading.Lock()
+        self._derive_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def index(self):
+        """The CatalogIndex of the frame, built on first use."""
+        with self._lock:
+            if self._index is None:
+                self._index = CatalogIndex(self.frame)
+            return self._index
+
+    @property
+    def keys(self):
+        """The event_keys of the frame, computed on first use."""
+        with self._lock:
+            if self._keys is None:
+                self._keys = event_keys(self.frame)
+                self._keys.flags.writeable = False
+            return self._keys
+
+    def positions(self, query):
+        """Sorted positions of the events matching query. The positions of
+        the last MAX_QUERIES queries are kept."""
+        key = query.key()
+        with self._lock:
+            if key in self._queries:
+                self._queries.move_to_end(key)
+                return self._queries[key]
+        positions = query.positions(self.index)
+        positions.flags.writeable = False
+        with self._lock:
+            self._queries[key] = positions
+            while len(self._queries) > self.MAX_QUERIES:
+                self._queries.popitem(last=False)
+        return positions
+
+    def derived(self, name, update):
+        """The object derived from the events under name, such as their
+        statistics, built on first use.
+
+        update(previous) returns it, previous being the object of an older
+        version or None, so that objects updated in place only process
+        what changed since. Objects live as long as their dataset's key
+        is held by the DatasetRegistry.
+        """
+        with self._derive_lock:
+            if name not in self._derived:
+                self._derived[name] = update(self._inherited.pop(name, None))
+            return self._derived[name]
+
+    def select(self, query):
+        """The events matching query. The frame itself when they all do,
+        otherwise a new frame of the matching rows."""
+        positions = self.positions(query)
+        if len(positions) == len(self.frame):
+            return self.frame
+        return self.frame.take(positions)
+
+
+class DatasetRegistry:
+    """The SharedDatasets of the process, by key and version.
+
+    A key identifies what a dataset holds, such as a source and a start
+    date, and its version the data it was built from. Getting a key at a
+    new version builds it from the held older version, if any, and drops
+    that one. Sessions still using it keep it alive until their run ends.
+    At most max_datasets datasets are held, the least recently used are
+    dropped first, along with what was derived from them.
+    """
+
+    def __init__(self, max_datasets=8):
+        self.max_datasets = max_datasets
+        self._datasets = OrderedDict()
+        self._build_locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version, build):
+        """Returns the dataset of key at version. build(previous) returns
+        its SharedDataset when it is not held yet, previous being the held
+        dataset of key at another version or None. Concurrent gets of the
+        same key and version build it once."""
+        with self._lock:
+            dataset = self._datasets.get((key, version))
+            if dataset is not None:
+                self._datasets.move_to_end((key, version))
+                return dataset
+            build_lock = self._build_locks.setdefault(
+                (key, version), threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                dataset = self._datasets.get((key, version))
+            if dataset is None:
+                with self._lock:
+                    previous = next(
+                        (held for (held_key, _), held
+                         in reversed(self._datasets.items())
+                         if held_key == key), None)
+                dataset = build(previous)
+                with self._lock:
+                    for held_key, held_version in list(self._datasets):
+                        if held_key == key:
+                            del self._datasets[(held_key, held_version)]
+                    self._datasets[(key, version)] = dataset
+                    while len(self._datasets) > self.max_datasets:
+                        self._datasets.popitem(last=False)
+
+        with self._lock:
+            self._build_locks.pop((key, version), None)
+        return dataset
+
+    def datasets(self):
+        """The held datasets, least recently used first."""
+        with self._lock:
+            return list(self._datasets.values())
@@ -0,0 +1,215 @@
+import json
+import os
+import tempfile
+import time
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from catalog.schema import text_lists_to_strings, widen_floats
+
+DEFAULT_CHUNK_SIZE = 50000
+
+QUAKEML_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<q:quakeml xmlns:q="http://quakeml.org/xmlns/quakeml/1.2" '
+    'xmlns="http://quakeml.org/xmlns/bed/1.2">\n'
+    '<eventParameters publicID="smi:local/az-seismic/catalog">\n')
+QUAKEML_FOOTER = '</eventParameters>\n</q:quakeml>\n'
+
+
+def _chunks(data, chunk_size, text=False):
+    """Slices of data. Text formats get float32 columns widened, and
+    with text=True list columns joined."""
+    for start in range(0, len(data), chunk_size):
+        chunk = data.iloc[start:start + chunk_size]
+        if text:
+            chunk = text_lists_to_strings(chunk)
+        yield widen_floats(chunk)
+
+
+def iter_csv(data, chunk_size=DEFAULT_CHUNK_SIZE):
+    for i, chunk in enumerate(_chunks(data, chunk_size, text=True)):
+        yield chunk.to_csv(header=i == 0, index=False).encode("utf-8")
+    if data.empty:
+        yield data.to_csv(index=False).encode("utf-8")
+
+
+def iter_geojson(data, chunk_size=DEFAULT_CHUNK_SIZE):
+    """A FeatureCollection of Points, the other columns as properties."""
+    yield b'{"type": "FeatureCollection", "features": ['
+    properties = [c for c in data.columns if c not in ("lat", "lon")]
+    for i, chunk in enumerate(_chunks(data, chunk_size)):
+        records = json.loads(chunk[properties].to_json(
+            orient="records", date_format="iso"))
+        coordinates = np.column_stack([
+            chunk["lon"].to_numpy(dtype=float),
+            chunk["lat"].to_numpy(dtype=float)]).tolist()
+        features = json.dumps([
+            {"type": "Feature",
+             "geometry": {"type": "Point", "coordinates": point},
+             "properties": record}
+            for point, record in zip(coordinates, records)])
+        yield ("," if i else "").encode("utf-8") + \
+            features[1:-1].encode("utf-8")
+    yield b']}\n'
+
+
+def _quakeml_events(chunk):
+    source = chunk["source"].astype(str) if "source" in chunk.columns \
+        else pd.Series("", index=chunk.index)
+    ids = (source + "/" + chunk["event_id"].astype(str)).map(
+        lambda public_id: escape(public_id, {'"': "&quot;"}))
+    times = chunk["date"].dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    magnitude_types = chunk["magnitude_type"].astype(str) \
+        if "magnitude_type" in chunk.columns \
+        else pd.Series("", index=chunk.index)
+    # QuakeML depths are in meters
+    depths = chunk["depth"] * 1000 if "depth" in chunk.columns \
+        else pd.Series(np.nan, index=chunk.index)
+
+    for public_id, time, lat, lon, depth, magnitude, magnitude_type in zip(
+            ids, times, chunk["lat"], chunk["lon"], depths,
+            chunk["magnitude"], magnitude_types):
+        depth_xml = "" if pd.isna(depth) else \
+            f"<depth><value>{depth:.0f}</value></depth>"
+        type_xml = "" if pd.isna(magnitude_type) or \
+            magnitude_type in ("", "nan", "<NA>", "None") \
+            else f"<type>{escape(magnitude_type)}</type>"
+        yield (
+            f'<event publicID="smi:local/event/{public_id}">'
+            f'<preferredOriginID>smi:local/origin/{public_id}'
+            f'</preferredOriginID>'
+            f'<preferredMagnitudeID>smi:local/magnitude/{public_id}'
+            f'</preferredMagnitudeID>'
+            f'<origin publicID="smi:local/origin/{public_id}">'
+            f'<time><value>{time}</value></time>'
+            f'<latitude><value>{lat}</value></latitude>'
+            f'<longitude><value>{lon}</value></longitude>'
+            f'{depth_xml}</origin>'
+            f'<magnitude publicID="smi:local/magnitude/{public_id}">'
+            f'<mag><value>{magnitude}</value></mag>{type_xml}'
+            f'<originID>smi:local/origin/{public_id}</originID>'
+            f'</magnitude></event>\n')
+
+
+def iter_quakeml(data, chunk_size=DEFAULT_CHUNK_SIZE):
+    """A QuakeML 1.2 document with one origin and magnitude per event."""
+    yield QUAKEML_HEADER.encode("utf-8")
+    for chunk in _chunks(data, chunk_size, text=True):
+        yield "".join(_quakeml_events(chunk)).encode("utf-8")
+    yield QUAKEML_FOOTER.encode("utf-8")
+
+
+def write_parquet(data, path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Writes data one row group per chunk, so only one chunk is converted
+    to Arrow at a time."""
+    # Without the pandas metadata, which names the Arrow list dtypes in a
+    # way pandas.read_parquet can not parse back
+    schema = pa.Schema.from_pandas(data, preserve_index=False) \
+        .remove_metadata()
+    with pq.ParquetWriter(path, schema) as writer:
+        for start in range(0, len(data), chunk_size):
+            chunk = data.iloc[start:start + chunk_size]
+            writer.write_table(pa.Table.from_pandas(
+                chunk, schema=schema, preserve_index=False))
+
+
+# Format name: (file extension, MIME type, chunk iterator). Parquet is not
+# a byte stream and is written by write_parquet instead.
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv", iter_csv),
+    "Parquet": ("parquet", "application/vnd.apache.parquet", None),
+    "GeoJSON": ("geojson", "application/geo+json", iter_geojson),
+    "QuakeML": ("xml", "application/xml", iter_quakeml),
+}
+
+
+class ExportCache:
+    """Export files named after the fingerprint of the query that selected
+    the exported events.
+
+    Layout: <root>/<fingerprint>.<extension>
+    """
+    DEFAULT_ROOT = os.path.join("data", "exports")
+    MAX_FILES = 16
+    # Files used in the last GRACE_SECONDS are never pruned, so that a
+    # session serving an export does not lose it to another one exporting
+    GRACE_SECONDS = 600
+
+    def __init__(self, root=None):
+        self.root = root or os.environ.get("SEISMIC_EXPORT_DIR",
+                                           self.DEFAULT_ROOT)
+
+    def path(self, fingerprint, export_format):
+        extension = EXPORT_FORMATS[export_format][0]
+        return os.path.join(self.root, f"{fingerprint}.{extension}")
+
+    def get(self, fingerprint, export_format):
+        """Returns the path of the export, or None if it was not written
+        yet. The export counts as used, it is kept for GRACE_SECONDS."""
+        path = self.path(fingerprint, export_format)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def export(self, data, export_format, fingerprint,
+               chunk_size=DEFAULT_CHUNK_SIZE):
+        """Returns the path of the export, writing it chunk by chunk if
+        this fingerprint was not exported to this format yet."""
+        if export_format not in EXPORT_FORMATS:
+            raise Exception(
+                f"Invalid export format {export_format}. "
+                f"Select one of {list(EXPORT_FORMATS)}.")
+        path = self.get(fingerprint, export_format)
+        if path is not None:
+            return path
+        path = self.path(fingerprint, export_format)
+
+        # Sessions exporting the same fingerprint each write their own
+        # temporary file, the last one replaces the others' identical file
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self.root, prefix=f".{fingerprint}.", suffix=".tmp")
+        os.close(fd)
+        try:
+            iterator = EXPORT_FORMATS[export_format][2]
+            if iterator is None:
+                write_parquet(data, tmp_path, chunk_size)
+            else:
+                with open(tmp_path, "wb") as fp:
+                    for chunk in iterator(data, chunk_size):
+                        fp.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        self._prune()
+        return path
+
+    def _prune(self):
+        mtimes = {}
+        for filename in os.listdir(self.root):
+            if filename.endswith(".tmp"):
+                continue
+            path = os.path.join(self.root, filename)
+            try:
+                mtimes[path] = os.path.getmtime(path)
+            except FileNotFoundError:
+                # Pruned by another session meanwhile
+                continue
+
+        paths = sorted(mtimes, key=mtimes.get, reverse=True)
+        used_since = time.time() - self.GRACE_SECONDS
+        for path in paths[self.MAX_FILES:]:
+            if mtimes[path] < used_since:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,110 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from catalog.spatial_index import GridIndex, points_in_polygon
+
+
+def _to_ns(values):
+    return np.asarray(values).astype("datetime64[ns]").astype(np.int64)
+
+
+class CatalogIndex:
+    """Read-only indexes over one version of an event catalog.
+
+    Holds the positions of the events sorted by date, for binary search on
+    time ranges, and a GridIndex for spatial predicates. Positions refer to
+    the rows of the DataFrame the index was built from.
+    """
+
+    def __init__(self, data):
+        self.num_events = len(data)
+        self.dates = _to_ns(data["date"].to_numpy())
+        self.date_order = np.argsort(self.dates, kind="stable")
+        self.sorted_dates = self.dates[self.date_order]
+
+        self.lat = data["lat"].to_numpy(dtype=float, na_value=np.nan)
+        self.lon = data["lon"].to_numpy(dtype=float, na_value=np.nan)
+        self.magnitude = data["magnitude"].to_numpy(dtype=float,
+                                                    na_value=np.nan)
+        self.spatial = GridIndex(self.lat, self.lon)
+
+
+class EventQuery:
+    """All the predicates of one selection, evaluated in a single pass.
+
+    Ranges are (min, max) tuples, inclusive on both ends, or None when the
+    predicate is not set. polygon is a sequence of (lat, lon) vertices.
+    """
+
+    def __init__(self, time=None, lat=None, lon=None, magnitude=None,
+                 polygon=None):
+        self.time = tuple(pd.Timestamp(t) for t in time) if time else None
+        self.lat = tuple(map(float, lat)) if lat else None
+        self.lon = tuple(map(float, lon)) if lon else None
+        self.magnitude = tuple(map(float, magnitude)) if magnitude else None
+        self.polygon = tuple(tuple(map(float, v)) for v in polygon) \
+            if polygon else None
+
+    def key(self):
+        """Hashable fingerprint of the predicates, to cache results by."""
+        time = tuple(t.value for t in self.time) if self.time else None
+        return (time, self.lat, self.lon, self.magnitude, self.polygon)
+
+    def fingerprint(self, *extra):
+        """Hex digest of the predicates and of any extra values, such as
+        a dataset version, stable across processes."""
+        return hashlib.sha1(repr((self.key(),) + extra).encode()).hexdigest()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __eq__(self, other):
+        return isinstance(other, EventQuery) and self.key() == other.key()
+
+    def _candidates(self, index):
+        lo, hi = 0, index.num_events
+        if self.time:
+            lo = np.searchsorted(index.sorted_dates, self.time[0].value,
+                                 "left")
+            hi = np.searchsorted(index.sorted_dates, self.time[1].value,
+                                 "right")
+
+        # Start from the spatial index instead when the box is the more
+        # selective predicate, the time range is then checked per event
+        if self.lat and self.lon:
+            bbox = (self.lat[0], self.lon[0], self.lat[1], self.lon[1])
+            if index.spatial.count_candidates(*bbox) < hi - lo:
+                return index.spatial._candidates(*bbox), bool(self.time)
+
+        return index.date_order[lo:hi], False
+
+    def positions(self, index):
+        """Returns the sorted positions of the matching events."""
+        candidates, check_time = self._candidates(index)
+
+        predicates = [(index.lat, self.lat),
+                      (index.lon, self.lon),
+                      (index.magnitude, self.magnitude)]
+        if check_time:
+            predicates.append((index.dates,
+                               tuple(t.value for t in self.time)))
+
+        mask = np.ones(len(candidates), dtype=bool)
+        for values, bounds in predicates:
+            if bounds:
+                selected = values[candidates]
+                mask &= (selected >= bounds[0]) & (selected <= bounds[1])
+        candidates = candidates[mask]
+
+        if self.polygon:
+            inside = points_in_polygon(index.lat[candidates],
+                                       index.lon[candidates],
+                                       np.asarray(self.polygon))
+            candidates = candidates[inside]
+
+        return np.sort(candidates)
+
+    def apply(self, data, index):
+        return data.iloc[self.positions(index)]
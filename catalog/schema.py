@@ -0,0 +1,162 @@
+"""The event schema shared by every source.
+
+Crawlers, the store and the merged catalogs cast their frames with
+apply_schema, so that a column has the same compact dtype wherever it
+comes from:
+
+- float32 coordinates and depths, about 1 m and 1 cm of precision at the
+  Azores. Magnitudes stay float64: a float32 2.3 is slightly below 2.3
+  and would fall out of a selection starting at 2.3.
+- categoricals for the low cardinality text columns
+- Arrow list columns instead of Python lists
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+TEXT = pd.StringDtype("pyarrow")
+TEXT_LIST = pd.ArrowDtype(pa.list_(pa.string()))
+
+# Decimals of the float32 columns in text formats, about their precision
+FLOAT32_DECIMALS = {"lat": 5, "lon": 5, "depth": 3}
+
+# Column: dtype. Sources leave out the columns they do not report.
+EVENT_SCHEMA = {
+    "event_id": TEXT,
+    "source": "category",
+    "date": "datetime64[ns]",
+    "lat": "float32",
+    "lon": "float32",
+    "depth": "float32",
+    "magnitude": "float64",
+    "magnitude_type": "category",
+    "updated_at": "datetime64[ns]",
+    "origin_agency": "category",
+    "origin_id": TEXT,
+    "degree": "category",
+    "local": "category",
+    "obs_region": "category",
+    "sentidos": TEXT_LIST,
+    "regioes": TEXT_LIST,
+}
+
+
+def _text_lists(values):
+    if values.dtype == TEXT_LIST:
+        return values
+    # Lists, or numpy arrays when read from Parquet without the schema
+    lists = [None if v is None else list(v) for v in values]
+    return pd.Series(pd.arrays.ArrowExtensionArray(
+        pa.array(lists, type=TEXT_LIST.pyarrow_dtype)), index=values.index)
+
+
+def apply_schema(df):
+    """Casts the columns of df to their EVENT_SCHEMA dtype. Other columns
+    are kept as they are."""
+    columns = {}
+    for name, dtype in EVENT_SCHEMA.items():
+        if name not in df.columns:
+            continue
+        values = df[name]
+        if dtype is TEXT_LIST:
+            columns[name] = _text_lists(values)
+        elif dtype == "category":
+            # Concatenated categoricals with different categories come
+            # back as objects, they are categorized again
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                if values.empty:
+                    # Nothing to infer text categories from, as in the
+                    # frames of empty feeds
+                    values = values.astype(str)
+                columns[name] = values.astype("category")
+        elif values.dtype != dtype:
+            columns[name] = values.astype(dtype)
+    return df.assign(**columns) if columns else df
+
+
+def widen_floats(df):
+    """Casts the float32 columns of df to float64, rounded to
+    FLOAT32_DECIMALS, so that they print as short as they were read."""
+    columns = {}
+    for name in df.columns:
+        if df[name].dtype == "float32":
+            values = df[name].astype(float)
+            if name in FLOAT32_DECIMALS:
+                values = values.round(FLOAT32_DECIMALS[name])
+            columns[name] = values
+    return df.assign(**columns) if columns else df
+
+
+def text_lists_to_strings(df, separator=", "):
+    """Joins the Arrow list columns of df, for tables and text formats."""
+    columns = {
+        name: pd.Series(pd.arrays.ArrowExtensionArray(
+            pc.binary_join(pa.array(df[name].array), separator)),
+            index=df.index)
+        for name in df.columns if df[name].dtype == TEXT_LIST}
+    return df.assign(**columns) if columns else df
+
+
+def event_keys(df):
+    """uint64 key of each event of df, hashed from its source and id, so
+    that an event has the same key in every version of a catalog.
+
+    Events repeating a source and id are told apart by their rank among
+    them.
+    """
+    columns = {"event_id": pd.util.hash_array(
+        df["event_id"].to_numpy(dtype=object), categorize=False)}
+    if "source" in df.columns:
+        columns["source"] = pd.util.hash_pandas_object(
+            df["source"], index=False).to_numpy()
+    keys = pd.util.hash_pandas_object(pd.DataFrame(columns), index=False)
+    duplicated = keys.duplicated()
+    if duplicated.any():
+        keys = pd.util.hash_pandas_object(pd.DataFrame({
+            "key": keys, "rank": keys.groupby(keys).cumcount()}),
+            index=False)
+    return keys.to_numpy()
+
+
+def changed_events(previous, current):
+    """Compares two versions of per-event values, frames indexed by
+    event_keys with the values a result was computed from.
+
+    Returns (removed, added): the rows of previous whose event is gone or
+    has changed values, and the rows of current whose event is new or has
+    changed values. Missing values equal each other.
+    """
+    positions = previous.index.get_indexer(current.index)
+    known = np.flatnonzero(positions >= 0)
+    old = previous.iloc[positions[known]]
+    new = current.iloc[known]
+    # Column by column, so that values keep their dtype
+    same = np.ones(len(known), dtype=bool)
+    for name in current.columns:
+        old_values, new_values = old[name].to_numpy(), new[name].to_numpy()
+        same &= (old_values == new_values) | \
+            (pd.isna(old_values) & pd.isna(new_values))
+
+    removed = np.ones(len(previous), dtype=bool)
+    removed[positions[known[same]]] = False
+    added = np.ones(len(current), dtype=bool)
+    added[known[same]] = False
+    return previous[removed], current[added]
+
+
+def memory_report(df):
+    """Bytes used by each column of df, deep, and per event.
+
+    Returns a DataFrame indexed by column, with a "total" row.
+    """
+    num_events = max(len(df), 1)
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        "dtype": [str(df[c].dtype) for c in usage.index],
+        "bytes": usage.to_numpy(),
+        "bytes_per_event": usage.to_numpy() / num_events,
+    }, index=usage.index)
+    report.loc["total"] = ["", usage.sum(), usage.sum() / num_events]
+    return report
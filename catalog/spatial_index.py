@@ -0,0 +1,116 @@
+import numpy as np
+
+
+class GridIndex:
+    """Uniform lat/lon grid over a set of events.
+
+    Event positions are sorted by row-major cell id, so the events of any
+    run of cells along a row are contiguous and found by binary search. A
+    bounding box query only touches the rows it spans, and a polygon query
+    only tests the events inside the polygon's bounding box.
+    """
+    TARGET_EVENTS_PER_CELL = 16
+
+    def __init__(self, lat, lon, cell_size=None):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+
+        valid = ~(np.isnan(self.lat) | np.isnan(self.lon))
+        if not valid.any():
+            self.min_lat = self.min_lon = 0.0
+            self.num_rows = self.num_cols = 1
+            self.cell_size = cell_size or 1.0
+            self.order = np.empty(0, dtype=np.int64)
+            self.cell_ids = np.empty(0, dtype=np.int64)
+            return
+
+        self.min_lat = self.lat[valid].min()
+        self.min_lon = self.lon[valid].min()
+        lat_extent = self.lat[valid].max() - self.min_lat
+        lon_extent = self.lon[valid].max() - self.min_lon
+
+        if cell_size is None:
+            num_cells = max(valid.sum() / self.TARGET_EVENTS_PER_CELL, 1)
+            cell_size = np.sqrt(max(lat_extent * lon_extent, 1e-6) / num_cells)
+        self.cell_size = float(max(cell_size, 1e-4))
+        self.num_rows = int(lat_extent // self.cell_size) + 1
+        self.num_cols = int(lon_extent // self.cell_size) + 1
+
+        positions = np.flatnonzero(valid)
+        cell_ids = self._cell_ids(self.lat[positions], self.lon[positions])
+        sort = np.argsort(cell_ids, kind="stable")
+        self.order = positions[sort]
+        self.cell_ids = cell_ids[sort]
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _rows(self, lat):
+        rows = np.floor((np.asarray(lat) - self.min_lat) / self.cell_size)
+        return np.clip(rows, 0, self.num_rows - 1).astype(np.int64)
+
+    def _cols(self, lon):
+        cols = np.floor((np.asarray(lon) - self.min_lon) / self.cell_size)
+        return np.clip(cols, 0, self.num_cols - 1).astype(np.int64)
+
+    def _cell_ids(self, lat, lon):
+        return self._rows(lat) * self.num_cols + self._cols(lon)
+
+    def _ranges(self, min_lat, min_lon, max_lat, max_lon):
+        rows = np.arange(self._rows(min_lat), self._rows(max_lat) + 1)
+        first_col, last_col = self._cols(min_lon), self._cols(max_lon)
+
+        lo = np.searchsorted(self.cell_ids, rows * self.num_cols + first_col,
+                             "left")
+        hi = np.searchsorted(self.cell_ids, rows * self.num_cols + last_col,
+                             "right")
+        return lo, hi
+
+    def count_candidates(self, min_lat, min_lon, max_lat, max_lon):
+        """Number of events in the cells overlapping the box, an upper
+        bound of the events inside it."""
+        lo, hi = self._ranges(min_lat, min_lon, max_lat, max_lon)
+        return int((hi - lo).sum())
+
+    def _candidates(self, min_lat, min_lon, max_lat, max_lon):
+        lo, hi = self._ranges(min_lat, min_lon, max_lat, max_lon)
+        if not len(lo):
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.order[s:e] for s, e in zip(lo, hi)])
+
+    def query_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        """Returns the sorted positions of the events inside the box."""
+        candidates = self._candidates(min_lat, min_lon, max_lat, max_lon)
+        lat, lon = self.lat[candidates], self.lon[candidates]
+        inside = (lat >= min_lat) & (lat <= max_lat) & \
+            (lon >= min_lon) & (lon <= max_lon)
+        return np.sort(candidates[inside])
+
+    def query_polygon(self, polygon):
+        """Returns the sorted positions of the events inside a polygon
+        given as a sequence of (lat, lon) vertices."""
+        polygon = np.asarray(polygon, dtype=float)
+        candidates = self.query_bbox(polygon[:, 0].min(), polygon[:, 1].min(),
+                                     polygon[:, 0].max(), polygon[:, 1].max())
+        inside = points_in_polygon(self.lat[candidates],
+                                   self.lon[candidates], polygon)
+        return candidates[inside]
+
+
+def points_in_polygon(lat, lon, polygon):
+    """Even-odd ray casting of many points against one polygon.
+
+    Loops over the polygon's edges, each edge being tested against all
+    points at once.
+    """
+    inside = np.zeros(len(lat), dtype=bool)
+    vertices = np.asarray(polygon, dtype=float)
+    next_vertices = np.roll(vertices, -1, axis=0)
+
+    for (lat1, lon1), (lat2, lon2) in zip(vertices, next_vertices):
+        if lat1 == lat2:
+            continue
+        crosses = (lat1 > lat) != (lat2 > lat)
+        lon_at_lat = lon1 + (lat - lat1) * (lon2 - lon1) / (lat2 - lat1)
+        inside ^= crosses & (lon < lon_at_lat)
+    return inside
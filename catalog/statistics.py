@@ -0,0 +1,238 @@
+"""Seismological statistics of an event catalog.
+
+- magnitude of completeness (Mc), by maximum curvature of the magnitude
+  histogram plus a correction
+- Gutenberg-Richter b-value above Mc, by the Aki-Utsu maximum likelihood
+  estimate, with its Aki (1965) uncertainty b / sqrt(n)
+- radiated energy, log10(E) = 1.5 M + 4.8, and seismic moment,
+  log10(M0) = 1.5 M + 9.1 (Hanks and Kanamori), in J and N.m
+- event rate, in events per day
+
+All of them are derived from magnitude histograms, counts and sums,
+which add up over events, so that windows are differences of cumulative
+values and changed events update them in place.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from catalog.aggregation import seismic_energy
+from catalog.schema import changed_events, event_keys
+
+MIN_MAGNITUDE = -2.0
+MAX_MAGNITUDE = 10.0
+BIN_WIDTH = 0.1
+# Maximum curvature underestimates Mc, Woessner and Wiemer (2005)
+MC_CORRECTION = 0.2
+# Fewer events above Mc give no b-value
+MIN_EVENTS = 50
+MAX_WINDOWS = 5000
+
+DAY = pd.Timedelta(days=1)
+
+
+def seismic_moment(magnitude):
+    """Seismic moment in N.m, log10(M0) = 1.5 M + 9.1."""
+    return 10 ** (1.5 * np.asarray(magnitude, dtype=float) + 9.1)
+
+
+def num_bins(bin_width=BIN_WIDTH):
+    return int(round((MAX_MAGNITUDE - MIN_MAGNITUDE) / bin_width)) + 1
+
+
+def magnitude_bins(magnitude, bin_width=BIN_WIDTH):
+    """Histogram bin of each magnitude, -1 for missing magnitudes."""
+    magnitude = np.asarray(magnitude, dtype=float)
+    bins = np.rint((magnitude - MIN_MAGNITUDE) / bin_width)
+    bins = np.clip(np.nan_to_num(bins, nan=-1), -1, num_bins(bin_width) - 1)
+    return bins.astype(np.int64)
+
+
+def completeness_magnitude(counts, bin_width=BIN_WIDTH,
+                           correction=MC_CORRECTION):
+    """Mc of each histogram along the last axis of counts, NaN when a
+    histogram is empty."""
+    counts = np.asarray(counts)
+    mc = MIN_MAGNITUDE + np.argmax(counts, axis=-1) * bin_width + correction
+    return np.where(counts.sum(axis=-1) > 0, mc, np.nan)
+
+
+def b_value(counts, mc, bin_width=BIN_WIDTH, min_events=MIN_EVENTS):
+    """Returns (b, uncertainty, events above Mc) of each histogram along
+    the last axis of counts, for its mc. b is NaN with fewer than
+    min_events events above Mc."""
+    counts = np.atleast_2d(counts)
+    mc = np.atleast_1d(np.asarray(mc, dtype=float))
+    centers = MIN_MAGNITUDE + np.arange(counts.shape[-1]) * bin_width
+
+    # Counts and magnitude sums of the bins at or above each bin
+    tail_counts = np.cumsum(counts[:, ::-1], axis=1)[:, ::-1]
+    tail_sums = np.cumsum((counts * centers)[:, ::-1], axis=1)[:, ::-1]
+    mc_bins = magnitude_bins(np.nan_to_num(mc, nan=MAX_MAGNITUDE),
+                             bin_width)[:, None]
+    n = np.take_along_axis(tail_counts, mc_bins, axis=1)[:, 0]
+    sums = np.take_along_axis(tail_sums, mc_bins, axis=1)[:, 0]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = sums / n
+        b = np.log10(np.e) / (mean - (mc - bin_width / 2))
+        error = b / np.sqrt(n)
+    valid = (n >= min_events) & np.isfinite(mc)
+    return np.where(valid, b, np.nan), np.where(valid, error, np.nan), n
+
+
+def window_statistics(dates, magnitudes, window=None, step="1D",
+                      bin_width=BIN_WIDTH, min_events=MIN_EVENTS):
+    """Statistics of time windows ending every step, on events sorted by
+    date.
+
+    window is a pandas offset such as "7D", None gives expanding windows
+    starting at the first event. Returns a DataFrame indexed by the end
+    of each window with the columns "events", "rate" (per day), "mc",
+    "b_value", "b_error", "energy" and "moment" of the window, and
+    "cumulative_energy" and "cumulative_moment" since the first event.
+
+    One pass over the events builds the histograms of the segments
+    between window bounds, the windows are differences of their cumulative
+    sums, so the cost is O(n + windows x bins).
+    """
+    dates = pd.DatetimeIndex(dates)
+    magnitudes = np.asarray(magnitudes, dtype=float)
+    if dates.empty:
+        return pd.DataFrame(columns=[
+            "events", "rate", "mc", "b_value", "b_error", "energy",
+            "moment", "cumulative_energy", "cumulative_moment"])
+    if not dates.is_monotonic_increasing:
+        raise Exception("Events must be sorted by date")
+
+    step = pd.tseries.frequencies.to_offset(step)
+    ends = pd.date_range(dates[0].floor(step) + step,
+                         dates[-1].floor(step) + step, freq=step)
+    if len(ends) > MAX_WINDOWS:
+        raise Exception(
+            f"{len(ends)} windows, more than {MAX_WINDOWS}. "
+            "Select a longer step.")
+    if window is None:
+        starts = pd.DatetimeIndex([dates[0]] * len(ends))
+    else:
+        # Windows reaching back before the first event start at it, so
+        # that their rates are over the time actually covered
+        starts = ends - pd.tseries.frequencies.to_offset(window)
+        starts = starts.where(starts > dates[0], dates[0])
+
+    values = dates.values
+    end_idx = np.searchsorted(values, ends.values, "left")
+    start_idx = np.searchsorted(values, starts.values, "left")
+
+    # Histogram of each segment between consecutive bounds, then their
+    # cumulative sums at every bound
+    bounds = np.unique(np.concatenate([[0], start_idx, end_idx]))
+    segment = np.searchsorted(bounds, np.arange(len(dates)), "right") - 1
+    bins = magnitude_bins(magnitudes, bin_width)
+    valid = bins >= 0
+    width = num_bins(bin_width)
+    segments = np.bincount(segment[valid] * width + bins[valid],
+                           minlength=len(bounds) * width)
+    cumulative = np.cumsum(
+        segments.reshape(len(bounds), width), axis=0) - \
+        segments.reshape(len(bounds), width)
+    counts = cumulative[np.searchsorted(bounds, end_idx)] - \
+        cumulative[np.searchsorted(bounds, start_idx)]
+
+    mc = completeness_magnitude(counts, bin_width)
+    b, error, _ = b_value(counts, mc, bin_width, min_events)
+
+    def window_sums(per_event):
+        sums = np.concatenate([[0.0], np.cumsum(np.nan_to_num(per_event))])
+        return sums[end_idx] - sums[start_idx], sums[end_idx]
+
+    energy, cumulative_energy = window_sums(seismic_energy(magnitudes))
+    moment, cumulative_moment = window_sums(seismic_moment(magnitudes))
+    events = end_idx - start_idx
+    days = (ends - starts) / DAY
+
+    return pd.DataFrame({
+        "events": events,
+        "rate": events / days,
+        "mc": mc,
+        "b_value": b,
+        "b_error": error,
+        "energy": energy,
+        "moment": moment,
+        "cumulative_energy": cumulative_energy,
+        "cumulative_moment": cumulative_moment,
+    }, index=pd.DatetimeIndex(ends, name="date"))
+
+
+class CatalogStatistics:
+    """Statistics of a catalog, kept up to date from one version of the
+    catalog to the next.
+
+    The magnitude of every counted event is kept by event key, so each
+    update only subtracts the events removed or revised since the last
+    one and adds the new or revised ones, wherever they fall in time.
+    """
+
+    def __init__(self, bin_width=BIN_WIDTH, min_events=MIN_EVENTS):
+        self.bin_width = bin_width
+        self.min_events = min_events
+        self.counts = np.zeros(num_bins(bin_width), dtype=np.int64)
+        self.num_events = 0
+        self.energy = 0.0
+        self.moment = 0.0
+        self.first_date = None
+        self.last_date = None
+        self._magnitudes = pd.DataFrame(
+            {"magnitude": pd.Series(dtype=float)},
+            index=pd.Index([], dtype=np.uint64))
+        self._lock = threading.Lock()
+
+    def update(self, events, keys=None):
+        """Counts a new version of the catalog, a DataFrame with the
+        "event_id", "date" and "magnitude" and, when it merges sources,
+        "source" of its events. keys are their event_keys, when already
+        computed. Returns how many events were added, removed or revised
+        since the last update."""
+        if keys is None:
+            keys = event_keys(events)
+        magnitudes = pd.DataFrame(
+            {"magnitude": events["magnitude"].to_numpy(dtype=float,
+                                                       na_value=np.nan)},
+            index=pd.Index(keys))
+        dates = events["date"]
+        with self._lock:
+            removed, added = changed_events(self._magnitudes, magnitudes)
+            self._count(removed["magnitude"].to_numpy(), -1)
+            self._count(added["magnitude"].to_numpy(), 1)
+            self._magnitudes = magnitudes
+            self.num_events = len(magnitudes)
+            self.first_date = dates.min() if len(dates) else None
+            self.last_date = dates.max() if len(dates) else None
+            return len(removed) + len(added) - \
+                len(removed.index.intersection(added.index))
+
+    def _count(self, magnitudes, sign):
+        bins = magnitude_bins(magnitudes, self.bin_width)
+        self.counts += sign * np.bincount(bins[bins >= 0],
+                                          minlength=len(self.counts))
+        self.energy += sign * np.nansum(seismic_energy(magnitudes))
+        self.moment += sign * np.nansum(seismic_moment(magnitudes))
+
+    def summary(self):
+        """Returns a dict of events, rate, mc, b_value, b_error, energy and
+        moment."""
+        with self._lock:
+            counts = self.counts.copy()
+            days = (self.last_date - self.first_date) / DAY \
+                if self.num_events else 0
+            summary = {"events": self.num_events,
+                       "rate": self.num_events / days if days else np.nan,
+                       "energy": float(self.energy),
+                       "moment": float(self.moment)}
+        mc = completeness_magnitude(counts, self.bin_width)
+        b, error, _ = b_value(counts, mc, self.bin_width, self.min_events)
+        summary.update(mc=float(mc), b_value=float(b[0]),
+                       b_error=float(error[0]))
+        return summary
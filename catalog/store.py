@@ -0,0 +1,263 @@
+import contextlib
+import datetime as dt
+import json
+import os
+import tempfile
+import threading
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from catalog.schema import apply_schema
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: only the writers of this process are serialized
+    fcntl = None
+
+
+class EventStore:
+    """On-disk event history, one Parquet file per source and month.
+
+    Layout: <root>/<source>/<YYYY-MM>.parquet
+    """
+    DEFAULT_ROOT = os.path.join("data", "store")
+    KEY_COLUMN = "event_id"
+    # Columns that identify a new revision of an already stored event,
+    # in order of preference
+    REVISION_COLUMNS = ("updated_at", "origin_id")
+    # Names the last consistent state of the store, see publish()
+    PUBLISHED_FILE = "published.json"
+    LOCK_FILE = ".lock"
+
+    # Write locks by source directory, shared by every EventStore of the
+    # process
+    _source_locks = {}
+    _source_locks_lock = threading.Lock()
+
+    def __init__(self, root=None):
+        self.root = root or os.environ.get("SEISMIC_STORE_DIR",
+                                           self.DEFAULT_ROOT)
+
+    def _source_dir(self, source):
+        return os.path.join(self.root, source)
+
+    def _partition_path(self, source, month):
+        return os.path.join(self._source_dir(source), f"{month}.parquet")
+
+    def partitions(self, source, start=None, end=None):
+        """Lists the partition files of a source overlapping [start, end]."""
+        source_dir = self._source_dir(source)
+        if not os.path.isdir(source_dir):
+            return []
+
+        lower_month = _month_key(start) if start is not None else None
+        upper_month = _month_key(end) if end is not None else None
+
+        paths = []
+        for filename in sorted(os.listdir(source_dir)):
+            if not filename.endswith(".parquet"):
+                continue
+            month = filename[:-len(".parquet")]
+            if lower_month and month < lower_month:
+                continue
+            if upper_month and month > upper_month:
+                continue
+            paths.append(os.path.join(source_dir, filename))
+        return paths
+
+    @contextlib.contextmanager
+    def lock(self, source):
+        """Holds the write lock of source. Scheduler threads, backfills and
+        separate worker processes writing to the same store take turns
+        reading, merging and rewriting its partitions."""
+        source_dir = os.path.abspath(self._source_dir(source))
+        with EventStore._source_locks_lock:
+            lock = EventStore._source_locks.setdefault(source_dir,
+                                                       threading.Lock())
+        with lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(source_dir, exist_ok=True)
+            with open(os.path.join(source_dir, self.LOCK_FILE), "a") as fp:
+                fcntl.flock(fp, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fp, fcntl.LOCK_UN)
+
+    def sources(self):
+        """The stored sources. Directories starting with "_", such as the
+        backfill checkpoints, are not sources."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root)
+                      if not d.startswith("_")
+                      and os.path.isdir(os.path.join(self.root, d)))
+
+    def upsert(self, df, source):
+        """Writes new or revised events of a crawled DataFrame.
+
+        Only the month partitions holding new or revised events are
+        rewritten, under the source's write lock. Returns the number of
+        events written.
+        """
+        if df.empty:
+            return 0
+        if self.KEY_COLUMN not in df.columns:
+            raise ValueError(f"'{self.KEY_COLUMN}' column is required")
+
+        os.makedirs(self._source_dir(source), exist_ok=True)
+        with self.lock(source):
+            return self._upsert(df, source)
+
+    def _upsert(self, df, source):
+        months = df["date"].dt.strftime("%Y-%m")
+
+        written = 0
+        for month, incoming in df.groupby(months, sort=False):
+            path = self._partition_path(source, month)
+            stored = _read_partition(path) if os.path.exists(path) else None
+
+            changed = self._changed_events(incoming, stored)
+            if changed.empty:
+                continue
+
+            if stored is None:
+                partition = changed
+            else:
+                kept = stored[~stored[self.KEY_COLUMN].isin(
+                    changed[self.KEY_COLUMN])]
+                partition = pd.concat([kept, changed], ignore_index=True)
+
+            partition = partition.sort_values(by="date", ascending=False)
+            _write_partition(partition, path)
+            written += len(changed)
+        return written
+
+    def _changed_events(self, incoming, stored):
+        incoming = incoming.drop_duplicates(subset=self.KEY_COLUMN,
+                                            keep="first")
+        if stored is None or stored.empty:
+            return incoming
+
+        revision_column = next((c for c in self.REVISION_COLUMNS
+                                if c in incoming.columns
+                                and c in stored.columns), None)
+
+        stored_ids = stored[self.KEY_COLUMN]
+        is_new = ~incoming[self.KEY_COLUMN].isin(stored_ids)
+        if revision_column is None:
+            return incoming[is_new]
+
+        stored_revisions = stored.set_index(self.KEY_COLUMN)[revision_column]
+        previous = incoming[self.KEY_COLUMN].map(stored_revisions)
+        current = incoming[revision_column]
+        if revision_column == "updated_at":
+            is_revised = current > previous
+        else:
+            is_revised = current.astype(str) != previous.astype(str)
+
+        return incoming[is_new | (~is_new & is_revised.fillna(False))]
+
+    def publish(self, **metadata):
+        """Marks the current partitions as a new dataset version.
+
+        Writers publish once all their upserts are done, so readers keying
+        their caches on published() never pick up a half updated store.
+        metadata is stored along with the version. Returns the version.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        published = {"version": uuid.uuid4().hex,
+                     "published_at": dt.datetime.utcnow().isoformat(),
+                     **metadata}
+
+        path = os.path.join(self.root, self.PUBLISHED_FILE)
+        with _replacing(path) as tmp_path:
+            with open(tmp_path, "w") as fp:
+                json.dump(published, fp)
+        return published["version"]
+
+    def published(self):
+        """Returns the metadata of the last published version, or None."""
+        path = os.path.join(self.root, self.PUBLISHED_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as fp:
+            return json.load(fp)
+
+    def query(self, sources=None, start=None, end=None, bbox=None):
+        """Reads stored events, pruning partitions by month and pushing the
+        time and bounding box predicates down to the Parquet reader.
+
+        bbox is (min_lat, min_lon, max_lat, max_lon).
+        """
+        if sources is None:
+            sources = self.sources()
+        elif isinstance(sources, str):
+            sources = [sources]
+
+        filters = []
+        if start is not None:
+            filters.append(("date", ">=", pd.Timestamp(start)))
+        if end is not None:
+            filters.append(("date", "<=", pd.Timestamp(end)))
+        if bbox is not None:
+            min_lat, min_lon, max_lat, max_lon = bbox
+            filters += [("lat", ">=", min_lat), ("lat", "<=", max_lat),
+                        ("lon", ">=", min_lon), ("lon", "<=", max_lon)]
+
+        frames = []
+        for source in sources:
+            for path in self.partitions(source, start, end):
+                frames.append(_read_partition(path, filters or None))
+
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame()
+
+        df = apply_schema(pd.concat(frames, ignore_index=True))
+        return df.sort_values(by="date", ascending=False)
+
+
+def _month_key(value):
+    return pd.Timestamp(value).strftime("%Y-%m")
+
+
+def _list_types(arrow_type):
+    # List columns are read as Arrow lists instead of numpy arrays
+    return pd.ArrowDtype(arrow_type) if pa.types.is_list(arrow_type) \
+        else None
+
+
+def _read_partition(path, filters=None):
+    table = pq.read_table(path, filters=filters)
+    # Partitions written before the event schema are cast on read
+    return apply_schema(table.to_pandas(types_mapper=_list_types))
+
+
+@contextlib.contextmanager
+def _replacing(path):
+    """Yields a new temporary file next to path, which replaces path once
+    written. Every writer gets its own temporary file."""
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".",
+        prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _write_partition(df, path):
+    # Write next to the target and swap it in so readers never see a
+    # partially written partition
+    with _replacing(path) as tmp_path:
+        df.to_parquet(tmp_path, index=False)
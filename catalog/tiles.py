@@ -0,0 +1,371 @@
+"""Quadtree tile pyramid over an event catalog.
+
+Tiles are web mercator tiles, keyed within their zoom level by the
+interleaved bits of their x and y (Morton order): the key of a parent is
+its child's key shifted by 2 bits, and the descendants of a tile at any
+deeper level are a contiguous range of keys.
+
+Every level from 0 to max_zoom holds, for each tile:
+
+- a sample of at most sample_size events, the largest magnitudes first
+  and the most recent first among equal magnitudes, so the largest
+  events are drawn at every zoom
+- aggregated cells, the tile's descendants cell_levels deeper, which
+  span about CELL_SIZE_PIXELS pixels as the cells of aggregate_cells do
+
+Both are built bottom-up: the sample of a tile is taken from the
+samples of its children, and its cells add up theirs. Added, removed or
+revised events only rebuild the tiles they fall in.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from catalog.aggregation import (CELL_SIZE_PIXELS, TILE_SIZE_PIXELS,
+                                 seismic_energy)
+from catalog.schema import changed_events, event_keys
+
+MAX_LATITUDE = 85.05112878
+MAX_ZOOM = 10
+SAMPLE_SIZE = 512
+# Cells span 2**-CELL_LEVELS of a tile side
+CELL_LEVELS = int(np.log2(TILE_SIZE_PIXELS // CELL_SIZE_PIXELS))
+
+# Size of a map, pydeck_chart is 500 pixels high
+MAP_WIDTH_PIXELS = 1000
+MAP_HEIGHT_PIXELS = 500
+
+SAMPLE_COLUMNS = ("event_id", "source", "date", "lat", "lon", "depth",
+                  "magnitude", "magnitude_type")
+CELL_COLUMNS = ["lat", "lon", "count", "magnitude", "mean_magnitude",
+                "energy", "depth", "last_date"]
+
+
+def tile_xy_fraction(lat, lon, zoom):
+    """Web mercator x and y of points at zoom, in tiles."""
+    lat = np.clip(np.asarray(lat, dtype=float), -MAX_LATITUDE, MAX_LATITUDE)
+    lon = np.asarray(lon, dtype=float)
+    n = 2 ** zoom
+    return ((lon + 180) / 360 * n,
+            (1 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2 * n)
+
+
+def tile_xy(lat, lon, zoom):
+    """Web mercator x and y of the tiles holding each point at zoom."""
+    n = 2 ** zoom
+    x, y = np.floor(tile_xy_fraction(lat, lon, zoom))
+    return (np.clip(x, 0, n - 1).astype(np.int64),
+            np.clip(y, 0, n - 1).astype(np.int64))
+
+
+def tile_lat_lon(x, y, zoom):
+    """Latitude and longitude of the north west corner of tiles."""
+    n = 2 ** zoom
+    lon = np.asarray(x) / n * 360 - 180
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * np.asarray(y) / n))))
+    return lat, lon
+
+
+def tile_key(x, y, zoom):
+    """Morton key of tiles, interleaving the bits of x and y."""
+    x, y = np.asarray(x, dtype=np.int64), np.asarray(y, dtype=np.int64)
+    key = np.zeros(np.shape(x), dtype=np.int64)
+    for bit in range(zoom):
+        key |= ((x >> bit) & 1) << (2 * bit + 1)
+        key |= ((y >> bit) & 1) << (2 * bit)
+    return key
+
+
+def key_xy(key, zoom):
+    """x and y of Morton keys."""
+    key = np.asarray(key, dtype=np.int64)
+    x = np.zeros(np.shape(key), dtype=np.int64)
+    y = np.zeros(np.shape(key), dtype=np.int64)
+    for bit in range(zoom):
+        x |= ((key >> (2 * bit + 1)) & 1) << bit
+        y |= ((key >> (2 * bit)) & 1) << bit
+    return x, y
+
+
+def visible_tiles(bbox, zoom):
+    """Keys of the tiles at zoom intersecting bbox, (min_lat, min_lon,
+    max_lat, max_lon), sorted."""
+    min_lat, min_lon, max_lat, max_lon = bbox
+    x0, y0 = tile_xy(max_lat, min_lon, zoom)
+    x1, y1 = tile_xy(min_lat, max_lon, zoom)
+    x, y = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1))
+    return np.sort(tile_key(x.ravel(), y.ravel(), zoom))
+
+
+def viewport_bbox(lat, lon, zoom, width=MAP_WIDTH_PIXELS,
+                  height=MAP_HEIGHT_PIXELS):
+    """(min_lat, min_lon, max_lat, max_lon) shown by a web mercator map of
+    width x height pixels centered on lat, lon at zoom."""
+    n = 2 ** zoom
+    x, y = tile_xy_fraction(lat, lon, zoom)
+    half_width = width / 2 / TILE_SIZE_PIXELS
+    half_height = height / 2 / TILE_SIZE_PIXELS
+    north, west = tile_lat_lon(x - half_width, max(y - half_height, 0), zoom)
+    south, east = tile_lat_lon(x + half_width, min(y + half_height, n),
+                               zoom)
+    return (float(south), float(max(west, -180)), float(north),
+            float(min(east, 180)))
+
+
+def _group_starts(sorted_keys):
+    return np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+
+
+def _inside_bbox(points, bbox):
+    min_lat, min_lon, max_lat, max_lon = bbox
+    return (points["lat"].between(min_lat, max_lat)
+            & points["lon"].between(min_lon, max_lon)).to_numpy()
+
+
+def _ranges(sorted_keys, first, last):
+    """Positions of sorted_keys in [first[i], last[i]) for each i."""
+    starts = np.searchsorted(sorted_keys, first, "left")
+    ends = np.searchsorted(sorted_keys, last, "left")
+    if not len(starts):
+        return np.array([], dtype=np.int64)
+    return np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+
+
+class TilePyramid:
+    """Magnitude-prioritized samples and aggregated cells of the events,
+    for each tile of levels 0 to max_zoom, kept up to date from one
+    version of the catalog to the next.
+
+    The deepest cell and the values of every added event are kept by
+    event key, so each update only rebuilds the tiles of the events
+    added, removed or revised since the last one, wherever they fall in
+    time.
+    """
+
+    def __init__(self, max_zoom=MAX_ZOOM, sample_size=SAMPLE_SIZE,
+                 cell_levels=CELL_LEVELS):
+        self.max_zoom = max_zoom
+        self.sample_size = sample_size
+        self.cell_levels = cell_levels
+        # zoom: events sorted by tile, then by priority within a tile
+        self.samples = {}
+        self._sample_keys = {}
+        # zoom: dict of cell key and its sums, sorted by cell key
+        self.cells = {}
+        self.num_events = 0
+        self.last_date = None
+        # Event key: deepest cell and hash of the sampled values
+        self._events = pd.DataFrame(
+            {"cell": pd.Series(dtype=np.int64),
+             "values": pd.Series(dtype=np.uint64)},
+            index=pd.Index([], dtype=np.uint64))
+        self._lock = threading.Lock()
+
+    @property
+    def deepest_zoom(self):
+        return self.max_zoom + self.cell_levels
+
+    def update(self, events, keys=None):
+        """Updates the tiles to a new version of the catalog, a DataFrame
+        with the SAMPLE_COLUMNS of its events. keys are their event_keys,
+        when already computed. Returns how many events were added, removed
+        or revised since the last update."""
+        if keys is None:
+            keys = event_keys(events)
+        lat = events["lat"].to_numpy(dtype=float, na_value=np.nan)
+        lon = events["lon"].to_numpy(dtype=float, na_value=np.nan)
+        located = ~(np.isnan(lat) | np.isnan(lon))
+        columns = [c for c in SAMPLE_COLUMNS if c in events.columns]
+        events = events[located][columns].reset_index(drop=True)
+        keys = np.asarray(keys)[located]
+
+        x, y = tile_xy(events["lat"], events["lon"], self.deepest_zoom)
+        cell_keys = tile_key(x, y, self.deepest_zoom)
+        value_columns = [c for c in columns
+                         if c not in ("event_id", "source")]
+        current = pd.DataFrame({
+            "cell": cell_keys,
+            "values": pd.util.hash_pandas_object(
+                events[value_columns], index=False).to_numpy()},
+            index=pd.Index(keys))
+
+        with self._lock:
+            removed, added = changed_events(self._events, current)
+            changed = len(removed) + len(added) - \
+                len(removed.index.intersection(added.index))
+            self._events = current
+            self.num_events = len(events)
+            self.last_date = events["date"].max() if len(events) else None
+            if not changed:
+                return 0
+
+            # Tiles of the deepest level holding a changed event, before
+            # or after the change, are rebuilt from their current events
+            shift = 2 * self.cell_levels
+            tiles = np.unique(np.concatenate([
+                removed["cell"].to_numpy(), added["cell"].to_numpy()])
+                >> shift)
+            rebuilt = np.isin(cell_keys >> shift, tiles)
+            self._update_samples(events[rebuilt], cell_keys[rebuilt], tiles)
+            self._update_cells(events[rebuilt], cell_keys[rebuilt], tiles)
+            return changed
+
+    def _prioritize(self, candidates):
+        """The sample_size first candidates of each tile, sorted by tile
+        and then by priority."""
+        if candidates.empty:
+            return candidates
+        keys = candidates["_key"].to_numpy()
+        magnitude = candidates["magnitude"].to_numpy(dtype=float,
+                                                     na_value=np.nan)
+        dates = candidates["date"].to_numpy(dtype="datetime64[ns]")
+        # Largest magnitudes, then most recent dates, missing ones last
+        order = np.lexsort((-dates.astype(np.int64),
+                            -np.nan_to_num(magnitude, nan=-np.inf), keys))
+        starts = _group_starts(keys[order])
+        rank = np.arange(len(order)) - np.repeat(
+            starts, np.diff(np.r_[starts, len(order)]))
+        return candidates.iloc[order[rank < self.sample_size]]
+
+    def _replace_samples(self, zoom, tiles, sample):
+        old = self.samples.get(zoom)
+        if old is not None:
+            kept = old[~np.isin(self._sample_keys[zoom], tiles)]
+            sample = pd.concat([kept, sample], ignore_index=True)
+            sample = sample.iloc[np.argsort(sample["_key"].to_numpy(),
+                                            kind="stable")]
+        self.samples[zoom] = sample.reset_index(drop=True)
+        self._sample_keys[zoom] = self.samples[zoom]["_key"].to_numpy()
+
+    def _update_samples(self, events, cell_keys, tiles):
+        # The tiles of the deepest level are sampled from their events,
+        # those above from the samples of their children, which hold the
+        # sample_size first events of each child
+        shift = 2 * self.cell_levels
+        self._replace_samples(self.max_zoom, tiles, self._prioritize(
+            events.assign(_key=cell_keys >> shift)))
+        for zoom in range(self.max_zoom - 1, -1, -1):
+            tiles = np.unique(tiles >> 2)
+            children = self.samples[zoom + 1]
+            parents = self._sample_keys[zoom + 1] >> 2
+            candidates = children[np.isin(parents, tiles)]
+            self._replace_samples(zoom, tiles, self._prioritize(
+                candidates.assign(_key=candidates["_key"].to_numpy() >> 2)))
+
+    def _replace_cells(self, zoom, tiles, cells):
+        old = self.cells.get(zoom)
+        if old is not None:
+            kept = ~np.isin(old["key"] >> (2 * self.cell_levels), tiles)
+            cells = self._reduce_cells({
+                name: np.concatenate([values[kept], cells[name]])
+                for name, values in old.items()})
+        self.cells[zoom] = cells
+
+    def _update_cells(self, events, cell_keys, tiles):
+        magnitude = events["magnitude"].to_numpy(dtype=float,
+                                                 na_value=np.nan)
+        depth = events["depth"].to_numpy(dtype=float, na_value=np.nan) \
+            if "depth" in events.columns else np.full(len(events), np.nan)
+        self._replace_cells(self.max_zoom, tiles, self._reduce_cells({
+            "key": cell_keys,
+            "count": np.ones(len(events), dtype=np.int64),
+            "magnitude": magnitude,
+            "magnitude_sum": np.nan_to_num(magnitude),
+            "magnitude_count": (~np.isnan(magnitude)).astype(np.int64),
+            "energy": np.nan_to_num(seismic_energy(magnitude)),
+            "depth": depth,
+            "last_date": events["date"].to_numpy(dtype="datetime64[ns]"),
+        }))
+
+        # The cells of a tile add up those of its children
+        shift = 2 * self.cell_levels
+        for zoom in range(self.max_zoom - 1, -1, -1):
+            tiles = np.unique(tiles >> 2)
+            children = self.cells[zoom + 1]
+            rebuilt = np.isin(children["key"] >> (shift + 2), tiles)
+            partial = {name: values[rebuilt]
+                       for name, values in children.items()}
+            partial["key"] = partial["key"] >> 2
+            self._replace_cells(zoom, tiles, self._reduce_cells(partial))
+
+    @staticmethod
+    def _reduce_cells(cells):
+        """One row per cell key, sorted by key."""
+        order = np.argsort(cells["key"], kind="stable")
+        cells = {name: values[order] for name, values in cells.items()}
+        if not len(order):
+            return cells
+        starts = _group_starts(cells["key"])
+        if len(starts) == len(order):
+            return cells
+        return {
+            "key": cells["key"][starts],
+            "count": np.add.reduceat(cells["count"], starts),
+            "magnitude": np.fmax.reduceat(cells["magnitude"], starts),
+            "magnitude_sum": np.add.reduceat(cells["magnitude_sum"], starts),
+            "magnitude_count": np.add.reduceat(cells["magnitude_count"],
+                                               starts),
+            "energy": np.add.reduceat(cells["energy"], starts),
+            "depth": np.fmin.reduceat(cells["depth"], starts),
+            "last_date": np.maximum.reduceat(cells["last_date"], starts),
+        }
+
+    def level(self, zoom):
+        """The stored level serving a map at zoom."""
+        return int(np.clip(np.floor(zoom), 0, self.max_zoom))
+
+    def tile_events(self, bbox, zoom):
+        """Sampled events of the tiles intersecting bbox at zoom, within
+        bbox."""
+        level = self.level(zoom)
+        with self._lock:
+            sample = self.samples.get(level)
+            if sample is None:
+                return pd.DataFrame(columns=list(SAMPLE_COLUMNS))
+            tiles = visible_tiles(bbox, level)
+            positions = _ranges(self._sample_keys[level], tiles, tiles + 1)
+            events = sample.iloc[positions].drop(columns="_key")
+        return events[_inside_bbox(events, bbox)]
+
+    def tile_cells(self, bbox, zoom):
+        """Aggregated cells of the tiles intersecting bbox at zoom, that
+        intersect bbox, with the columns of aggregate_cells and the
+        "last_date" of each cell."""
+        level = self.level(zoom)
+        with self._lock:
+            cells = self.cells.get(level)
+            if cells is None:
+                return pd.DataFrame(columns=CELL_COLUMNS)
+            tiles = visible_tiles(bbox, level)
+            shift = 2 * self.cell_levels
+            positions = _ranges(cells["key"], tiles << shift,
+                                (tiles + 1) << shift)
+            cells = {name: values[positions]
+                     for name, values in cells.items()}
+
+        # Cell centers, from their north west and south east corners
+        cell_zoom = level + self.cell_levels
+        x, y = key_xy(cells["key"], cell_zoom)
+        north, west = tile_lat_lon(x, y, cell_zoom)
+        south, east = tile_lat_lon(x + 1, y + 1, cell_zoom)
+        min_lat, min_lon, max_lat, max_lon = bbox
+        inside = (north >= min_lat) & (south <= max_lat) \
+            & (east >= min_lon) & (west <= max_lon)
+        cells = pd.DataFrame({
+            "lat": (north + south) / 2,
+            "lon": (west + east) / 2,
+            "count": cells["count"],
+            "magnitude": cells["magnitude"],
+            "mean_magnitude": cells["magnitude_sum"] /
+            cells["magnitude_count"].clip(min=1),
+            "energy": cells["energy"],
+            "depth": cells["depth"],
+            "last_date": cells["last_date"],
+        }, columns=CELL_COLUMNS)
+        return cells[inside]
+
+    def cell_size(self, zoom):
+        """Side of the cells served at zoom, in degrees of longitude."""
+        return 360 / 2 ** (self.level(zoom) + self.cell_levels)
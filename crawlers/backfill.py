@@ -0,0 +1,190 @@
+"""Resumable backfill of a source's history into the event store.
+
+The date range is walked in chunks. Downloads are made one at a time under
+a request rate cap, parsing runs in a process pool, and every stored chunk
+is checkpointed so that an interrupted run resumes where it stopped.
+Chunks are upserted under the store's per-source write lock, so a backfill
+can run while the scheduler polls:
+
+    python -m crawlers.backfill EMSC --start 2000-01-01 --end 2022-12-31
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import (ALL_COMPLETED, FIRST_COMPLETED,
+                                ProcessPoolExecutor, wait)
+
+import pandas as pd
+
+from catalog.store import EventStore
+from crawlers.emsc import EmscCrawler
+from crawlers.orchestrator import DEFAULT_TIMEOUT, SOURCE_TIMEOUTS
+
+# Sources with a historical feed. Their crawlers implement
+# fetch_range(start, end), which downloads the raw events of a date range,
+# and a static parse_range(content), which parses them into a DataFrame.
+BACKFILL_CRAWLERS = {
+    "EMSC": EmscCrawler,
+}
+
+DEFAULT_CHUNK_DAYS = 30
+# Requests per second, public FDSN services ask for moderation
+DEFAULT_RATE = 1.0
+
+
+class RateLimiter:
+    """Spaces calls to wait() at least 1 / rate seconds apart."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def date_chunks(start, end, chunk_days=DEFAULT_CHUNK_DAYS):
+    """Splits [start, end) into consecutive (start, end) ranges."""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if start >= end:
+        raise ValueError(f"Backfill start {start:%Y-%m-%d} must be before "
+                         f"its end {end:%Y-%m-%d}")
+    if chunk_days < 1:
+        raise ValueError(f"Chunks must span at least one day, "
+                         f"not {chunk_days}")
+    edges = list(pd.date_range(start, end, freq=f"{chunk_days}D"))
+    if edges[-1] < end:
+        edges.append(end)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+class Backfill:
+    """Backfills one source over [start, end) into an EventStore.
+
+    The checkpoint lists the chunks already stored, it lives in the
+    store's _backfill directory and is named after the run's parameters.
+    """
+
+    def __init__(self, source, start, end, store=None,
+                 chunk_days=DEFAULT_CHUNK_DAYS, rate=DEFAULT_RATE,
+                 workers=None):
+        if source not in BACKFILL_CRAWLERS:
+            raise ValueError(
+                f"{source} has no historical feed to backfill from. "
+                f"Select one of {list(BACKFILL_CRAWLERS.keys())}.")
+        self.source = source
+        self.chunks = date_chunks(start, end, chunk_days)
+        self.store = store or EventStore()
+        self.rate_limiter = RateLimiter(rate)
+        self.workers = os.cpu_count() if workers is None else workers
+
+        self.crawler = BACKFILL_CRAWLERS[source]()
+        self.crawler.timeout = SOURCE_TIMEOUTS.get(source, DEFAULT_TIMEOUT)
+
+        name = (f"{source}-{pd.Timestamp(start):%Y%m%d}-"
+                f"{pd.Timestamp(end):%Y%m%d}-{chunk_days}d.json")
+        self.checkpoint_path = os.path.join(self.store.root, "_backfill",
+                                            name)
+        self.done = self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return set()
+        with open(self.checkpoint_path) as fp:
+            return set(json.load(fp)["done"])
+
+    def _save_checkpoint(self):
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as fp:
+            json.dump({"source": self.source, "done": sorted(self.done)}, fp)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def pending(self):
+        return [(s, e) for s, e in self.chunks
+                if s.isoformat() not in self.done]
+
+    def _fetch(self, start, end):
+        self.rate_limiter.wait()
+        return self.crawler.fetch_range(start, end)
+
+    def _store(self, chunk_start, df):
+        written = self.store.upsert(df, self.source) if not df.empty else 0
+        self.done.add(chunk_start.isoformat())
+        self._save_checkpoint()
+        print(f"{self.source} {chunk_start:%Y-%m-%d}: "
+              f"{len(df)} events, {written} written")
+        return written
+
+    def run(self):
+        """Stores every pending chunk and publishes the store. Returns the
+        number of events written.
+
+        Downloads go on while earlier chunks are parsed, with at most two
+        chunks per worker in flight.
+        """
+        pending = self.pending()
+        written = 0
+        if not self.workers:
+            for start, end in pending:
+                content = self._fetch(start, end)
+                written += self._store(start,
+                                       self.crawler.parse_range(content))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                in_flight = {}
+                for start, end in pending:
+                    if len(in_flight) >= 2 * self.workers:
+                        written += self._collect(in_flight, FIRST_COMPLETED)
+                    content = self._fetch(start, end)
+                    future = executor.submit(self.crawler.parse_range,
+                                             content)
+                    in_flight[future] = start
+                written += self._collect(in_flight)
+
+        if written:
+            # Keeps the source errors reported by the live ingestion
+            published = self.store.published() or {}
+            self.store.publish(errors=published.get("errors", {}))
+        return written
+
+    def _collect(self, in_flight, return_when=ALL_COMPLETED):
+        done, _ = wait(list(in_flight), return_when=return_when)
+        written = 0
+        for future in sorted(done, key=in_flight.get):
+            written += self._store(in_flight.pop(future), future.result())
+        return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("source", choices=BACKFILL_CRAWLERS.keys())
+    parser.add_argument("--start", required=True)
+    parser.add_argument("--end", default=pd.Timestamp.now("UTC").strftime(
+        "%Y-%m-%d"))
+    parser.add_argument("--chunk-days", type=int, default=DEFAULT_CHUNK_DAYS)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help="maximum requests per second")
+    parser.add_argument("--workers", type=int,
+                        help="parsing processes, 0 parses inline")
+    args = parser.parse_args()
+
+    backfill = Backfill(args.source, args.start, args.end,
+                        chunk_days=args.chunk_days, rate=args.rate,
+                        workers=args.workers)
+    print(f"{len(backfill.pending())} of {len(backfill.chunks)} chunks "
+          f"to backfill")
+    print(f"{backfill.run()} events written")
+
+
+if __name__ == "__main__":
+    main()
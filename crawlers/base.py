@@ -1,16 +1,54 @@
+import functools
 from abc import ABC, abstractmethod
 
+from crawlers.fetch import get_fetcher
+from instrumentation import span
+
 
 class BaseCrawler(ABC):
     def __init__(self, data_source, event_type):
         self.data = []
         self.data_source = data_source
         self.data_type = event_type
+        self.url = None
+        self.not_modified = False
+        self.timeout = None
+        self.error = None
 
     @abstractmethod
     def crawl(self):
         pass
 
+    def fetch(self, url):
+        """Downloads url through the shared, revalidating fetcher."""
+        self.url = url
+        result = get_fetcher().get(url, timeout=self.timeout)
+        self.not_modified = result.not_modified
+        return result
+
+    def is_cached(self):
+        """True when the feed was not modified since the last parsed crawl,
+        so parsing can be skipped."""
+        return self.not_modified and get_fetcher().cache.has_frame(self.url)
+
+
+def cache_frame(pandify_data):
+    """Decorates a pandify_data method so that an unmodified feed returns
+    the DataFrame built from it last time instead of rebuilding it."""
+    @functools.wraps(pandify_data)
+    def wrapper(self):
+        cache = get_fetcher().cache
+        if self.is_cached():
+            with span("load_frame", source=self.data_source):
+                return cache.load_frame(self.url)
+
+        with span("pandify", source=self.data_source):
+            df = pandify_data(self)
+        if self.url:
+            cache.save_frame(self.url, df)
+        return df
+    return wrapper
+
 
 class SeismicCrawler(BaseCrawler):
     def __init__(self, data_source):
@@ -19,3 +57,19 @@ class SeismicCrawler(BaseCrawler):
     @abstractmethod
     def pandify_data(self):
         pass
+
+    def update_store(self, store):
+        """Crawls the data source and upserts the events into an EventStore.
+
+        Returns the number of new or revised events written.
+        """
+        with span("crawl", source=self.data_source):
+            self.crawl()
+        if self.is_cached() and store.partitions(self.data_source):
+            # Nothing changed upstream since the last upsert
+            return 0
+        if not (self.data or self.is_cached()):
+            return 0
+        df = self.pandify_data()
+        with span("store_upsert", source=self.data_source):
+            return store.upsert(df, self.data_source)
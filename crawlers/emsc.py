@@ -0,0 +1,92 @@
+import io
+
+import pandas as pd
+
+from catalog.schema import apply_schema
+from crawlers.fetch import get_fetcher
+
+
+class EmscCrawler:
+    """Events of the Azores region from the EMSC FDSN event service.
+
+    Unlike the IPMA and IVAR feeds, the service answers any date range. It
+    is registered for historical backfills only (see
+    crawlers.backfill.BACKFILL_CRAWLERS), the scheduler does not poll it.
+    The app reads the backfilled events from the store like those of the
+    polled sources.
+    """
+    EMSC_BASE_URL = "https://www.seismicportal.eu"
+    EMSC_EVENT_ENDPOINT = "/fdsnws/event/1/query"
+
+    # (min_lat, min_lon, max_lat, max_lon) of the Azores
+    AZORES_BBOX = (36.0, -32.0, 41.0, -24.0)
+
+    def __init__(self, bbox=AZORES_BBOX):
+        self.bbox = bbox
+        self.timeout = None
+
+    def query_url(self, start, end):
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        return (f"{self.EMSC_BASE_URL}{self.EMSC_EVENT_ENDPOINT}"
+                f"?format=text&starttime={pd.Timestamp(start).isoformat()}"
+                f"&endtime={pd.Timestamp(end).isoformat()}"
+                f"&minlatitude={min_lat}&maxlatitude={max_lat}"
+                f"&minlongitude={min_lon}&maxlongitude={max_lon}")
+
+    def fetch_range(self, start, end):
+        """Downloads the raw events between start and end."""
+        # Historical ranges never change, they skip the revalidating cache
+        response = get_fetcher().session.get(self.query_url(start, end),
+                                             timeout=self.timeout)
+        response.raise_for_status()
+        # 204 No Content when the range has no events
+        return response.content
+
+    @staticmethod
+    def parse_range(content):
+        """Parses what fetch_range returned. It does not depend on the
+        crawler's state, as it runs in worker processes."""
+        return parse_fdsn_text(content)
+
+
+# FDSN text columns and their names in the unified schema
+FDSN_COLUMNS = {
+    "EventID": "event_id",
+    "Time": "date",
+    "Latitude": "lat",
+    "Longitude": "lon",
+    "Depth/km": "depth",
+    "MagType": "magnitude_type",
+    "Magnitude": "magnitude",
+    "EventLocationName": "obs_region",
+}
+
+
+def parse_fdsn_text(content):
+    """Parses an FDSN event service response in text format.
+
+    The first line is the "#"-prefixed header, fields are separated by
+    "|". Unknown columns are dropped, an empty response gives an empty
+    DataFrame with the unified columns.
+    """
+    if not content or not content.strip():
+        return apply_schema(
+            pd.DataFrame(columns=list(FDSN_COLUMNS.values())))
+
+    df = pd.read_csv(io.BytesIO(content), sep="|", dtype=str,
+                     skipinitialspace=True)
+    df.columns = [c.strip().lstrip("#").strip() for c in df.columns]
+    df = df[[c for c in FDSN_COLUMNS if c in df.columns]]
+    df = df.rename(columns=FDSN_COLUMNS)
+
+    df["event_id"] = df["event_id"].str.strip()
+    df["date"] = pd.to_datetime(df["date"].str.strip(),
+                                utc=True).dt.tz_localize(None)
+    for col in ("lat", "lon", "depth", "magnitude"):
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    for col in ("magnitude_type", "obs_region"):
+        if col in df.columns:
+            df[col] = df[col].str.strip()
+
+    df = df.sort_values(by="date", ascending=False, ignore_index=True)
+    return apply_schema(df)
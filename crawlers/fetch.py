@@ -0,0 +1,171 @@
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class ResponseCache:
+    """Small on-disk cache of response bodies, their validators (ETag and
+    Last-Modified) and the DataFrames parsed from them.
+
+    The external scheduler worker and the app's own polls may share the
+    cache, so every file is written to its own temporary file and swapped
+    in. A body is written before its validators, which record its digest:
+    a body and validators of different responses are not served.
+    """
+    DEFAULT_ROOT = os.path.join("data", "http_cache")
+
+    def __init__(self, root=None):
+        self.root = root or os.environ.get("SEISMIC_HTTP_CACHE_DIR",
+                                           self.DEFAULT_ROOT)
+
+    def _path(self, url, suffix):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, f"{key}{suffix}")
+
+    def load(self, url):
+        """Returns the cached (meta, content) of url or (None, None)."""
+        meta_path = self._path(url, ".json")
+        body_path = self._path(url, ".body")
+        if not (os.path.exists(meta_path) and os.path.exists(body_path)):
+            return None, None
+
+        with open(meta_path) as fp:
+            meta = json.load(fp)
+        with open(body_path, "rb") as fp:
+            content = fp.read()
+        if meta.get("sha1") != hashlib.sha1(content).hexdigest():
+            # Another writer replaced the body since, the next request
+            # downloads it again
+            return None, None
+        return meta, content
+
+    def save(self, url, response):
+        meta = {"url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "encoding": response.encoding or response.apparent_encoding}
+        if not (meta["etag"] or meta["last_modified"]):
+            # Nothing to revalidate against, so there is no point in caching
+            return
+
+        meta["sha1"] = hashlib.sha1(response.content).hexdigest()
+
+        os.makedirs(self.root, exist_ok=True)
+        # The parsed frame belongs to the previous body
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._path(url, ".pkl"))
+        _atomic_write(self._path(url, ".body"), response.content)
+        _atomic_write(self._path(url, ".json"),
+                      json.dumps(meta).encode("utf-8"))
+
+    def has_frame(self, url):
+        return os.path.exists(self._path(url, ".pkl"))
+
+    def load_frame(self, url):
+        if not self.has_frame(url):
+            return None
+        return pd.read_pickle(self._path(url, ".pkl"))
+
+    def save_frame(self, url, df):
+        if not os.path.exists(self._path(url, ".json")):
+            return
+        with _replacing(self._path(url, ".pkl")) as tmp_path:
+            df.to_pickle(tmp_path)
+
+
+class FetchResult:
+    def __init__(self, url, content, encoding=None, not_modified=False):
+        self.url = url
+        self.content = content
+        self.encoding = encoding
+        self.not_modified = not_modified
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+class Fetcher:
+    """Pooled HTTP client that revalidates cached responses.
+
+    Keeps connections alive across crawls, negotiates gzip and sends
+    If-None-Match / If-Modified-Since for previously seen URLs. A 304 is
+    answered with the cached body and flagged as not modified.
+    """
+    DEFAULT_TIMEOUT = 30
+    HEADERS = {"Accept-Encoding": "gzip, deflate",
+               "User-Agent": "seismic-az"}
+
+    def __init__(self, cache=None, pool_size=4, retries=2, timeout=None):
+        self.cache = cache or ResponseCache()
+        self.timeout = timeout or self.DEFAULT_TIMEOUT
+
+        self.session = requests.Session()
+        self.session.headers.update(self.HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size,
+                              max_retries=retries)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url, timeout=None):
+        headers = {}
+        meta, content = self.cache.load(url)
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = self.session.get(url, headers=headers,
+                                    timeout=timeout or self.timeout)
+        if response.status_code == 304 and content is not None:
+            return FetchResult(url, content, meta.get("encoding"),
+                               not_modified=True)
+
+        response.raise_for_status()
+        self.cache.save(url, response)
+        return FetchResult(url, response.content,
+                           response.encoding or response.apparent_encoding)
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    """Returns the process-wide Fetcher shared by all crawlers."""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = Fetcher()
+        return _fetcher
+
+
+@contextlib.contextmanager
+def _replacing(path):
+    """Yields a new temporary file next to path, which replaces path once
+    written. Every writer gets its own temporary file."""
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".",
+        prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _atomic_write(path, content):
+    with _replacing(path) as tmp_path:
+        with open(tmp_path, "wb") as fp:
+            fp.write(content)
@@ -1,8 +1,8 @@
-import requests
 import json
 import pandas as pd
 
-from crawlers.base import SeismicCrawler
+from catalog.schema import apply_schema
+from crawlers.base import SeismicCrawler, cache_frame
 
 
 class IpmaCrawler(SeismicCrawler):
@@ -34,20 +34,25 @@ class IpmaCrawler(SeismicCrawler):
 
         data = {}
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-
-            data = json.loads(response.text)
+            response = self.fetch(url)
+            # An unmodified feed is not parsed again, pandify_data returns
+            # the cached DataFrame instead
+            if not self.is_cached():
+                data = json.loads(response.text)
         except Exception as err:
+            self.error = err
             print(err)
         finally:
             self.data = data
             return data
 
+    @cache_frame
     def pandify_data(self):
         df = pd.DataFrame(self.data["data"])
         df["source"] = "IPMA"
 
+        df["event_id"] = df["sismoId"].astype("string[pyarrow]")
+
         df["date"] = pd.to_datetime(df["time"])
         df["lat"] = df["lat"].astype(float)
         df["lon"] = df["lon"].astype(float)
@@ -76,7 +81,7 @@ class IpmaCrawler(SeismicCrawler):
         df = df.sort_values(by="date", ascending=False)
 
         # Column selection and reordering
-        df = df[["date", "lat", "lon", "magnitude", "magnitude_type",
-                 "depth", "degree", "local", "obs_region", "source",
-                 "updated_at"]]
-        return df
+        df = df[["event_id", "date", "lat", "lon", "magnitude",
+                 "magnitude_type", "depth", "degree", "local", "obs_region",
+                 "source", "updated_at"]]
+        return apply_schema(df)
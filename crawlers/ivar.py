@@ -1,15 +1,24 @@
+import io
+import xml.etree.ElementTree as ET
+from array import array
+
+import numpy as np
 import pandas as pd
-import requests
 import xmltodict
 
-from crawlers.base import SeismicCrawler
+from catalog.schema import apply_schema
+from crawlers.base import SeismicCrawler, cache_frame
 
 
 class IvarCrawler(SeismicCrawler):
     IVAR_BASE_URL = "http://www.ivar.azores.gov.pt"
     IVAR_SEISMIC_ENDPOINT = "/seismic/eventgroup.xml"
 
-    def __init__(self):
+    def __init__(self, streaming=True):
+        # In streaming mode the feed is parsed straight into column arrays
+        # instead of a nested dict, which is faster and holds less memory.
+        # The xmltodict path is kept as the reference for the benchmarks.
+        self.streaming = streaming
         super().__init__("IVAR")
 
     def crawl(self):
@@ -17,12 +26,16 @@ class IvarCrawler(SeismicCrawler):
 
         data = {}
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-
-            data = xmltodict.parse(response.text)
+            response = self.fetch(url)
+            # An unmodified feed is not parsed again, pandify_data returns
+            # the cached DataFrame instead
+            if not self.is_cached() and self.streaming:
+                data = stream_eventgroup(response.content)
+            elif not self.is_cached():
+                data = parse_eventgroup(response.text)
 
         except Exception as err:
+            self.error = err
             print(err)
         finally:
             self.data = data
@@ -31,7 +44,9 @@ class IvarCrawler(SeismicCrawler):
     def format_data(self):
         processed_data = []
 
-        for e in self.data["EventGroup"]["Event"]:
+        # An empty <EventGroup/> is parsed as None
+        event_group = self.data["EventGroup"] or {}
+        for e in event_group.get("Event", []):
             event_id = e["@EventID"].strip()
             origin = e["Origin"]
             if isinstance(origin, list):
@@ -48,10 +63,11 @@ class IvarCrawler(SeismicCrawler):
             prime_origin_resource_id = e["primeOrigin"]["@ResourceID"]
             prime_magnitude_resource_id = e["primeMagnitude"]["@ResourceID"]
             comment_commands = []
-            for command in e["CommentCommand"]:
+            for command in e.get("CommentCommand", []):
+                # A missing or empty <value> is "", as when streaming
                 comment_commands.append({
                     "parameter": command["@Parameter"],
-                    "value": command["value"]})
+                    "value": command.get("value") or ""})
 
             processed_data.append(dict(
                 event_id=event_id,
@@ -71,20 +87,34 @@ class IvarCrawler(SeismicCrawler):
         return processed_data
 
     def _extract_lat_and_lon(self, data):
-        locations = data["location"]
+        # Every location is "lat, lon, depth": split the whole column at
+        # once, one field per column
+        if data.empty:
+            for column in ("lat", "lon", "depth"):
+                data[column] = pd.Series(dtype=float)
+            return data
 
-        lats, lons = [], []
-        for l in locations:
-            lat, lon, _ = l.split(", ")
-            lats.append(float(lat))
-            lons.append(float(lon))
+        fields = data["location"].str.split(", ", expand=True)
+        fields = fields.reindex(columns=range(max(fields.shape[1], 3)))
+        malformed = fields.iloc[:, :3].isna().any(axis=1)
+        if fields.shape[1] > 3:
+            malformed |= fields.iloc[:, 3:].notna().any(axis=1)
+        if malformed.any():
+            row = data[malformed].iloc[0]
+            raise ValueError(f"IVAR event {row['event_id']} has location "
+                             f"'{row['location']}', expected "
+                             f"'lat, lon, depth'")
 
-        data["lat"] = lats
-        data["lon"] = lons
+        coordinates = fields.iloc[:, :3].to_numpy(dtype=float)
+        data["lat"] = coordinates[:, 0]
+        data["lon"] = coordinates[:, 1]
+        data["depth"] = coordinates[:, 2]
 
         return data
 
     def _unpack_comment_commands(self, data):
+        # Kept as a loop: the output is a Python list per event, and building
+        # those from exploded columns measured slower than this single pass
         sentidos = [[] for i in range(len(data))]
         regioes = [[] for i in range(len(data))]
 
@@ -99,17 +129,40 @@ class IvarCrawler(SeismicCrawler):
         data["regioes"] = regioes
         return data
 
+    def _pandify_columns(self):
+        columns = self.data
+        df = pd.DataFrame({
+            "event_id": columns["event_id"],
+            "origin_agency": columns["origin_agency"],
+            "origin_id": columns["origin_id"],
+            "magnitude": np.frombuffer(columns["magnitude"], dtype=float)})
+
+        df["date"] = pd.to_datetime(
+            pd.Series(columns["time"], dtype=object)).dt.tz_localize(None)
+        df["lat"] = np.frombuffer(columns["lat"], dtype=float)
+        df["lon"] = np.frombuffer(columns["lon"], dtype=float)
+        df["depth"] = np.frombuffer(columns["depth"], dtype=float)
+        df["sentidos"] = columns["sentidos"]
+        df["regioes"] = columns["regioes"]
+
+        df = df[list(FRAME_COLUMNS)].sort_values(by="date", ascending=False)
+        return apply_schema(df)
+
+    @cache_frame
     def pandify_data(self):
+        if self.streaming:
+            return self._pandify_columns()
+
         formatted_data = self.format_data()
-        df = pd.DataFrame(formatted_data)
+        df = pd.DataFrame(formatted_data, columns=FORMATTED_COLUMNS)
 
         df["date"] = pd.to_datetime(df["time"]).dt.tz_localize(None)
         df = self._extract_lat_and_lon(df)
         df["magnitude"] = df["magnitude"].astype(float)
         df = self._unpack_comment_commands(df)
 
-        drop_columns = ["origin_id",
-                        "time",
+        # "origin_id" is kept as it changes whenever an event is revised
+        drop_columns = ["time",
                         "location_length",
                         "location",
                         "magnitude_agency",
@@ -121,4 +174,85 @@ class IvarCrawler(SeismicCrawler):
 
         df = df.drop(columns=drop_columns)
         df = df.sort_values(by="date", ascending=False)
-        return df
+        return apply_schema(df)
+
+
+# Keys of the dicts of format_data, an empty feed gives these columns too
+FORMATTED_COLUMNS = ("event_id", "origin_agency", "origin_id", "time",
+                     "location_length", "location", "magnitude_agency",
+                     "magnitude_id", "magnitude", "magnitude_type",
+                     "prime_origin_resource_id",
+                     "prime_magnitude_resource_id", "comment_commands")
+# Columns of pandify_data, in the same order in both parse modes
+FRAME_COLUMNS = ("event_id", "origin_agency", "origin_id", "magnitude",
+                 "date", "lat", "lon", "depth", "sentidos", "regioes")
+STREAM_COLUMNS = ("event_id", "origin_agency", "origin_id", "time",
+                  "lat", "lon", "depth", "magnitude", "sentidos", "regioes")
+
+
+def parse_eventgroup(text):
+    """Parses an IVAR eventgroup document into the nested dict of
+    format_data. Events and comment commands are lists even when there
+    is only one of them."""
+    return xmltodict.parse(text, force_list=("Event", "CommentCommand"))
+
+
+def stream_eventgroup(source):
+    """Parses an IVAR eventgroup document into column arrays.
+
+    Events are read one at a time with iterparse and released as soon as
+    their fields are appended, so memory stays proportional to the output
+    columns rather than to a document tree. Numeric columns are returned
+    as array("d") buffers and the comment commands are unpacked into the
+    "sentidos" and "regioes" lists on the fly.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    columns = {name: [] for name in STREAM_COLUMNS}
+    for name in ("lat", "lon", "depth", "magnitude"):
+        columns[name] = array("d")
+
+    context = ET.iterparse(source, events=("start", "end"))
+    _, root = next(context)
+
+    # Tags are compared fully qualified, with the document's namespace
+    ns = root.tag[:root.tag.index("}") + 1] if root.tag[0] == "{" else ""
+    event_tag = f"{ns}Event"
+    origin_tag, magnitude_tag = f"{ns}Origin", f"{ns}Magnitude"
+    command_tag, value_tag = f"{ns}CommentCommand", f"{ns}value"
+    time_tag, location_tag = f"{ns}originTime", f"{ns}location"
+
+    for event, elem in context:
+        if event != "end" or elem.tag != event_tag:
+            continue
+
+        # Only the first origin is used when an event has several
+        origin = elem.find(origin_tag)
+        lat, lon, depth = origin.findtext(location_tag).strip().split(", ")
+
+        sentidos, regioes = [], []
+        for command in elem.iterfind(command_tag):
+            parameter = command.get("Parameter")
+            if parameter == "SENTIDO:":
+                sentidos.append(command.findtext(value_tag, "").strip())
+            elif parameter == "REGIAO:":
+                regioes.append(command.findtext(value_tag, "").strip())
+
+        columns["event_id"].append(elem.get("EventID").strip())
+        columns["origin_agency"].append(origin.get("Agency"))
+        columns["origin_id"].append(origin.get("OriginID"))
+        columns["time"].append(origin.findtext(time_tag).strip())
+        columns["lat"].append(float(lat))
+        columns["lon"].append(float(lon))
+        columns["depth"].append(float(depth))
+        columns["magnitude"].append(float(
+            elem.find(magnitude_tag).findtext(value_tag)))
+        columns["sentidos"].append(sentidos)
+        columns["regioes"].append(regioes)
+
+        # Drop the parsed event so the tree never grows
+        elem.clear()
+        root.clear()
+
+    return columns
@@ -0,0 +1,89 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import pandas as pd
+
+from catalog.schema import apply_schema
+from crawlers.ipma import IpmaCrawler
+from crawlers.ivar import IvarCrawler
+
+# Insert new data sources by adding new entries to the dictionary below
+CRAWLERS = {
+    "IPMA": lambda: IpmaCrawler("azores"),
+    "IVAR": IvarCrawler,
+}
+
+# Seconds each source is given to answer, parse and be stored
+DEFAULT_TIMEOUT = 60
+SOURCE_TIMEOUTS = {}
+
+# Columns shared by every source, source specific columns follow them
+EVENT_COLUMNS = ["event_id", "source", "date", "lat", "lon", "depth",
+                 "magnitude", "magnitude_type", "updated_at"]
+
+
+def _update_source(source, store, timeout):
+    crawler = CRAWLERS[source]()
+    crawler.timeout = timeout
+    written = crawler.update_store(store)
+    return written, crawler.error
+
+
+def crawl_all(store, sources=None):
+    """Crawls every registered source concurrently into store.
+
+    Each source runs in its own thread with its own deadline, so a slow or
+    unreachable source only fails itself. A crawl past its deadline is
+    left to its HTTP timeout in the background, and whatever it still
+    writes is published along with the next changes. Returns the
+    (events written, error or None) of each source.
+    """
+    sources = list(sources or CRAWLERS.keys())
+    timeouts = {s: SOURCE_TIMEOUTS.get(s, DEFAULT_TIMEOUT) for s in sources}
+
+    results = {}
+    executor = ThreadPoolExecutor(max_workers=len(sources),
+                                  thread_name_prefix="crawler")
+    started_at = time.monotonic()
+    futures = {s: executor.submit(_update_source, s, store, timeouts[s])
+               for s in sources}
+
+    for source, future in futures.items():
+        remaining = started_at + timeouts[source] - time.monotonic()
+        try:
+            results[source] = future.result(timeout=max(remaining, 0))
+        except TimeoutError:
+            results[source] = 0, f"timed out after {timeouts[source]}s"
+        except Exception as err:
+            results[source] = 0, err
+
+    # Hanging crawls are left to their HTTP timeout instead of blocking here
+    executor.shutdown(wait=False)
+    return results
+
+
+def read_catalog(store, sources=None, start=None):
+    """Merges the stored events of every source, without crawling. Stored
+    sources include those only written by backfills."""
+    frames = []
+    for source in sources or store.sources():
+        df = store.query(source, start=start)
+        if not df.empty:
+            frames.append(df.assign(source=source))
+    return merge_catalogs(frames)
+
+
+def merge_catalogs(frames):
+    """Concatenates per-source frames into the unified event schema."""
+    if not frames:
+        return apply_schema(pd.DataFrame(columns=EVENT_COLUMNS))
+
+    catalog = pd.concat(frames, ignore_index=True)
+    for col in EVENT_COLUMNS:
+        if col not in catalog.columns:
+            catalog[col] = pd.NA
+
+    extra_columns = [c for c in catalog.columns if c not in EVENT_COLUMNS]
+    catalog = apply_schema(catalog[EVENT_COLUMNS + extra_columns])
+    return catalog.sort_values(by="date", ascending=False,
+                               ignore_index=True)
@@ -0,0 +1,179 @@
+"""Background ingestion of every source into the event store.
+
+Runs inside the Streamlit process (see visualization.ingestion_scheduler)
+or as a separate worker:
+
+    python -m crawlers.scheduler [--once]
+"""
+
+import argparse
+import random
+import threading
+import time
+
+from catalog.store import EventStore
+from crawlers.orchestrator import CRAWLERS, crawl_all
+
+# Seconds between two polls of a source
+DEFAULT_INTERVAL = 600
+SOURCE_INTERVALS = {}
+# Every delay is randomized by this fraction, so that sources and app
+# instances do not poll in lockstep
+JITTER = 0.1
+# After a failure the next poll comes sooner, doubling on every new failure
+# up to MAX_BACKOFF seconds
+RETRY_DELAY = 60
+MAX_BACKOFF = 6 * 3600
+
+
+class IngestionScheduler:
+    """Polls each source on its own interval and publishes a new version of
+    the store whenever events were written or a source's state changed.
+
+    Pages read the published version and never wait on the network.
+    """
+
+    def __init__(self, store=None, sources=None, intervals=None,
+                 jitter=JITTER, retry_delay=RETRY_DELAY,
+                 max_backoff=MAX_BACKOFF):
+        self.store = store or EventStore()
+        self.sources = list(sources or CRAWLERS.keys())
+        intervals = intervals or SOURCE_INTERVALS
+        self.intervals = {s: intervals.get(s, DEFAULT_INTERVAL)
+                          for s in self.sources}
+        self.jitter = jitter
+        self.retry_delay = retry_delay
+        self.max_backoff = max_backoff
+
+        self.status = {s: {"failures": 0, "error": None,
+                           "last_success": None, "next_poll": None}
+                       for s in self.sources}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._published = threading.Event()
+        self._first_polls = None
+        self._threads = []
+        self._random = random.Random()
+
+    def poll(self, source):
+        """Crawls one source into the store, within its deadline, publishing
+        if anything changed. Returns the number of events written."""
+        written, error = crawl_all(self.store, [source])[source]
+        self._record(source, written, error)
+        return written
+
+    def _record(self, source, written, error):
+        with self._lock:
+            status = self.status[source]
+            previous_error = status["error"]
+            if error:
+                status["failures"] += 1
+                status["error"] = str(error)
+                print(f"{source}: {error}")
+            else:
+                status["failures"] = 0
+                status["error"] = None
+                status["last_success"] = time.time()
+
+            if written or status["error"] != previous_error \
+                    or self.store.published() is None:
+                self.store.publish(errors=self.errors())
+        self._published.set()
+
+    def errors(self):
+        return {s: status["error"] for s, status in self.status.items()
+                if status["error"]}
+
+    def next_delay(self, source):
+        """Seconds until the next poll of source, with backoff and jitter."""
+        failures = self.status[source]["failures"]
+        if failures:
+            delay = min(self.retry_delay * 2 ** (failures - 1),
+                        self.max_backoff)
+        else:
+            delay = self.intervals[source]
+        return delay * (1 + self._random.uniform(-self.jitter, self.jitter))
+
+    def run_once(self):
+        """Polls every source once, concurrently, and waits for them up to
+        their deadlines. Returns the number of events written by each."""
+        results = crawl_all(self.store, self.sources)
+        for source, (written, error) in results.items():
+            self._record(source, written, error)
+        return {source: written for source, (written, _) in results.items()}
+
+    def wait_published(self, timeout=None):
+        """Metadata of the last published version of the store, waiting up
+        to timeout seconds for the first one when nothing was published yet.
+
+        Until then the scheduler's threads poll right away, or when they do
+        not run, a single background round polls every source once, however
+        many callers wait.
+        """
+        published = self.store.published()
+        if published is not None:
+            return published
+        with self._lock:
+            if not self._threads and self._first_polls is None:
+                self._first_polls = threading.Thread(
+                    target=self.run_once, daemon=True, name="ingestion-first")
+                self._first_polls.start()
+        self._published.wait(timeout)
+        return self.store.published()
+
+    def _run(self, source):
+        # The first polls are spread over a fraction of the interval, unless
+        # pages are waiting for a first version
+        if self.store.published() is None:
+            delay = 0
+        else:
+            delay = self._random.uniform(
+                0, self.jitter * self.intervals[source])
+        while not self._stop.wait(delay):
+            self.poll(source)
+            with self._lock:
+                delay = self.next_delay(source)
+                self.status[source]["next_poll"] = time.time() + delay
+
+    def start(self):
+        """Starts one daemon thread per source."""
+        with self._lock:
+            if self._threads:
+                return self
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._run, args=(source,),
+                                 daemon=True, name=f"ingestion-{source}")
+                for source in self.sources]
+            for thread in self._threads:
+                thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--once", action="store_true",
+                        help="poll every source once and exit")
+    args = parser.parse_args()
+
+    scheduler = IngestionScheduler()
+    if args.once:
+        print(scheduler.run_once())
+        return
+
+    scheduler.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Process-wide timings of the stages an event goes through.
+
+Stages are wrapped in spans, which record their wall time and, when
+memory tracing is on, the change of traced memory (tracemalloc) over the
+span:
+
+    with span("pandify", source="IPMA"):
+        df = crawler.pandify_data()
+
+Recording is off unless SEISMIC_INSTRUMENTATION=1 or it is switched on
+from the debug panel. A disabled span is a shared no-op context manager.
+Memory deltas are process-wide, so they include the allocations of other
+threads running at the same time.
+"""
+
+import os
+import threading
+import time
+import tracemalloc
+
+METRIC_PREFIX = "seismic_stage"
+
+
+class StageStats:
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds = 0.0
+        self.last_memory_delta = None
+        self.last_run = 0.0
+
+    def add(self, seconds, memory_delta):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.last_seconds = seconds
+        self.last_memory_delta = memory_delta
+        self.last_run = time.time()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, instrumentation, key):
+        self.instrumentation = instrumentation
+        self.key = key
+
+    def __enter__(self):
+        self.memory = tracemalloc.get_traced_memory()[0] \
+            if self.instrumentation.trace_memory else None
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        memory_delta = None
+        if self.memory is not None and tracemalloc.is_tracing():
+            memory_delta = tracemalloc.get_traced_memory()[0] - self.memory
+        self.instrumentation.record(self.key, seconds, memory_delta)
+        return False
+
+
+class Instrumentation:
+    """Aggregated statistics of every (stage, labels) span."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.trace_memory = False
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def span(self, stage, **labels):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, (stage, tuple(sorted(labels.items()))))
+
+    def record(self, key, seconds, memory_delta=None):
+        with self._lock:
+            if key not in self.stats:
+                self.stats[key] = StageStats()
+            self.stats[key].add(seconds, memory_delta)
+
+    def set_trace_memory(self, trace_memory):
+        """Starts or stops tracemalloc, which slows every allocation."""
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+
+    def snapshot(self):
+        """One dict per (stage, labels), the most recent first."""
+        with self._lock:
+            items = list(self.stats.items())
+        rows = [{"stage": stage,
+                 "labels": dict(labels),
+                 "count": stats.count,
+                 "total_seconds": stats.total_seconds,
+                 "mean_seconds": stats.total_seconds / stats.count,
+                 "max_seconds": stats.max_seconds,
+                 "last_seconds": stats.last_seconds,
+                 "last_memory_delta": stats.last_memory_delta,
+                 "last_run": stats.last_run}
+                for (stage, labels), stats in items]
+        return sorted(rows, key=lambda row: row["last_run"], reverse=True)
+
+    def prometheus_text(self):
+        """The statistics in the Prometheus text exposition format."""
+        metrics = {
+            "seconds": ("summary", "Wall time spent in the stage."),
+            "max_seconds": ("gauge", "Longest run of the stage."),
+            "last_seconds": ("gauge", "Wall time of the last run."),
+            "last_memory_delta_bytes": (
+                "gauge", "Traced memory change over the last run."),
+        }
+        samples = {name: [] for name in metrics}
+        for row in self.snapshot():
+            labels = dict(row["labels"], stage=row["stage"])
+            label_text = ",".join(
+                f'{k}="{_escape_label(v)}"' for k, v in sorted(labels.items()))
+            samples["seconds"] += [
+                f"{METRIC_PREFIX}_seconds_sum{{{label_text}}} "
+                f"{row['total_seconds']}",
+                f"{METRIC_PREFIX}_seconds_count{{{label_text}}} "
+                f"{row['count']}"]
+            samples["max_seconds"].append(
+                f"{METRIC_PREFIX}_max_seconds{{{label_text}}} "
+                f"{row['max_seconds']}")
+            samples["last_seconds"].append(
+                f"{METRIC_PREFIX}_last_seconds{{{label_text}}} "
+                f"{row['last_seconds']}")
+            if row["last_memory_delta"] is not None:
+                samples["last_memory_delta_bytes"].append(
+                    f"{METRIC_PREFIX}_last_memory_delta_bytes{{{label_text}}} "
+                    f"{row['last_memory_delta']}")
+
+        lines = []
+        for name, (metric_type, description) in metrics.items():
+            if not samples[name]:
+                continue
+            lines += [f"# HELP {METRIC_PREFIX}_{name} {description}",
+                      f"# TYPE {METRIC_PREFIX}_{name} {metric_type}"]
+            lines += samples[name]
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"') \
+        .replace("\n", "\\n")
+
+
+INSTRUMENTATION = Instrumentation(
+    enabled=os.environ.get("SEISMIC_INSTRUMENTATION") == "1")
+
+
+def span(stage, **labels):
+    """A span of the process-wide Instrumentation."""
+    return INSTRUMENTATION.span(stage, **labels)
@@ -3,6 +3,7 @@
 import streamlit as st
 from streamlit_option_menu import option_menu
 
+from streamlit_app.component.debug_panel import debug_panel_requested
 from streamlit_app.page.app_pages import AppPages
 from streamlit_app.utils import (load_app_json, load_custom_components,
                                  load_custom_style)
@@ -21,6 +22,8 @@ with st.sidebar:
                                 options=AppPages.get_titles(),
                                 icons=AppPages.get_icons())
     sidebar_container = st.container()
+    # Filled after the page ran, so that it shows this run's timings
+    debug_container = st.container()
     st.about_footer(app_config["author"], app_config["email"])
 
 
@@ -28,3 +31,7 @@ st.page_header(app_config["name"], app_config["description"])
 
 content_function = AppPages.get_content(page_selected)
 content_function(sidebar_container)
+
+if debug_panel_requested():
+    with debug_container:
+        st.debug_panel()
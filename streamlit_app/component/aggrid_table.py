@@ -1,9 +1,45 @@
+import numpy as np
+import pandas as pd
 import streamlit as st
 from st_aggrid import GridOptionsBuilder, AgGrid, JsCode
 
+from catalog.schema import text_lists_to_strings, widen_floats
 
-def aggrid(data):
-    gb = GridOptionsBuilder.from_dataframe(data)
+PAGE_SIZE = 100
+
+
+def _row_ids(data, id_column):
+    if id_column in data.columns:
+        return data[id_column].astype(str).to_numpy()
+    return data.index.astype(str).to_numpy()
+
+
+def aggrid(data, key="events", id_column="event_id", page_size=PAGE_SIZE):
+    """Shows data one page at a time and returns the ids of the selected
+    rows, across all pages, as a set.
+
+    Only the rows of the current page are sent to the browser. The
+    selection is kept in the session state by id, so it survives page
+    changes and queries returning the same events in another order.
+    """
+    selection_key = f"{key}_selected_ids"
+    selected_ids = st.session_state.setdefault(selection_key, set())
+
+    num_pages = max(int(np.ceil(len(data) / page_size)), 1)
+    page_col, info_col = st.columns([1, 3])
+    page_number = page_col.number_input(
+        "Page", min_value=1, max_value=num_pages, value=1,
+        key=f"{key}_page")
+    start = (page_number - 1) * page_size
+    # Lists are shown as text and float32 columns with their own digits
+    page = data.iloc[start:start + page_size]
+    page = widen_floats(text_lists_to_strings(page))
+    page_ids = _row_ids(page, id_column)
+    info_col.caption(
+        f"Rows {start + 1 if len(page) else 0} to {start + len(page)} "
+        f"of {len(data)}, {len(selected_ids)} selected.")
+
+    gb = GridOptionsBuilder.from_dataframe(page)
 
     cellsytle_jscode = JsCode("""
     function(params) {
@@ -28,8 +64,12 @@ def aggrid(data):
     };
     """)
 
-    gb.configure_selection(selection_mode="multiple", use_checkbox=True)
-    for col in data.columns:
+    gb.configure_selection(
+        selection_mode="multiple",
+        use_checkbox=True,
+        pre_selected_rows=[i for i, row_id in enumerate(page_ids)
+                           if row_id in selected_ids])
+    for col in page.columns:
         gb.configure_column(col, filter=False)
 
     gb.configure_grid_options(
@@ -46,7 +86,7 @@ def aggrid(data):
                     </div>""", unsafe_allow_html=True)
 
     grid_response = AgGrid(
-        data,
+        page,
         gridOptions=gridOptions,
         update_mode="selection_changed",
         allow_unsafe_jscode=True,
@@ -57,6 +97,14 @@ def aggrid(data):
             ".ag-header-cell:not(.ag-column-resizing)+.ag-header-cell:not(.ag-header-cell-moving):hover": {"background-color": "#5f6a96 !important", "color": "white !important"},
             ".ag-theme-material .ag-checkbox-input-wrapper.ag-checked:after": {"color": "white !important"},
             ".ag-theme-material .ag-row-selected": {"font-weight": "700 !important"}
-        }
+        },
+        key=f"{key}_grid_{page_number}",
     )
-    return grid_response
+
+    # The grid only reports the selected rows of the current page
+    selected_rows = pd.DataFrame(grid_response["selected_rows"])
+    page_selection = set(_row_ids(selected_rows, id_column)) \
+        if not selected_rows.empty else set()
+    selected_ids = (selected_ids - set(page_ids)) | page_selection
+    st.session_state[selection_key] = selected_ids
+    return selected_ids
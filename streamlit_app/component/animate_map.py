@@ -1,23 +1,131 @@
-# def animate_map():
-#     global data
-#     date = start_time
-#     num_days = (end_time-start_time).days+1
-#     for _ in range(num_days):
-#         # Increment day by 1
-#         date += timedelta(days=1)
-#         # Update data in map layers
-#         seismic_layer.data = filter_date_range(data, start_time, end_time)
-#         # Update the deck.gl map
-#         map_deck.update()
-#         # Render the map
-#         map.pydeck_chart(map_deck)
-
-#         # Update the maps and the subheading each day for 90 days
-#         # Update the heading with current date
-#         date_animation.subheader(f"Date:{date}")
-#         # wait 0.1 second before go onto next day
-#         time.sleep(0.5)
-#     data = filter_date_range(data, start_time, end_time)
-
-
-# st.button('Start Animation', on_click=animate_map)
+import json
+
+import numpy as np
+import pandas as pd
+from pydeck.io.html import render_json_to_html
+
+# Frame periods offered by the page, as pandas frequencies
+FRAME_PERIODS = {"Hour": "h", "Day": "D"}
+MAX_FRAMES = 5000
+
+# Appended to pydeck's standalone page. Playback runs in the browser: the
+# events are sorted by date and sent once, each frame only slices them.
+PLAYER_TEMPLATE = """
+<div id="player" style="position: absolute; left: 10px; right: 10px;
+     bottom: 10px; z-index: 1; display: flex; gap: 8px; align-items: center;
+     padding: 6px 10px; background: rgba(30, 35, 55, 0.85); color: white;
+     font-family: sans-serif; font-size: 13px; border-radius: 4px;">
+  <button id="player-toggle" style="width: 60px;">Play</button>
+  <input id="player-slider" type="range" min="0" value="0" step="1"
+         style="flex-grow: 1;">
+  <span id="player-label" style="min-width: 120px;"></span>
+</div>
+<script>
+  const frameLabels = __LABELS__;
+  const frameOffsets = __OFFSETS__;
+  const windowFrames = __WINDOW__;
+  const frameInterval = __INTERVAL__;
+
+  const slider = document.getElementById('player-slider');
+  const label = document.getElementById('player-label');
+  const toggle = document.getElementById('player-toggle');
+  slider.max = frameLabels.length - 1;
+
+  let allEvents = null;
+  let timer = null;
+
+  function showFrame(frame) {
+    if (!deckInstance || !deckInstance.props.layers.length) {
+      return;
+    }
+    const layers = deckInstance.props.layers.slice();
+    if (allEvents === null) {
+      allEvents = layers[0].props.data;
+    }
+    // Cumulative frames start at the first one, windows slide
+    const first = windowFrames > 0 ? Math.max(0, frame - windowFrames + 1) : 0;
+    layers[0] = layers[0].clone({
+      data: allEvents.slice(frameOffsets[first], frameOffsets[frame + 1])
+    });
+    deckInstance.setProps({layers});
+    slider.value = frame;
+    label.textContent = frameLabels[frame];
+  }
+
+  function stop() {
+    clearInterval(timer);
+    timer = null;
+    toggle.textContent = 'Play';
+  }
+
+  toggle.onclick = () => {
+    if (timer !== null) {
+      stop();
+      return;
+    }
+    toggle.textContent = 'Pause';
+    timer = setInterval(() => {
+      const next = Number(slider.value) + 1;
+      if (next >= frameLabels.length) {
+        stop();
+        return;
+      }
+      showFrame(next);
+    }, frameInterval);
+  };
+  slider.oninput = () => showFrame(Number(slider.value));
+
+  // The deck is created asynchronously, show the first frame once it is up
+  const waitForDeck = setInterval(() => {
+    if (deckInstance && deckInstance.props.layers.length) {
+      clearInterval(waitForDeck);
+      showFrame(0);
+    }
+  }, 50);
+</script>
+"""
+
+
+def animation_frames(dates, period):
+    """Splits events sorted by date into frames of one period.
+
+    Returns (offsets, labels): the events of frame i are the rows
+    offsets[i]:offsets[i + 1], labels[i] is the start of the frame. One
+    binary search over the dates gives all frame boundaries.
+    """
+    dates = pd.DatetimeIndex(dates)
+    if dates.empty:
+        return np.zeros(1, dtype=np.int64), []
+    if not dates.is_monotonic_increasing:
+        raise Exception("Events must be sorted by date")
+
+    starts = pd.date_range(dates[0].floor(period), dates[-1].floor(period),
+                           freq=period)
+    if len(starts) > MAX_FRAMES:
+        raise Exception(
+            f"{len(starts)} frames, more than {MAX_FRAMES}. "
+            "Select a shorter period or a longer frame.")
+
+    offsets = np.append(np.searchsorted(dates.values, starts.values),
+                        len(dates))
+    label_format = "%Y-%m-%d %H:00" if period == "h" else "%Y-%m-%d"
+    return offsets, list(starts.strftime(label_format))
+
+
+def animated_map_html(deck_json, offsets, labels, window_frames=0,
+                      frame_interval=200, tooltip=True):
+    """Standalone deck.gl page playing the frames of its first layer.
+
+    The data of the first layer must be sorted by date. window_frames is
+    the number of frames shown at once, 0 accumulates all past frames.
+    frame_interval is in milliseconds.
+    """
+    if isinstance(tooltip, dict):
+        tooltip = json.dumps(tooltip)
+    page = render_json_to_html(deck_json, tooltip=tooltip)
+    player = PLAYER_TEMPLATE \
+        .replace("__LABELS__", json.dumps(labels)) \
+        .replace("__OFFSETS__", json.dumps(np.asarray(offsets).tolist())) \
+        .replace("__WINDOW__", str(int(window_frames))) \
+        .replace("__INTERVAL__", str(int(frame_interval)))
+    return page.replace("</html>", f"{player}</html>")
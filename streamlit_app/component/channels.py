@@ -0,0 +1,128 @@
+import numpy as np
+import streamlit as st
+
+from streamlit_app.utils import hex_to_rgb
+
+WHITE = (255, 255, 255)
+
+# Evenly spaced stops of each colormap, from the low to the high end of
+# the variable. "theme" goes from white to the theme's primary color.
+COLORMAPS = {
+    "theme": None,
+    "viridis": [(68, 1, 84), (59, 82, 139), (33, 145, 140),
+                (94, 201, 98), (253, 231, 37)],
+    "magma": [(0, 0, 4), (81, 18, 124), (183, 55, 121),
+              (252, 137, 97), (252, 253, 191)],
+    "plasma": [(13, 8, 135), (126, 3, 168), (204, 71, 120),
+               (248, 149, 64), (240, 249, 33)],
+    "reds": [(255, 245, 240), (252, 187, 161), (251, 106, 74),
+             (203, 24, 29), (103, 0, 13)],
+    "blues": [(247, 251, 255), (198, 219, 239), (107, 174, 214),
+              (33, 113, 181), (8, 48, 107)],
+}
+
+
+def _column(data, name):
+    return data[name].to_numpy(dtype=float, na_value=np.nan)
+
+
+def _inverse(name, offset):
+    return lambda data: 1 / (_column(data, name) + offset)
+
+
+def _scaled(name, factor):
+    return lambda data: _column(data, name) * factor
+
+
+def _over(numerator, name, zero_value=None):
+    def size(data):
+        values = _column(data, name)
+        with np.errstate(divide="ignore"):
+            size = numerator / values
+        if zero_value is not None:
+            size[values == 0] = zero_value
+        return size
+    return size
+
+
+def _constant(value):
+    return lambda data: np.full(len(data), value, dtype=float)
+
+
+# Per variable: the value mapped to colors with its (low, high) domain, the
+# radius or elevation, and the heatmap weight. size None means the layer
+# uses its own constant. Aggregated cells keep the names of the event
+# columns, only Density reads the cell count instead.
+CHANNELS = {
+    "Density": {
+        "value": _constant(20), "domain": (0, 100),
+        "size": None, "weight": _constant(1)},
+    "Magnitude": {
+        "value": _scaled("magnitude", 1), "domain": (1.5, 4.5),
+        "size": _scaled("magnitude", 20), "weight": _scaled("magnitude", 20)},
+    "Depth": {
+        "value": _inverse("depth", 5), "domain": (1/30, 1/5),
+        "size": _over(100, "depth", zero_value=101),
+        "weight": _inverse("depth", 5)},
+    "Recentness": {
+        "value": _inverse("hours_since", 10), "domain": (1/500, 1/10),
+        "size": _over(200, "hours_since"),
+        "weight": _inverse("hours_since", 10)},
+}
+
+AGGREGATED_DENSITY = {
+    "value": _scaled("count", 1), "domain": (0, 100),
+    "size": _scaled("count", 1), "weight": _scaled("count", 1)}
+
+
+def colormap_stops(name):
+    """Returns the (num_stops, 3) RGB stops of a named colormap."""
+    if name not in COLORMAPS:
+        raise Exception(
+            f"Invalid colormap {name}. Select one of {list(COLORMAPS)}.")
+    stops = COLORMAPS[name]
+    if stops is None:
+        stops = [WHITE, hex_to_rgb(st.get_option('theme.primaryColor'))]
+    return np.asarray(stops, dtype=float)
+
+
+def map_colors(values, low, high, colormap="theme"):
+    """Maps values to (n, 3) uint8 RGB colors.
+
+    Values are scaled linearly from [low, high] to the colormap, clipped at
+    both ends. NaN values get the low end color.
+    """
+    stops = colormap_stops(colormap)
+    t = (np.asarray(values, dtype=float) - low) / (high - low)
+    t = np.nan_to_num(np.clip(t, 0, 1))
+
+    positions = np.linspace(0, 1, len(stops))
+    colors = np.empty((len(t), 3), dtype=np.uint8)
+    for i in range(3):
+        colors[:, i] = np.rint(np.interp(t, positions, stops[:, i]))
+    return colors
+
+
+def variable_channels(data, variable, colormap="theme", aggregated=False):
+    """Computes the "color", "size" and "weight" columns of a variable.
+
+    Returns a dict of arrays, "color" being (n, 3) uint8 and the others
+    float. "size" is missing when the layer should use a constant. Sizes
+    and weights that are not finite, such as a division by a zero
+    hours_since, are set to 0 as JSON can not carry them.
+    """
+    if variable not in CHANNELS:
+        raise Exception(f"Invalid variable {variable}")
+    channels = CHANNELS[variable]
+    if aggregated and variable == "Density":
+        channels = AGGREGATED_DENSITY
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = {"color": map_colors(channels["value"](data),
+                                      *channels["domain"], colormap)}
+        for name in ("size", "weight"):
+            if channels[name] is not None:
+                values = channels[name](data)
+                values[~np.isfinite(values)] = 0
+                result[name] = values
+    return result
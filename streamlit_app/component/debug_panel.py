@@ -0,0 +1,62 @@
+import os
+
+import pandas as pd
+import streamlit as st
+
+from instrumentation import INSTRUMENTATION
+
+
+def debug_panel_requested():
+    """The panel is opt-in, with SEISMIC_DEBUG=1 on the server. Its switches
+    slow down every session and the ingestion, so visitors cannot open it
+    from the URL."""
+    return os.environ.get("SEISMIC_DEBUG") == "1"
+
+
+def _set_recording():
+    INSTRUMENTATION.enabled = st.session_state["debug_record"]
+
+
+def _set_trace_memory():
+    INSTRUMENTATION.set_trace_memory(st.session_state["debug_trace_memory"])
+
+
+def debug_panel():
+    """Stage timings of this server process, most recent first.
+
+    Recording and memory tracing are process-wide: they are switched for
+    every session and for the background ingestion. Widget callbacks run
+    before the page, so a switch applies to the rerun it triggers.
+    """
+    st.caption("---")
+    st.header("Debug")
+    st.checkbox("Record stage timings", value=INSTRUMENTATION.enabled,
+                key="debug_record", on_change=_set_recording)
+    st.checkbox("Trace memory (slow)", value=INSTRUMENTATION.trace_memory,
+                key="debug_trace_memory", on_change=_set_trace_memory)
+
+    rows = INSTRUMENTATION.snapshot()
+    if not rows:
+        st.caption("No stage recorded yet.")
+        return
+
+    table = pd.DataFrame({
+        "stage": [row["stage"] + "".join(
+            f" {v}" for v in row["labels"].values()) for row in rows],
+        "runs": [row["count"] for row in rows],
+        "last ms": [row["last_seconds"] * 1000 for row in rows],
+        "mean ms": [row["mean_seconds"] * 1000 for row in rows],
+        "max ms": [row["max_seconds"] * 1000 for row in rows],
+        "last ΔMB": [None if row["last_memory_delta"] is None
+                     else row["last_memory_delta"] / 2**20 for row in rows],
+    })
+    st.dataframe(table.style.format(precision=1, na_rep="-"))
+
+    reset_col, export_col = st.columns(2)
+    if reset_col.button("Reset"):
+        INSTRUMENTATION.reset()
+    export_col.download_button(
+        label="Prometheus",
+        data=INSTRUMENTATION.prometheus_text(),
+        file_name="seismic_stages.prom",
+        mime="text/plain")
@@ -1,34 +1,34 @@
+import pandas as pd
 import pydeck as pdk
-import streamlit as st
 
-from streamlit_app.utils import build_color_gradient, hex_to_rgb
+from streamlit_app.component.channels import variable_channels
+from streamlit_app.component.transport import (compact_frame,
+                                               referenced_columns)
 
 
+def _cell_radius(kwargs):
+    # Half of the cell side, in meters
+    return kwargs["cell_size"] * 111320 / 2
+
+
+# Layer functions return the arguments of their pdk.Layer, pdk_layer reads
+# the accessors in them before building it
+
 def heatmap_layer(data, *args, **kwargs):
-    variable = kwargs["variable"]
-    if variable == 'Density':
-        weight = "1"
-    elif variable == 'Magnitude':
-        weight = "magnitude*20"
-    elif variable == 'Depth':
-        weight = "1/(depth+5)"
-    elif variable == 'Recentness':
-        weight = "1/(hours_since+10)"
-
-    return pdk.Layer(
-        "HeatmapLayer",
+    return dict(
+        type="HeatmapLayer",
         data=data,
         opacity=0.9,
         radius=100,
         get_position=["lon", "lat"],
         aggregation=pdk.types.String("MEAN"),
-        get_weight=weight
+        get_weight="weight"
     )
 
 
 def hexagon_layer(data, *args, **kwargs):
-    return pdk.Layer(
-        "HexagonLayer",
+    return dict(
+        type="HexagonLayer",
         data=data,
         get_position=["lon", "lat"],
         radius=100,
@@ -40,99 +40,28 @@ def hexagon_layer(data, *args, **kwargs):
 
 
 def column_layer(data, *args, **kwargs):
-    variable = kwargs["variable"]
-
-    bg_color = hex_to_rgb(st.get_option('theme.primaryColor'))
-    white = [255, 255, 255]
-
-    s_color, e_color = white, bg_color
-
-    if variable == 'Density':
-        elevation = "50"
-        variable_name = "20"
-        start_value = 0
-        end_value = 100
-    elif variable == 'Magnitude':
-        elevation = "magnitude*20"
-        variable_name = "magnitude"
-        start_value = 1.5
-        end_value = 4.5
-    elif variable == 'Depth':
-        elevation = "depth!=0 ? 100/(depth) : 101"
-        variable_name = "1/(depth+5)"
-        start_value = 1/30
-        end_value = 1/5
-    elif variable == 'Recentness':
-        elevation = '200/hours_since'
-        variable_name = "1/(hours_since+10)"
-        start_value = 1/500
-        end_value = 1/10
-
-    color = []
-    for i in range(len(white)):
-        color_component = build_color_gradient(
-            name=variable_name,
-            start_value=start_value,
-            end_value=end_value,
-            start_color=s_color[i],
-            end_color=e_color[i])
-        color.append(color_component)
-
-    return pdk.Layer(
-        "ColumnLayer",
+    aggregated = kwargs.get("aggregated", False)
+    sized = "size" in kwargs["channels"]
+
+    return dict(
+        type="ColumnLayer",
         data=data,
         get_position=["lon", "lat"],
-        get_elevation=elevation,
+        get_elevation="size" if sized else 50,
         elevation_scale=50,
         elevation_range=[0, 1000],
-        radius=100,
-        get_fill_color=color,
+        radius=_cell_radius(kwargs) if aggregated else 100,
+        get_fill_color="color",
         pickable=True,
         auto_highlight=True,
     )
 
 
 def scatterplot_layer(data, *args, **kwargs):
-    variable = kwargs["variable"]
-
-    bg_color = hex_to_rgb(st.get_option('theme.primaryColor'))
-    white = [255, 255, 255]
-
-    s_color, e_color = white, bg_color
-
-    if variable == 'Density':
-        radius = "15"
-        variable_name = "20"
-        start_value = 0
-        end_value = 100
-    elif variable == 'Magnitude':
-        radius = "magnitude*20"
-        variable_name = "magnitude"
-        start_value = 1.5
-        end_value = 4.5
-    elif variable == 'Depth':
-        radius = "depth!=0 ? 100/(depth) : 101"
-        variable_name = "1/(depth+5)"
-        start_value = 1/30
-        end_value = 1/5
-    elif variable == 'Recentness':
-        radius = '200/hours_since'
-        variable_name = "1/(hours_since+10)"
-        start_value = 1/500
-        end_value = 1/10
-
-    color = []
-    for i in range(len(white)):
-        color_component = build_color_gradient(
-            name=variable_name,
-            start_value=start_value,
-            end_value=end_value,
-            start_color=s_color[i],
-            end_color=e_color[i])
-        color.append(color_component)
-
-    return pdk.Layer(
-        "ScatterplotLayer",
+    sized = "size" in kwargs["channels"]
+
+    return dict(
+        type="ScatterplotLayer",
         data=data,
         get_position=["lon", "lat"],
         opacity=0.8,
@@ -143,15 +72,15 @@ def scatterplot_layer(data, *args, **kwargs):
         radius_min_pixels=3,
         # radius_max_pixels=50,
         line_width_min_pixels=1,
-        get_radius=radius,
-        get_fill_color=color,
+        get_radius="size" if sized else 15,
+        get_fill_color="color",
         get_line_color=[0, 0, 0],
     )
 
 
 def grid_layer(data, *args, **kwargs):
-    return pdk.Layer(
-        "GridLayer",
+    return dict(
+        type="GridLayer",
         data=data,
         get_position=["lon", "lat"],
         get_elevation="magnitude*20",
@@ -162,8 +91,8 @@ def grid_layer(data, *args, **kwargs):
 
 
 def screen_grid_layer(data, *args, **kwargs):
-    return pdk.Layer(
-        "ScreenGridLayer",
+    return dict(
+        type="ScreenGridLayer",
         data=data,
         get_position=["lon", "lat"],
         get_elevation="magnitude*20",
@@ -193,6 +122,9 @@ LAYERS_MAPPING = {
     # "ScreenGrid": screen_grid_layer,
 }
 
+# Layers that can render server-side aggregated cells instead of events
+AGGREGATED_LAYERS = ("Heatmap", "Column")
+
 LAYERS_VARIABLES_MAPPING = {
     "Hexagon": ('Density',),
     "Heatmap": ('Density', 'Magnitude', 'Depth', 'Recentness'),
@@ -203,22 +135,68 @@ LAYERS_VARIABLES_MAPPING = {
 }
 
 
-def pdk_layer(layer, variable, data):
+TOOLTIP_LINES = {
+    "lat": "<b>Latitude: </b>{lat}<br />",
+    "lon": "<b>Longitude: </b>{lon}<br />",
+    "magnitude": "<b>Magnitude: </b>{magnitude}<br />",
+    "depth": "<b>Depth: </b>{depth}<br />",
+    "date": "<b>Date: </b>{date_string}<br />",
+    "count": "<b>Events: </b>{count}<br />",
+    "mean_magnitude": "<b>Mean magnitude: </b>{mean_magnitude}<br />",
+    "energy": "<b>Energy (J): </b>{energy}<br />"
+}
+
+
+def pdk_layer(layer, variable, data, aggregated=False, cell_size=None,
+              colormap="theme"):
     layer_function = LAYERS_MAPPING.get(layer)
     if not layer_function:
         raise Exception("Invalid layer type")
+    if aggregated and layer not in AGGREGATED_LAYERS:
+        raise Exception(f"{layer} layer can not render aggregated cells")
+
+    # Colors, sizes and weights are computed here once, the layers only
+    # read them from the "color", "size" and "weight" columns
+    channels = variable_channels(data, variable, colormap, aggregated)
+    properties = layer_function(None, variable=variable,
+                                aggregated=aggregated, cell_size=cell_size,
+                                channels=channels)
+    deck_layer = pdk.Layer(**properties)
+
+    # pydeck embeds the data as JSON records, so only the columns read by
+    # the accessors and the tooltip are sent, with rounded floats
+    values = list(properties.values())
+    if properties.get("pickable", False):
+        values += TOOLTIP_LINES.values()
+    columns = referenced_columns(values, list(data.columns) + list(channels))
+
+    channels["color"] = channels["color"].tolist()
+    data = pd.concat(
+        [data[[c for c in data.columns if c in columns]],
+         pd.DataFrame({c: v for c, v in channels.items() if c in columns},
+                      index=data.index)],
+        axis=1)
+    deck_layer.data = compact_frame(data, columns)
+    return deck_layer
+
+
+class SerializedDeck(pdk.Deck):
+    """A Deck rendered from an already serialized JSON spec.
+
+    st.pydeck_chart calls to_json on every rerun, this one returns the
+    spec as is, so a map built on a previous run is not serialized again.
+    """
+
+    def __init__(self, spec, tooltip=True):
+        super().__init__(tooltip=tooltip)
+        self.spec = spec
 
-    return layer_function(data, variable=variable)
+    def to_json(self):
+        return self.spec
 
 
 def pdk_tooltip(layer, data_cols):
-    tooltip_lines = {
-        "lat": "<b>Latitude: </b>{lat}<br />",
-        "lon": "<b>Longitude: </b>{lon}<br />",
-        "magnitude": "<b>Magnitude: </b>{magnitude}<br />",
-        "depth": "<b>Depth: </b>{depth}<br />",
-        "date": "<b>Date: </b>{date_string}<br />"
-    }
+    tooltip_lines = TOOLTIP_LINES
 
     if layer == 'Column':
         lines = [t for c, t in tooltip_lines.items() if c in data_cols]
@@ -0,0 +1,61 @@
+import json
+import re
+
+import pandas as pd
+from pydeck.bindings.json_tools import default_serialize
+
+# Decimals kept per column in the JSON payload. 4 decimals of a degree are
+# about 11 m, below what a map can show at the zoom levels of the app
+COLUMN_DECIMALS = {
+    "lat": 4,
+    "lon": 4,
+    "magnitude": 1,
+    "mean_magnitude": 2,
+    "depth": 1,
+    "hours_since": 1,
+    "size": 1,
+    "weight": 4,
+}
+
+_IDENTIFIER = re.compile(r"[A-Za-z_]\w*")
+_TEMPLATE_FIELD = re.compile(r"{(\w+)}")
+
+
+def referenced_columns(values, columns):
+    """Columns of a frame named by pydeck accessors or tooltip templates.
+
+    values can mix accessor expressions ("magnitude*20"), column lists
+    (["lon", "lat"]) and tooltip html ("{date_string}").
+    """
+    names = set()
+    for value in values:
+        if isinstance(value, (list, tuple)):
+            names |= referenced_columns(value, columns)
+        elif isinstance(value, str):
+            names |= set(_IDENTIFIER.findall(value))
+            names |= set(_TEMPLATE_FIELD.findall(value))
+    return names & set(columns)
+
+
+def compact_frame(data, columns):
+    """Keeps only the given columns of data, rounding the floating point
+    ones to COLUMN_DECIMALS so that they print short in the JSON payload.
+    """
+    compact = {}
+    for name in data.columns:
+        if name not in columns:
+            continue
+        values = data[name]
+        if name in COLUMN_DECIMALS and pd.api.types.is_float_dtype(values):
+            # float32 columns are widened first, rounding them as float32
+            # would still print all the digits of their float64 value
+            values = values.astype(float).round(COLUMN_DECIMALS[name])
+        compact[name] = values
+    return pd.DataFrame(compact, index=data.index)
+
+
+def deck_to_json(deck):
+    """Serializes a Deck like Deck.to_json, without the indentation that
+    puts every number of a color or position on its own line."""
+    return json.dumps(deck, sort_keys=True, default=default_serialize,
+                      separators=(",", ":"))
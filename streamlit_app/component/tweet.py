@@ -1,12 +1,163 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import streamlit as st
 import streamlit.components.v1 as components
-import requests
+
+from crawlers.fetch import get_fetcher
+
+# Use Twitter's oEmbed API
+# https://dev.twitter.com/web/embedded-tweets
+OEMBED_URL = "https://publish.twitter.com/oembed"
+
+# Default of tweet's html, None being an embed that could not be fetched
+_NOT_GIVEN = object()
+
+
+class EmbedCache:
+    """On-disk cache of oEmbed HTML and of when it was fetched.
+
+    Layout: <root>/<sha1 of the url>.json
+    """
+    DEFAULT_ROOT = os.path.join("data", "embed_cache")
+
+    def __init__(self, root=None):
+        self.root = root or os.environ.get("SEISMIC_EMBED_CACHE_DIR",
+                                           self.DEFAULT_ROOT)
+
+    def _path(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, f"{key}.json")
+
+    def load(self, url):
+        """Returns the cached (html, fetched_at) of url or (None, None)."""
+        path = self._path(url)
+        if not os.path.exists(path):
+            return None, None
+        with open(path) as fp:
+            entry = json.load(fp)
+        return entry["html"], entry["fetched_at"]
+
+    def save(self, url, html):
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as fp:
+            json.dump({"url": url, "html": html, "fetched_at": time.time()},
+                      fp)
+        os.replace(tmp_path, path)
+
+
+class EmbedFetcher:
+    """Fetches oEmbed HTML concurrently, with a TTL cache.
+
+    Fresh entries are served from the cache. Stale entries are served as
+    they are while a background fetch revalidates them. Missing entries
+    are fetched concurrently, waiting at most timeout seconds for all of
+    them, and the ones that fail or time out are None. They are not
+    waited for again until retry_delay seconds passed, so an outage does
+    not slow down every rerun.
+    """
+    DEFAULT_TIMEOUT = 5
+    DEFAULT_TTL = 24 * 3600
+    DEFAULT_RETRY_DELAY = 300
+
+    def __init__(self, cache=None, timeout=DEFAULT_TIMEOUT, ttl=DEFAULT_TTL,
+                 retry_delay=DEFAULT_RETRY_DELAY, max_workers=8):
+        self.cache = cache or EmbedCache()
+        self.timeout = timeout
+        self.ttl = ttl
+        self.retry_delay = retry_delay
+        # url: time of its last failed or timed out fetch. Like _in_flight,
+        # it is shared by every session and guarded by _lock.
+        self._failed = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="oembed")
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def _fetch(self, url):
+        response = get_fetcher().session.get(
+            OEMBED_URL, params={"url": url, "dnt": "true"},
+            timeout=self.timeout)
+        response.raise_for_status()
+        html = response.json()["html"]
+        self.cache.save(url, html)
+        return html
+
+    def _submit(self, url):
+        # One fetch per url at a time, shared by concurrent reruns
+        with self._lock:
+            future = self._in_flight.get(url)
+            if future is None:
+                future = self._executor.submit(self._fetch, url)
+                self._in_flight[url] = future
+                future.add_done_callback(
+                    lambda f: self._discard(url, f))
+            return future
+
+    def _discard(self, url, future):
+        with self._lock:
+            if self._in_flight.get(url) is future:
+                del self._in_flight[url]
+
+    def _failed_recently(self, url):
+        with self._lock:
+            failed_at = self._failed.get(url, 0)
+        return time.time() - failed_at < self.retry_delay
+
+    def get_many(self, urls):
+        """Returns {url: html or None}."""
+        embeds, futures = {}, {}
+        for url in urls:
+            html, fetched_at = self.cache.load(url)
+            if html is not None:
+                embeds[url] = html
+                if time.time() - fetched_at > self.ttl:
+                    self._submit(url)
+            elif self._failed_recently(url):
+                embeds[url] = None
+            else:
+                futures[url] = self._submit(url)
+
+        wait(futures.values(), timeout=self.timeout)
+        for url, future in futures.items():
+            embeds[url] = None
+            if future.done() and not future.exception():
+                embeds[url] = future.result()
+                with self._lock:
+                    self._failed.pop(url, None)
+                continue
+            if future.done():
+                print(f"{url}: {future.exception()}")
+            # A fetch still running after the timeout goes on, its result
+            # is cached for the next reruns
+            with self._lock:
+                self._failed[url] = time.time()
+        return embeds
+
+
+@st.experimental_singleton
+def get_embed_fetcher():
+    # Shared by every session, so that their fetches are deduplicated
+    return EmbedFetcher()
+
+
+def fetch_embeds(tweet_urls):
+    return get_embed_fetcher().get_many(tweet_urls)
 
 
-def tweet(tweet_url: str):
-    # Use Twitter's oEmbed API
-    # https://dev.twitter.com/web/embedded-tweets
-    api = "https://publish.twitter.com/oembed?url={}".format(tweet_url)
-    response = requests.get(api)
-    text = response.json()["html"]
+def tweet(tweet_url: str, html=_NOT_GIVEN):
+    """Embeds a tweet. html is its oEmbed HTML, fetched when not given, or
+    None when it could not be; a link to the tweet is shown then."""
+    if html is _NOT_GIVEN:
+        html = fetch_embeds([tweet_url])[tweet_url]
+    if html is None:
+        return st.info(f"This tweet could not be loaded. "
+                       f"[Open it on Twitter]({tweet_url})")
 
-    return components.html(text, height=500)
+    return components.html(html, height=500)
@@ -1,16 +1,18 @@
-from streamlit_app.page.news import news_content
-from streamlit_app.page.visualization import visualization_content
+import importlib
 
 
 class AppPages:
-    # Insert new pages by adding new entries to the dictionary below
+    # Insert new pages by adding new entries to the dictionary below. Page
+    # modules are imported the first time their page is selected, so that
+    # one page does not load the dependencies of all the others.
     PAGES = {
         "Data": {
             "icon": "server",
-            "page": visualization_content},
+            "page": ("streamlit_app.page.visualization",
+                     "visualization_content")},
         "News": {
             "icon": "info-circle-fill",
-            "page": news_content},
+            "page": ("streamlit_app.page.news", "news_content")},
     }
 
     @staticmethod
@@ -23,4 +25,5 @@ class AppPages:
 
     @staticmethod
     def get_content(title):
-        return AppPages.PAGES.get(title)["page"]
+        module_name, function_name = AppPages.PAGES.get(title)["page"]
+        return getattr(importlib.import_module(module_name), function_name)
@@ -1,5 +1,7 @@
 import streamlit as st
 
+from streamlit_app.component.tweet import fetch_embeds
+
 
 def news_content(sidebar_container):
     st.header("News")
@@ -8,7 +10,10 @@ def news_content(sidebar_container):
                    "https://twitter.com/ReutersScience/status/1507488784560144388",
                    "https://twitter.com/SotisValkan/status/1508064426808782855"]
 
+    # All embeds are fetched at once, concurrently and through a cache
+    embeds = fetch_embeds(tweets_urls)
+
     tweet_cols = st.columns(len(tweets_urls))
     for idx, c in enumerate(tweet_cols):
         with c:
-            st.tweet(tweets_urls[idx])
+            st.tweet(tweets_urls[idx], html=embeds[tweets_urls[idx]])
@@ -1,43 +1,298 @@
 import datetime as dt
+import os
 
 import numpy as np
 import pandas as pd
 import pydeck as pdk
 import streamlit as st
-from crawlers.ipma import IpmaCrawler
-from crawlers.ivar import IvarCrawler
-from streamlit_app.component.pdk_layer import (LAYERS_MAPPING,
+import streamlit.components.v1 as components
+from catalog.aggregation import aggregate_cells, cell_size_for_zoom
+from catalog.association import preferred_events
+from catalog.dataset import DatasetRegistry, SharedDataset
+from catalog.export import EXPORT_FORMATS, ExportCache
+from catalog.query import EventQuery
+from catalog.schema import memory_report
+from catalog.statistics import CatalogStatistics, window_statistics
+from catalog.store import EventStore
+from catalog.tiles import TilePyramid, viewport_bbox, visible_tiles
+from crawlers.orchestrator import CRAWLERS, read_catalog
+from crawlers.scheduler import IngestionScheduler
+from instrumentation import span
+from streamlit_app.component.animate_map import (FRAME_PERIODS,
+                                                 animated_map_html,
+                                                 animation_frames)
+from streamlit_app.component.channels import COLORMAPS
+from streamlit_app.component.debug_panel import debug_panel_requested
+from streamlit_app.component.pdk_layer import (AGGREGATED_LAYERS,
+                                               LAYERS_MAPPING,
                                                LAYERS_VARIABLES_MAPPING,
-                                               pdk_layer, pdk_tooltip)
-from streamlit_app.utils import split_into_groups
-
-
-@st.experimental_memo(ttl=1800)
-def load_data(source):
-    if source == "IPMA":
-        ipma_crawler = IpmaCrawler("azores")
-        ipma_crawler.crawl()
-        df = ipma_crawler.pandify_data()
-    elif source == "IVAR":
-        ivar_crawler = IvarCrawler()
-        ivar_crawler.crawl()
-        df = ivar_crawler.pandify_data()
+                                               SerializedDeck, pdk_layer,
+                                               pdk_tooltip)
+from streamlit_app.component.transport import deck_to_json
+from streamlit_app.utils import parse_polygon, split_into_groups
+
+
+EVENT_STORE = EventStore()
+EXPORT_CACHE = ExportCache()
+HISTORY_DAYS = 30
+# Above this many events, maps aggregate them on the server by default
+AGGREGATION_THRESHOLD = 10000
+# Time windows of the seismic statistics charts, None is expanding
+STATISTICS_WINDOWS = {"1 day": "1D", "7 days": "7D", "30 days": "30D",
+                      "Since the first event": None}
+STATISTICS_STEPS = {"Hour": "h", "Day": "D"}
+# Memoized Recentness maps are rebuilt once per bucket, otherwise their
+# hours_since stay those of the run that built them
+RECENTNESS_BUCKET = "10min"
+
+
+@st.experimental_singleton
+def ingestion_scheduler():
+    # One scheduler per server process, shared by every session. With
+    # SEISMIC_SCHEDULER=external a separate "python -m crawlers.scheduler"
+    # worker feeds the store instead.
+    scheduler = IngestionScheduler(EVENT_STORE)
+    if os.environ.get("SEISMIC_SCHEDULER") != "external":
+        scheduler.start()
+    return scheduler
+
+
+def published_dataset():
+    """Metadata of the last published version of the store, waiting for the
+    scheduler's first polls only when nothing was ever published."""
+    scheduler = ingestion_scheduler()
+    published = EVENT_STORE.published()
+    if published is None:
+        with st.spinner("Loading events for the first time..."):
+            published = scheduler.wait_published()
+    return published
+
+
+@st.experimental_singleton
+def dataset_registry():
+    # Datasets are shared by every session instead of being copied out of
+    # st.experimental_memo for each of them
+    return DatasetRegistry()
+
+
+def build_dataset(source, start, merge_duplicates, version, previous=None):
+    # Only reads the local history, the scheduler keeps it up to date
+    if source == "ALL":
+        data = read_catalog(EVENT_STORE, start=start)
+        if merge_duplicates:
+            data = preferred_events(data)
     else:
+        # Drop the columns that only other sources fill in
+        data = read_catalog(EVENT_STORE, sources=[source], start=start)
+        data = data.dropna(axis=1, how="all")
+    # Identifies this load in the caches built on top of it
+    return SharedDataset(
+        data, f"{version}-{start}-{source}-{merge_duplicates}", previous)
+
+
+def stored_sources():
+    """The polled sources, then those whose history was only backfilled
+    into the store."""
+    return list(CRAWLERS.keys()) + [
+        s for s in EVENT_STORE.sources() if s not in CRAWLERS]
+
+
+def load_data(source, start=None, merge_duplicates=False):
+    """The SharedDataset of the events of source since start, at the last
+    published version of the store."""
+    sources = stored_sources()
+    if source != "ALL" and source not in sources:
         raise Exception(
-            f"Invalid {source} as a data source. Select 'IPMA' or 'IVAR'.")
-
-    return df
-
-
-@st.experimental_memo(ttl=3600)
-def filter_df_by(df, column, min_value, max_value):
-    return df[(df[column] >= min_value) & (df[column] <= max_value)]
-
+            f"Invalid {source} as a data source. "
+            f"Select one of {sources} or 'ALL'.")
+
+    published = published_dataset()
+    for failed_source, error in published.get("errors", {}).items():
+        if source in (failed_source, "ALL"):
+            st.warning(f"Could not update {failed_source} data: {error}")
+
+    return dataset_registry().get(
+        (source, start, merge_duplicates), published["version"],
+        lambda previous: build_dataset(source, start, merge_duplicates,
+                                       published["version"], previous))
+
+
+def variable_version(version, variable, now):
+    """version, with the time bucket of now for the variables that depend
+    on the time they are drawn at."""
+    if variable != "Recentness":
+        return version
+    return f"{version}-{pd.Timestamp(now).floor(RECENTNESS_BUCKET):%Y%m%d%H%M}"
+
+
+def with_date_string(events):
+    # Tooltips show dates as text, only the drawn events get them
+    if "date" not in events.columns:
+        return events
+    return events.assign(
+        date_string=events["date"].dt.strftime('%Y-%m-%d %H:%M'))
+
+
+@st.experimental_memo(max_entries=8)
+def dataset_memory(_data, version):
+    # Deep memory usage walks every string, once per dataset version
+    return memory_report(_data)
+
+
+@st.experimental_memo(max_entries=4)
+def aggregate_events(_data, version, cell_size):
+    return aggregate_cells(_data, cell_size)
+
+
+@st.experimental_memo(max_entries=12)
+def build_map_spec(_data, layer_name, variable, version, aggregated,
+                   cell_size, colormap, view_state, land_cover):
+    # Memoized by (layer, variable, dataset version) and the view, so the
+    # maps whose selection did not change are neither rebuilt nor
+    # serialized again. _data is not hashed.
+    _data = with_date_string(_data)
+    with span("pdk_layer", layer=layer_name):
+        layer = pdk_layer(layer_name, variable, _data,
+                          aggregated=aggregated, cell_size=cell_size,
+                          colormap=colormap)
+    polygon_layer = pdk.Layer(
+        "PolygonLayer",
+        land_cover,
+        stroked=False,
+        get_polygon="-",
+        get_fill_color=[200, 200, 200, 20],
+    )
+    map_deck = pdk.Deck(
+        layers=[layer, polygon_layer],
+        initial_view_state=pdk.ViewState(**view_state),
+        map_style="mapbox://styles/mapbox/dark-v10",
+    )
+    with span("serialize", layer=layer_name):
+        spec = deck_to_json(map_deck)
+    return spec, pdk_tooltip(layer_name, _data.columns)
+
+
+def catalog_statistics(dataset):
+    # Taken over from the dataset's previous version, each new version
+    # only counts the events that changed since
+    def update(statistics):
+        if statistics is None:
+            statistics = CatalogStatistics()
+        statistics.update(dataset.frame, dataset.keys)
+        return statistics
+    return dataset.derived("statistics", update)
+
+
+def tile_pyramid(dataset):
+    # Taken over from the dataset's previous version like the statistics,
+    # each new version only rebuilds the tiles of the events that changed
+    def update(pyramid):
+        if pyramid is None:
+            pyramid = TilePyramid()
+        pyramid.update(dataset.frame, dataset.keys)
+        return pyramid
+    return dataset.derived("tiles", update)
+
+
+def visible_tile_data(pyramid, dataset, query, bbox, zoom, aggregated,
+                      narrowed, now):
+    """Sampled events, or aggregated cells, of the tiles of pyramid
+    visible in bbox at zoom. narrowed tells whether query selects fewer
+    events than the whole dataset, within bbox. Cells are only served
+    when it does not."""
+    if aggregated:
+        cells = pyramid.tile_cells(bbox, zoom)
+        hours_since = (now - cells["last_date"]) / np.timedelta64(1, 'h')
+        return cells.drop(columns="last_date").assign(
+            hours_since=hours_since)
+
+    if narrowed or zoom > pyramid.max_zoom:
+        # Samples hold the largest events of the whole dataset. For a
+        # narrowed query, or past the deepest level, the events of the map
+        # area are read from the dataset instead, keeping as many of the
+        # largest as the tiles would.
+        positions = dataset.positions(EventQuery(
+            time=query.time, lat=(bbox[0], bbox[2]), lon=(bbox[1], bbox[3]),
+            magnitude=query.magnitude, polygon=query.polygon))
+        limit = pyramid.sample_size * len(visible_tiles(bbox, int(zoom)))
+        if len(positions) > limit:
+            magnitude = dataset.index.magnitude[positions]
+            largest = np.argpartition(
+                -np.nan_to_num(magnitude, nan=-np.inf), limit)[:limit]
+            positions = np.sort(positions[largest])
+        events = dataset.frame.take(positions)
+    else:
+        events = pyramid.tile_events(bbox, zoom)
+    return events.assign(
+        hours_since=(now - events["date"]) / np.timedelta64(1, 'h'))
+
+
+@st.experimental_memo(max_entries=8)
+def event_statistics(_data, version, window, step):
+    events = _data.sort_values(by="date", kind="stable")
+    return window_statistics(events["date"], events["magnitude"],
+                             window=window, step=step)
+
+
+def statistics_content(statistics, data, version):
+    summary = statistics.summary()
+    st.caption(f"All events loaded since {statistics.first_date:%Y-%m-%d}")
+    cols = st.columns(5)
+    cols[0].metric("Events", summary["events"])
+    cols[1].metric("Events per day", f"{summary['rate']:.1f}")
+    cols[2].metric("Mc", f"{summary['mc']:.1f}")
+    # Too few events above Mc give no b-value
+    cols[3].metric("b-value", "-" if np.isnan(summary["b_value"]) else
+                   f"{summary['b_value']:.2f} ± {summary['b_error']:.2f}")
+    cols[4].metric("Energy (J)", f"{summary['energy']:.2e}")
+
+    window_col, step_col = st.columns(2)
+    window = window_col.selectbox("Window", STATISTICS_WINDOWS.keys(),
+                                  index=1)
+    step = step_col.selectbox("Step", STATISTICS_STEPS.keys(), index=1)
+    try:
+        with span("statistics", window=window):
+            stats = event_statistics(data, version,
+                                     STATISTICS_WINDOWS[window],
+                                     STATISTICS_STEPS[step])
+    except Exception as err:
+        st.error(str(err))
+        return
 
-@st.cache
-def convert_df_to_csv(df):
-    # IMPORTANT: Cache the conversion to prevent computation on every rerun
-    return df.to_csv(encoding="utf-8")
+    st.caption("Selected events, by window end")
+    rate_col, energy_col = st.columns(2)
+    rate_col.markdown("Events per day")
+    rate_col.bar_chart(stats["rate"])
+    energy_col.markdown("Cumulative seismic moment (N.m)")
+    energy_col.line_chart(stats["cumulative_moment"])
+    b_col, mc_col = st.columns(2)
+    b_col.markdown("b-value (± uncertainty)")
+    b_col.line_chart(pd.DataFrame({
+        "b_value": stats["b_value"],
+        "lower": stats["b_value"] - stats["b_error"],
+        "upper": stats["b_value"] + stats["b_error"]}))
+    mc_col.markdown("Magnitude of completeness")
+    mc_col.line_chart(stats["mc"])
+
+
+@st.experimental_memo(max_entries=4)
+def build_animation(_data, version, variable, colormap, period,
+                    window_frames, frame_interval, view_state):
+    # Frames are row ranges of the events sorted by date, the page plays
+    # them without calling back the server
+    events = with_date_string(_data.sort_values(by="date", kind="stable"))
+    offsets, labels = animation_frames(events["date"], FRAME_PERIODS[period])
+    layer = pdk_layer("Scatter", variable, events, colormap=colormap)
+    map_deck = pdk.Deck(
+        layers=[layer],
+        initial_view_state=pdk.ViewState(**view_state),
+        map_provider="carto",
+        map_style=pdk.map_styles.CARTO_DARK,
+    )
+    return animated_map_html(
+        deck_to_json(map_deck), offsets, labels,
+        window_frames=window_frames, frame_interval=frame_interval,
+        tooltip=pdk_tooltip("Scatter", events.columns))
 
 
 def visualization_content(sidebar_container):
@@ -46,18 +301,32 @@ def visualization_content(sidebar_container):
 
     DATA_SOURCES = {
         "IVAR": "IVAR (Instituto de Vulcanologia da Universidade dos Açores)",
-        "IPMA": "IPMA (Instituto Português do Mar e da Atmosfera)"
+        "IPMA": "IPMA (Instituto Português do Mar e da Atmosfera)",
+        "EMSC": "EMSC (Euro-Mediterranean Seismological Centre), "
+                "backfilled history",
+        "ALL": "All sources"
     }
+    # Backfilled sources are offered once their history is in the store
+    sources = stored_sources() + ["ALL"]
     data_source = st.radio("Select Data Source",
-                           DATA_SOURCES.keys(),
+                           [s for s in DATA_SOURCES if s in sources],
                            format_func=lambda x: DATA_SOURCES.get(x))
 
-    data = load_data(source=data_source)
+    history_start = st.date_input(
+        "Load events since",
+        value=dt.date.today() - dt.timedelta(days=HISTORY_DAYS))
 
-    # auxiliary date columns
-    data["date_string"] = data["date"].dt.strftime('%Y-%m-%d %H:%M')
-    now = dt.datetime.now()
-    data["hours_since"] = (now - data.date) / np.timedelta64(1, 'h')
+    merge_duplicates = data_source == "ALL" and st.checkbox(
+        "Merge events reported by several sources", value=True)
+
+    with span("load_data", source=data_source):
+        dataset = load_data(source=data_source, start=history_start,
+                            merge_duplicates=merge_duplicates)
+    # Read-only and shared with the other sessions
+    data = dataset.frame
+    if data.empty:
+        st.error("No data for the selected source and period.")
+        return
 
     min_time = data["date"].min().to_pydatetime()
     max_time = data["date"].max().to_pydatetime()
@@ -153,23 +422,81 @@ def visualization_content(sidebar_container):
             value=(lower_mag_value, upper_mag_value),
             format="%.1f",
             step=0.1)
+
+        polygon_text = st.text_area(
+            "Area polygon (optional)",
+            help="One 'latitude, longitude' vertex per line, at least 3.")
+        polygon = parse_polygon(polygon_text)
+        if polygon_text.strip() and polygon is None:
+            st.warning("Invalid polygon, it will be ignored.")
         st.caption("---")
 
-    data = filter_df_by(data, "date", lower_time, upper_time)
-    data = filter_df_by(data, "lat", lower_lat, upper_lat)
-    data = filter_df_by(data, "lon", lower_lon, upper_lon)
-    data = filter_df_by(data, "magnitude", lower_mag, upper_mag)
+    query = EventQuery(time=(lower_time, upper_time),
+                       lat=(lower_lat, upper_lat),
+                       lon=(lower_lon, upper_lon),
+                       magnitude=(lower_mag, upper_mag),
+                       polygon=polygon)
+    dataset_version = dataset.version
+    statistics = catalog_statistics(dataset)
+    if debug_panel_requested():
+        report = dataset_memory(data, dataset_version)
+        with st.expander(f"Dataset memory: "
+                         f"{report.loc['total', 'bytes'] / 2**20:.1f} MB, "
+                         f"{report.loc['total', 'bytes_per_event']:.0f} "
+                         f"bytes per event"):
+            datasets = dataset_registry().datasets()
+            st.caption(f"Version {dataset_version}, one of the "
+                       f"{len(datasets)} datasets shared by the sessions "
+                       f"of this process")
+            st.dataframe(report.style.format(
+                {"bytes": "{:,.0f}", "bytes_per_event": "{:.1f}"}))
+    # Timed on every run, so that cache hits show up too. The positions
+    # of the query are cached by the dataset, the rows are only copied
+    # when the query does not select all of them.
+    with span("query"):
+        data = dataset.select(query)
+
+    # data may be the frame shared by every session: new columns are only
+    # added through assign, which returns a new frame. hours_since changes
+    # on every run, it is not part of the cached result.
+    now = dt.datetime.now()
+    data = data.assign(hours_since=(now - data.date) / np.timedelta64(1, 'h'))
 
-    grid = st.aggrid(data)
+    with span("aggrid"):
+        selected_ids = st.aggrid(data)
 
-    selected_data = pd.DataFrame(grid['selected_rows'])
+    # Selected events of the current query, drawn with all their columns
+    selected_data = data[data["event_id"].isin(selected_ids)]
     data_to_draw = data if selected_data.empty else selected_data
 
-    st.download_button(
-        label="Download data as CSV",
-        data=convert_df_to_csv(data_to_draw),
-        file_name='az_seismic_data.csv',
-        mime='text/csv')
+    # Identifies the drawn events, to memoize the maps and name the
+    # exports by. The fingerprint is stable across processes.
+    if selected_data.empty:
+        selection_key = query.key()
+    else:
+        selection_key = tuple(sorted(selected_data["event_id"].astype(str)))
+    fingerprint = query.fingerprint(dataset_version, selection_key)
+    draw_version = f"{dataset_version}-{fingerprint}"
+
+    # Exports are files named after the query fingerprint, written once in
+    # chunks when first requested
+    export_format = st.selectbox("Export format", EXPORT_FORMATS.keys())
+    extension, mime, _ = EXPORT_FORMATS[export_format]
+    export_path = EXPORT_CACHE.get(fingerprint, export_format)
+    if export_path is None and st.button(
+            f"Prepare {export_format} export"):
+        with st.spinner(f"Exporting {len(data_to_draw)} events..."), \
+                span("export", format=export_format):
+            export_path = EXPORT_CACHE.export(
+                data_to_draw.drop(columns=["hours_since"]),
+                export_format, fingerprint)
+    if export_path is not None:
+        with open(export_path, "rb") as fp:
+            st.download_button(
+                label=f"Download data as {export_format}",
+                data=fp,
+                file_name=f'az_seismic_data.{extension}',
+                mime=mime)
     st.caption("---")
 
     # Data Visualization Section
@@ -179,41 +506,63 @@ def visualization_content(sidebar_container):
         st.header("Data Visualization Config")
         num_maps = st.number_input(
             'Number of maps', min_value=1, value=1, max_value=6)
+        aggregate = st.checkbox(
+            "Aggregate events on the server",
+            value=len(data_to_draw) > AGGREGATION_THRESHOLD,
+            help="Heatmap and Column maps draw pre-aggregated grid cells "
+                 "instead of every event.")
+        colormap = st.selectbox("Color map", COLORMAPS.keys(), index=0)
+        zoom = st.slider("Map zoom", min_value=1, max_value=16, value=8)
+        tiled = selected_data.empty and st.checkbox(
+            "Draw the visible tiles only",
+            value=len(data_to_draw) > AGGREGATION_THRESHOLD,
+            help="Maps draw the largest events, or the aggregated cells, "
+                 "of the precomputed tiles visible at the map zoom "
+                 "instead of every selected event.")
 
     if data_to_draw.empty:
         st.error("No data for the selected inputs.")
         return
 
     map_center = ((upper_lat+lower_lat)/2, (upper_lon+lower_lon)/2)
-    zoom = 8
 
     # Set viewport for the deckgl map
-    view = pdk.ViewState(latitude=map_center[0],
-                         longitude=map_center[1],
-                         zoom=zoom,
-                         pitch=15)
+    view_state = dict(latitude=map_center[0],
+                      longitude=map_center[1],
+                      zoom=zoom,
+                      pitch=15)
 
     num_maps = int(num_maps)
     maps_controllers = {k: {} for k in range(num_maps)}
     grouped_maps = split_into_groups(list(maps_controllers.keys()))
 
-    layers, tooltips = [], []
+    # Cells sized for the zoom level, shared by all aggregated layers
+    cell_size = cell_size_for_zoom(zoom)
+
+    if tiled:
+        with span("tiles"):
+            pyramid = tile_pyramid(dataset)
+        # Only the tiles shown by the maps, within the selected box
+        south, west, north, east = viewport_bbox(*map_center, zoom)
+        tile_bbox = (max(south, lower_lat), max(west, lower_lon),
+                     min(north, upper_lat), min(east, upper_lon))
+        # Samples and cells are taken from every event of their tiles,
+        # they are only drawn when the selection is not narrowed down in
+        # time or magnitude
+        narrowed = polygon is not None \
+            or lower_time > min_time or upper_time < max_time \
+            or lower_mag > min_mag or upper_mag < max_mag
 
     LAND_COVER = [[[upper_lon, lower_lat], [upper_lon, upper_lat],
                    [lower_lon, upper_lat], [lower_lon, lower_lat]]]
-
-    polygon_layer = pdk.Layer(
-        "PolygonLayer",
-        LAND_COVER,
-        stroked=False,
-        get_polygon="-",
-        get_fill_color=[200, 200, 200, 20],
-    )
+    if polygon:
+        LAND_COVER.append([[lon, lat] for lat, lon in polygon])
 
     for group_idx, g in enumerate(grouped_maps):
         select_box_cols = st.columns(len(g)*2)
         map_cols = st.columns(len(g))
 
+        map_specs = []
         for idx, c in enumerate(select_box_cols):
             if idx % 2 == 0:
                 layer_name = c.selectbox(
@@ -230,19 +579,64 @@ def visualization_content(sidebar_container):
                     index=0,
                     key=f'col_variable_{group_idx*4+idx}')
             if idx % 2 == 1:
-                layers.append(
-                    pdk_layer(layer_name, plot_variable, data_to_draw))
-                tooltips.append(pdk_tooltip(layer_name, data_to_draw.columns))
-
-        for idx, c in enumerate(map_cols):
-            # variable types should depend on layer type
-            # tooltip should depend on the layer type
-            map_deck = pdk.Deck(
-                layers=[layers[group_idx*2+idx], polygon_layer],
-                initial_view_state=view,
-                tooltip=tooltips[idx],
-                map_style="mapbox://styles/mapbox/dark-v10",
-            )
-
+                aggregated = aggregate and layer_name in AGGREGATED_LAYERS
+                layer_data = data_to_draw
+                map_version = variable_version(draw_version, plot_variable,
+                                               now)
+                layer_cell_size = cell_size
+                if tiled and not (narrowed and aggregated):
+                    with span("tiles", layer=layer_name):
+                        layer_data = visible_tile_data(
+                            pyramid, dataset, query, tile_bbox, zoom,
+                            aggregated, narrowed, now)
+                    map_version = f"{map_version}-tiles"
+                    layer_cell_size = pyramid.cell_size(zoom)
+                elif aggregated:
+                    with span("aggregate"):
+                        layer_data = aggregate_events(
+                            data_to_draw, map_version, cell_size)
+                with span("map_spec", layer=layer_name):
+                    map_specs.append(build_map_spec(
+                        layer_data,
+                        layer_name, plot_variable, map_version,
+                        aggregated, layer_cell_size, colormap, view_state,
+                        LAND_COVER))
+
+        for (spec, tooltip), c in zip(map_specs, map_cols):
             # Render the deck.gl map in the Streamlit app as a Pydeck chart
-            map = c.pydeck_chart(map_deck)
+            with span("pydeck_chart"):
+                c.pydeck_chart(SerializedDeck(spec, tooltip=tooltip))
+
+    st.caption("---")
+    if st.checkbox("Show seismic statistics"):
+        statistics_content(statistics, data_to_draw, draw_version)
+
+    st.caption("---")
+    if not st.checkbox("Animate events over time"):
+        return
+
+    period_col, mode_col, window_col, speed_col, variable_col = \
+        st.columns(5)
+    period = period_col.selectbox("Frame", FRAME_PERIODS.keys(), index=1)
+    mode = mode_col.radio("Show", ("Cumulative", "Sliding window"))
+    window_frames = 0
+    if mode == "Sliding window":
+        window_frames = window_col.number_input(
+            "Window (frames)", min_value=1, value=3)
+    frame_interval = speed_col.slider(
+        "Milliseconds per frame", min_value=50, max_value=2000, value=300,
+        step=50)
+    animation_variable = variable_col.selectbox(
+        "Variable", LAYERS_VARIABLES_MAPPING["Scatter"], index=1)
+
+    try:
+        with span("animation", period=period):
+            animation = build_animation(
+                data_to_draw,
+                variable_version(draw_version, animation_variable, now),
+                animation_variable, colormap,
+                period, int(window_frames), frame_interval, view_state)
+    except Exception as err:
+        st.error(str(err))
+        return
+    components.html(animation, height=520)
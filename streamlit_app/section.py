@@ -1,9 +1,6 @@
 from abc import ABC, abstractmethod
-from datetime import timedelta
 
 import streamlit as st
-from crawlers.ipma import IpmaCrawler
-from crawlers.ivar import IvarCrawler
 
 
 class Section(ABC):
@@ -1,18 +1,35 @@
+import functools
+import importlib
 import json
 import os
 
 import streamlit as st
 
-from streamlit_app.component.about_footer import about_footer
-from streamlit_app.component.aggrid_table import aggrid
-from streamlit_app.component.tweet import tweet
-from streamlit_app.section import PageHeader
+APP_JSON_FILENAME = 'app.json'
+STYLE_PATH = os.path.join('streamlit_app', 'style.css')
 
+# Custom components, "st.<name>": (module, function). Their modules import
+# heavy dependencies (st_aggrid, ...) and are only imported on first use.
+CUSTOM_COMPONENTS = {
+    "aggrid": ("streamlit_app.component.aggrid_table", "aggrid"),
+    "tweet": ("streamlit_app.component.tweet", "tweet"),
+    "page_header": ("streamlit_app.section", "PageHeader"),
+    "about_footer": ("streamlit_app.component.about_footer", "about_footer"),
+    "debug_panel": ("streamlit_app.component.debug_panel", "debug_panel"),
+}
 
-def load_app_json():
-    APP_JSON_FILENAME = 'app.json'
 
-    # Look in all directories and subdirectories for "app.json" file
+@functools.lru_cache(maxsize=None)
+def find_app_json():
+    """Path of the "app.json" file, resolved once per process.
+
+    It is looked for next to this module first, then in all directories
+    and subdirectories of the working directory.
+    """
+    file_path = os.path.join(os.path.dirname(__file__), APP_JSON_FILENAME)
+    if os.path.exists(file_path):
+        return file_path
+
     file_path = None
     for root, _, files in os.walk(os.getcwd()):
         if APP_JSON_FILENAME in files:
@@ -23,23 +40,45 @@ def load_app_json():
     if not file_path:
         raise Exception(
             "Could not find a 'app.json' file in all subdirectories.")
+    return file_path
+
 
-    # Load json contents into a python dictionary and return it
-    with open(file_path, 'r') as fp:
+@functools.lru_cache(maxsize=None)
+def load_app_json():
+    # Load json contents into a python dictionary and return it. The
+    # dictionary is shared by every rerun, it must not be modified.
+    with open(find_app_json(), 'r') as fp:
         return json.load(fp)
 
 
+def lazy_import(module_name, attribute):
+    """Returns a function calling module_name.attribute, importing the
+    module on the first call."""
+    @functools.lru_cache(maxsize=None)
+    def resolve():
+        return getattr(importlib.import_module(module_name), attribute)
+
+    def call(*args, **kwargs):
+        return resolve()(*args, **kwargs)
+    return call
+
+
 def load_custom_components(st):
     """Adds custom components to a specified streamlit instance."""
-    setattr(st, "aggrid", aggrid)
-    setattr(st, "tweet", tweet)
-    setattr(st, "page_header", PageHeader)
-    setattr(st, "about_footer", about_footer)
+    for name, (module_name, attribute) in CUSTOM_COMPONENTS.items():
+        setattr(st, name, lazy_import(module_name, attribute))
+
+
+@functools.lru_cache(maxsize=None)
+def _read_style(path):
+    with open(path) as f:
+        return f.read()
 
 
 def load_custom_style():
-    with open('streamlit_app/style.css') as f:
-        st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+    # The file is read once per process, the markdown is sent every rerun
+    st.markdown(f'<style>{_read_style(STYLE_PATH)}</style>',
+                unsafe_allow_html=True)
 
 
 def set_session_variable(name, value):
@@ -70,30 +109,24 @@ def split_into_groups(lst, group_size=2):
     return [lst[i:i+group_size] for i in range(0, len(lst), group_size)]
 
 
-def hex_to_rgb(hex_string):
-    hex_string = hex_string.lstrip('#')
-    return tuple(int(hex_string[i:i+2], 16) for i in (0, 2, 4))
+def parse_polygon(text):
+    """Parses one "lat, lon" vertex per line into a list of (lat, lon).
 
+    Returns None when the text is empty or not a valid polygon.
+    """
+    vertices = []
+    for line in text.strip().splitlines():
+        if not line.strip():
+            continue
+        try:
+            lat, lon = (float(v) for v in line.split(","))
+        except ValueError:
+            return None
+        vertices.append((lat, lon))
 
+    return vertices if len(vertices) >= 3 else None
 
-def build_color_gradient(name, start_value, end_value, start_color, end_color):
-    value_range = end_value-start_value
-    return f'{name}*({end_color}-{start_color})/{value_range} + {start_color} - {start_value} *({end_color}-{start_color})/{value_range}'
-    
-def get_color_from_gradient(start_color,
-                            end_color,
-                            min_value,
-                            max_value,
-                            value):
-    color = []
-
-    delta_value = max_value-min_value
-    for i in range(len(start_color)):
-        s_color_comp = start_color[i]
-        e_color_comp = end_color[i]
-        slope = (e_color_comp-s_color_comp)/delta_value
-        b = s_color_comp - slope * min_value
-        color_comp = slope * value + b
-        color.append(color_comp)
-
-    return tuple(color)
+
+def hex_to_rgb(hex_string):
+    hex_string = hex_string.lstrip('#')
+    return tuple(int(hex_string[i:i+2], 16) for i in (0, 2, 4))